@@ -0,0 +1,265 @@
+"""
+Streaming accuracy monitor for the duration predictor.
+
+Every completed execution with a prediction updates rolling error
+statistics for its node, its template and overall: an exponentially
+weighted MAE and bias (actual - predicted, so a positive bias means the
+model underestimates) and P² sketches of the absolute error's p50/p90.
+Memory per key is constant however many completions arrive.
+
+The first DRIFT_REFERENCE_SAMPLES errors of a key set its reference MAE.
+When the rolling MAE later exceeds it by DRIFT_MAE_RATIO (and by at least
+DRIFT_MIN_SECONDS) the key counts as drifting and a retrain is requested,
+at most once per DRIFT_COOLDOWN_SECONDS. Routine retrains (every few
+completions) keep all statistics; only the first model change after a
+drift-triggered retrain starts new references.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from . import prediction, training
+
+# Effective number of recent completions behind the rolling MAE and bias
+ACCURACY_WINDOW = int(os.getenv("ACCURACY_WINDOW", "50"))
+DRIFT_REFERENCE_SAMPLES = int(os.getenv("DRIFT_REFERENCE_SAMPLES", "100"))
+DRIFT_MAE_RATIO = float(os.getenv("DRIFT_MAE_RATIO", "1.5"))
+# Absolute floor so keys with tiny errors do not flap
+DRIFT_MIN_SECONDS = float(os.getenv("DRIFT_MIN_SECONDS", "60"))
+DRIFT_COOLDOWN_SECONDS = float(os.getenv("DRIFT_COOLDOWN_SECONDS", "600"))
+DRIFT_EVENTS_KEPT = 50
+
+
+class P2Quantile:
+    """One quantile estimated with the P² algorithm (Jain & Chlamtac), five markers of state"""
+    __slots__ = ("p", "count", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        self.count += 1
+        q, n = self.heights, self.positions
+        if self.count <= 5:
+            bisect.insort(q, x)
+            return
+        if x < q[0]:
+            q[0], k = x, 0
+        elif x >= q[4]:
+            q[4], k = x, 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                h = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < h < q[i + 1]:
+                    h = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = h
+                n[i] += d
+
+    def value(self):
+        if not self.heights:
+            return None
+        if self.count <= 5:
+            return self.heights[min(len(self.heights) - 1, int(self.p * len(self.heights)))]
+        return self.heights[2]
+
+
+class ErrorStats:
+    """Rolling error statistics of one key; count and reference restart on rebaseline()"""
+    __slots__ = ("total", "count", "mae", "bias", "reference_sum", "p50", "p90", "drifting", "last_drift")
+
+    def __init__(self):
+        self.total = 0  # Lifetime observations
+        self.mae = 0.0
+        self.bias = 0.0
+        self.last_drift = None
+        self.rebaseline()
+
+    def rebaseline(self):
+        self.count = 0  # Observations since the reference started
+        self.reference_sum = 0.0
+        self.p50 = P2Quantile(0.5)
+        self.p90 = P2Quantile(0.9)
+        self.drifting = False
+
+    @property
+    def reference_mae(self):
+        if self.count < DRIFT_REFERENCE_SAMPLES:
+            return None
+        return self.reference_sum / DRIFT_REFERENCE_SAMPLES
+
+    def add(self, error: float, window: int):
+        self.total += 1
+        self.count += 1
+        # Plain mean until the window fills, so early values are not biased towards zero
+        alpha = max(1.0 / self.total, 2.0 / (window + 1))
+        self.mae += alpha * (abs(error) - self.mae)
+        self.bias += alpha * (error - self.bias)
+        if self.count <= DRIFT_REFERENCE_SAMPLES:
+            self.reference_sum += abs(error)
+        self.p50.add(abs(error))
+        self.p90.add(abs(error))
+
+    def check_drift(self, window: int) -> bool:
+        reference = self.reference_mae
+        # The rolling MAE only leaves the reference period behind after another full window
+        self.drifting = (
+            reference is not None
+            and self.count >= DRIFT_REFERENCE_SAMPLES + window
+            and self.mae > reference * DRIFT_MAE_RATIO
+            and self.mae - reference > DRIFT_MIN_SECONDS
+        )
+        return self.drifting
+
+    def to_dict(self):
+        reference = self.reference_mae
+        return {
+            "count": self.total,
+            "baseline_count": self.count,
+            "mae": round(self.mae, 1),
+            "bias": round(self.bias, 1),
+            "reference_mae": round(reference, 1) if reference is not None else None,
+            "p50_abs_error": _round(self.p50.value()),
+            "p90_abs_error": _round(self.p90.value()),
+            "drifting": self.drifting,
+        }
+
+
+def observation(execution, template_id):
+    # Read before commit: committing expires the ORM attributes
+    return template_id, execution.node_id, execution.predicted_duration, execution.actual_duration
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+class AccuracyMonitor:
+    def __init__(self, on_drift=None, model_id=None, window: int = ACCURACY_WINDOW,
+                 cooldown: float = DRIFT_COOLDOWN_SECONDS):
+        self.on_drift = on_drift
+        self.model_id = model_id or (lambda: None)
+        self.window = max(1, window)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._model = None
+        self._rebaseline = False  # Set by a drift-triggered retrain request
+        self.overall = ErrorStats()
+        self.templates = {}  # template_id -> ErrorStats
+        self.nodes = {}      # (template_id, node_id) -> ErrorStats
+        self.events = deque(maxlen=DRIFT_EVENTS_KEPT)
+        self.retrains_requested = 0
+        self._last_retrain = None
+
+    def observe(self, template_id, node_id, predicted, actual):
+        """Fold one completed execution into its keys; no-op without a prediction"""
+        if predicted is None or actual is None:
+            return
+        error = actual - predicted
+        model = self.model_id()
+        with self._lock:
+            if model != self._model:
+                self._model = model
+                if self._rebaseline:
+                    # The model retrained because of drift: measure it against new references
+                    self._rebaseline = False
+                    for s in self._all_stats():
+                        s.rebaseline()
+            keys = (
+                (("overall",), self.overall),
+                (("template", template_id), self.templates.setdefault(template_id, ErrorStats())),
+                (("node", template_id, node_id), self.nodes.setdefault((template_id, node_id), ErrorStats())),
+            )
+            drifted, drifting = [], False
+            for key, s in keys:
+                was_drifting = s.drifting
+                s.add(error, self.window)
+                if s.check_drift(self.window):
+                    drifting = True
+                    if not was_drifting:
+                        drifted.append((key, s))
+            self._record_events(drifted)
+            trigger = drifting and self._should_retrain()
+        if trigger and self.on_drift:
+            self.on_drift()
+
+    def observe_many(self, observations):
+        for template_id, node_id, predicted, actual in observations:
+            self.observe(template_id, node_id, predicted, actual)
+
+    def _all_stats(self):
+        yield self.overall
+        yield from self.templates.values()
+        yield from self.nodes.values()
+
+    def _record_events(self, drifted):
+        for key, s in drifted:
+            s.last_drift = datetime.now()
+            self.events.append({
+                "scope": key[0],
+                "template_id": key[1] if len(key) > 1 else None,
+                "node_id": key[2] if len(key) > 2 else None,
+                "mae": round(s.mae, 1),
+                "reference_mae": round(s.reference_mae, 1),
+                "at": s.last_drift.isoformat(timespec="seconds"),
+            })
+
+    def _should_retrain(self) -> bool:
+        now = time.monotonic()
+        if self._last_retrain is not None and now - self._last_retrain < self.cooldown:
+            return False
+        self._last_retrain = now
+        self._rebaseline = True
+        self.retrains_requested += 1
+        return True
+
+    def report(self, limit: int = 20) -> dict:
+        """Compact summary: overall, per template, the worst nodes by rolling MAE, drifting keys"""
+        with self._lock:
+            templates = [{"template_id": t, **s.to_dict()} for t, s in self.templates.items()]
+            nodes = [{"template_id": t, "node_id": n, **s.to_dict()} for (t, n), s in self.nodes.items()]
+            report = {
+                "overall": self.overall.to_dict(),
+                "events": list(self.events),
+                "retrains_requested": self.retrains_requested,
+            }
+        templates.sort(key=lambda r: r["mae"], reverse=True)
+        nodes.sort(key=lambda r: r["mae"], reverse=True)
+        report.update({
+            "config": {
+                "window": self.window,
+                "reference_samples": DRIFT_REFERENCE_SAMPLES,
+                "mae_ratio": DRIFT_MAE_RATIO,
+                "min_seconds": DRIFT_MIN_SECONDS,
+            },
+            "templates": templates,
+            "nodes": nodes[:limit],
+            "node_count": len(nodes),
+            "drifting": ([{"template_id": None, **report["overall"]}] if report["overall"]["drifting"] else [])
+                        + [r for r in templates + nodes if r["drifting"]],
+        })
+        return report
+
+
+monitor = AccuracyMonitor(
+    on_drift=lambda: training.trainer.request_retrain(),
+    model_id=lambda: prediction.predictor.trained_at,
+)
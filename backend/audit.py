@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from . import database, metrics, models
+
+# "buffered": enqueue and bulk-insert in the background (default)
+# "sync": insert and commit on the caller's session, as before
+AUDIT_LOG_MODE = os.getenv("AUDIT_LOG_MODE", "buffered")
+AUDIT_FLUSH_BATCH_SIZE = int(os.getenv("AUDIT_FLUSH_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1"))
+AUDIT_MAX_PENDING = int(os.getenv("AUDIT_MAX_PENDING", "10000"))
+
+
+class AuditLogBuffer:
+    """
+    Write-behind buffer for SystemLog rows.
+
+    Records are timestamped when enqueued and flushed with one bulk INSERT
+    when the batch size is reached or the flush interval elapses. If the
+    buffer hits max_pending the caller flushes inline instead of dropping
+    entries, and stop() drains whatever is left. Only while the database
+    keeps rejecting flushes are the oldest rows dropped (and counted) to keep
+    the buffer at max_pending.
+    """
+
+    def __init__(self, mode=AUDIT_LOG_MODE, batch_size=AUDIT_FLUSH_BATCH_SIZE,
+                 interval=AUDIT_FLUSH_INTERVAL_SECONDS, max_pending=AUDIT_MAX_PENDING):
+        self.mode = mode
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.max_pending = max(self.batch_size, max_pending)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+
+    @property
+    def buffered(self):
+        return self.mode == "buffered"
+
+    def record(self, db, user_id: int, action: str, details: str = None, ip_address: str = None):
+        if not self.buffered:
+            db.add(models.SystemLog(user_id=user_id, action=action, details=details, ip_address=ip_address, created_at=datetime.now()))
+            db.commit()
+            return
+        row = {
+            "user_id": user_id,
+            "action": action,
+            "details": details,
+            "ip_address": ip_address,
+            "created_at": datetime.now(),
+        }
+        with self._lock:
+            self._pending.append(row)
+            size = len(self._pending)
+        if size >= self.max_pending:
+            self.flush()  # Backpressure: the producer pays for the flush
+        elif size >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            db = database.SessionLocal()
+            try:
+                with metrics.audit_flush_latency.time():
+                    db.execute(insert(models.SystemLog), rows)
+                    db.commit()
+                metrics.audit_flushed_rows.inc(len(rows))
+                self.flushed += len(rows)
+                self.flushes += 1
+                return len(rows)
+            except Exception as e:
+                db.rollback()
+                self.failures += 1
+                # Put the batch back so a later flush can retry it, keeping the newest max_pending rows
+                with self._lock:
+                    self._pending = rows + self._pending
+                    dropped = max(0, len(self._pending) - self.max_pending)
+                    del self._pending[:dropped]
+                    self.dropped += dropped
+                if dropped:
+                    metrics.audit_dropped_rows.inc(dropped)
+                print(f"Audit log flush failed: {e}" + (f"; dropped {dropped} oldest rows" if dropped else ""))
+                return 0
+            finally:
+                db.close()
+
+    def start(self):
+        if not self.buffered or (self._thread and self._thread.is_alive()):
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        # Drain on shutdown
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            if not self.flush():
+                break
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(timeout=self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "pending": self.pending,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "batch_size": self.batch_size,
+            "interval_seconds": self.interval,
+        }
+
+
+audit_log = AuditLogBuffer()
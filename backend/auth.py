@@ -1,3 +1,9 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -11,6 +17,19 @@ SECRET_KEY = "YOUR_SUPER_SECRET_KEY_FOR_GRADUATION_PROJECT"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authenticated user cache (per process). Entries expire after the TTL, so other
+# workers pick up deletions/role changes within that window at the latest.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+# bcrypt runs on a dedicated pool so logins never block the event loop. At most
+# workers + queue operations are admitted; beyond that callers wait up to the
+# timeout (or are rejected immediately in reject mode) with a 429.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+PASSWORD_HASH_WAIT_SECONDS = float(os.getenv("PASSWORD_HASH_WAIT_SECONDS", "5"))
+PASSWORD_HASH_REJECT_WHEN_SATURATED = os.getenv("PASSWORD_HASH_REJECT_WHEN_SATURATED", "0") == "1"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -20,6 +39,79 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """
+    Runs bcrypt hash/verify on a size-limited executor with backpressure.
+
+    Admission is an asyncio.Semaphore, so callers waiting for a slot only
+    hold a suspended coroutine, never a thread; just the bcrypt call runs
+    on the executor. The slot is released when the caller finishes, also
+    when it is cancelled (client disconnect).
+    """
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_size: int = PASSWORD_HASH_QUEUE,
+                 wait_seconds: float = PASSWORD_HASH_WAIT_SECONDS, reject_when_saturated: bool = PASSWORD_HASH_REJECT_WHEN_SATURATED):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.wait_seconds = wait_seconds
+        self.reject_when_saturated = reject_when_saturated
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._slots = None
+        self._loop = None
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One semaphore per event loop: asyncio primitives cannot be shared across loops
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._slots = loop, asyncio.Semaphore(self.capacity)
+        return self._slots
+
+    def _saturated(self):
+        self.rejected += 1
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Authentication service is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+    async def _run(self, fn, *args):
+        slots = self._semaphore()
+        if slots.locked() and self.reject_when_saturated:
+            raise self._saturated()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.wait_seconds)
+        except asyncio.TimeoutError:
+            raise self._saturated()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            slots.release()
+
+    async def verify(self, plain_password, hashed_password) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password) -> str:
+        return await self._run(get_password_hash, password)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "reject_when_saturated": self.reject_when_saturated
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        # Threads start lazily, so a fresh executor lets the app be started again in-process
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -30,6 +122,64 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class UserPrincipal:
+    """Detached snapshot of the fields request handlers read from the current user"""
+    def __init__(self, id: int, username: str, role: str):
+        self.id = id
+        self.username = username
+        self.role = role
+
+class UserCache:
+    """Bounded TTL + LRU cache of user principals keyed by JWT subject"""
+    def __init__(self, ttl: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[UserPrincipal]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, principal: UserPrincipal):
+        with self._lock:
+            self._entries[principal.username] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0
+            }
+
+user_cache = UserCache()
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,7 +193,12 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    principal = user_cache.get(username)
+    if principal is not None:
+        return principal
     user = db.query(models.User).filter(models.User.username == username).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = UserPrincipal(user.id, user.username, user.role)
+    user_cache.put(principal)
+    return principal
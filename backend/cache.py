@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# "memory": per-process LRU; "redis": shared across workers via any
+# Redis-compatible server at RESPONSE_CACHE_URL (needs the optional redis package).
+# Invalidation only reaches the process that handled the write, so with several
+# workers (WEB_CONCURRENCY, read by uvicorn and gunicorn) the default is redis.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "redis" if WEB_CONCURRENCY > 1 else "memory")
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+# Upper bound on staleness for data that also changes without a write (e.g. "today")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+
+class MemoryBackend:
+    """Single-worker only: other processes keep serving entries this one invalidated"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    def __init__(self, url: str = RESPONSE_CACHE_URL):
+        import redis  # Optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._client.set(key, value, px=int(ttl * 1000))
+
+    def counter(self, key: str) -> int:
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+    def __len__(self):
+        return self._client.dbsize()
+
+
+class ResponseCache:
+    """
+    Cache of serialized JSON responses, grouped by namespace.
+
+    Writes invalidate a whole namespace by bumping its generation number,
+    which is part of every key, so stale entries are never read again and
+    simply age out of the LRU/TTL. Each entry carries a strong ETag so
+    clients revalidating with If-None-Match get a 304 without a body.
+    """
+
+    def __init__(self, backend=None, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _key(self, namespace: str, request: Request) -> str:
+        generation = self.backend.counter(f"cache:gen:{namespace}")
+        return f"cache:{namespace}:{generation}:{request.url.path}?{request.url.query}"
+
+    def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            self.backend.incr(f"cache:gen:{namespace}")
+
+    def _store(self, key: str, data) -> bytes:
+        self.misses += 1
+        body = json.dumps(jsonable_encoder(data), ensure_ascii=False).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        entry = etag.encode() + b"\n" + body
+        self.backend.set(key, entry, self.ttl)
+        return entry
+
+    def _response(self, request: Request, entry: bytes) -> Response:
+        etag, body = entry.split(b"\n", 1)
+        headers = {"ETag": etag.decode(), "Cache-Control": "no-cache"}
+        if etag.decode() in request.headers.get("if-none-match", ""):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def respond(self, request: Request, namespace: str, compute) -> Response:
+        key = self._key(namespace, request)
+        entry = self.backend.get(key)
+        if entry is None:
+            entry = self._store(key, compute())
+        else:
+            self.hits += 1
+        return self._response(request, entry)
+
+    async def respond_async(self, request: Request, namespace: str, compute) -> Response:
+        """respond() for async endpoints: compute is a coroutine function"""
+        key = self._key(namespace, request)
+        entry = self.backend.get(key)
+        if entry is None:
+            entry = self._store(key, await compute())
+        else:
+            self.hits += 1
+        return self._response(request, entry)
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "ttl_seconds": self.ttl,
+        }
+
+
+def create_cache() -> ResponseCache:
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return ResponseCache(RedisBackend())
+    return ResponseCache(MemoryBackend())
+
+
+response_cache = create_cache()
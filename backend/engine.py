@@ -0,0 +1,149 @@
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from . import models, prediction, workflow
+
+
+def get_compiled(template=None, graph_json=None):
+    # Compile (cached per template id/version) and surface malformed graphs as 400s
+    try:
+        if template is None:
+            return workflow.CompiledTemplate(None, None, graph_json)
+        return workflow.compile_template(template)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid template graph")
+
+
+def create_executions(instance, node_ids, user_id: int, now: datetime):
+    """
+    Build RUNNING executions for node_ids. They are not added to the session:
+    assign_predictions scores them and insert_executions writes them in bulk.
+    """
+    return [
+        models.NodeExecution(
+            instance_id=instance.id,
+            node_id=node_id,
+            executed_by=user_id, # Simplification: Auto-assigned to current user or need assignment logic
+            status=models.NodeStatus.RUNNING,
+            start_time=now
+        )
+        for node_id in node_ids
+    ]
+
+
+def assign_predictions(executions, instances):
+    """Score all new executions of `instances` with a single model call"""
+    if not executions:
+        return
+    template_ids = {i.id: i.template_id for i in instances}
+    preds = prediction.predictor.predict_many(
+        [e.node_id for e in executions],
+        [e.executed_by for e in executions],
+        [e.start_time for e in executions],
+        [template_ids.get(e.instance_id) for e in executions]
+    )
+    for execution, pred in zip(executions, preds):
+        execution.predicted_duration = int(pred)
+
+
+def insert_executions(db: Session, executions):
+    """Write new executions with one executemany INSERT"""
+    if not executions:
+        return
+    db.execute(insert(models.NodeExecution), [
+        {
+            "instance_id": e.instance_id,
+            "node_id": e.node_id,
+            "executed_by": e.executed_by,
+            "status": e.status,
+            "start_time": e.start_time,
+            "predicted_duration": e.predicted_duration,
+        }
+        for e in executions
+    ])
+
+
+def start_instances(db: Session, templates, user_id: int, now: datetime):
+    """
+    Create one instance per template with every start node running (parallel
+    branches start together). Templates must already be compiled-valid.
+    Returns the instances and their unsaved start executions.
+    """
+    instances = [
+        models.WorkflowInstance(
+            template_id=template.id,
+            current_node_id=get_compiled(template).start_node,
+            status=models.WorkflowStatus.RUNNING,
+            start_time=now
+        )
+        for template in templates
+    ]
+    db.add_all(instances)
+    db.flush()  # Assigns instance ids for the executions
+    executions = []
+    for instance, template in zip(instances, templates):
+        executions.extend(create_executions(instance, get_compiled(template).start_nodes, user_id, now))
+    return instances, executions
+
+
+def complete_node(db: Session, instance, executions, node_id, user_id: int, now: datetime):
+    """
+    Complete one running node of `instance` and start every successor whose
+    predecessors have now all completed (joins wait for every branch).
+
+    executions is the instance's full execution list; it is updated in place
+    so several completions on the same instance can be applied in one batch.
+    Returns (completed execution or None, newly created executions).
+    A node started earlier in the same batch (not inserted yet) cannot be
+    completed: it would get a zero duration and skew stats and training.
+    """
+    if instance.status != models.WorkflowStatus.RUNNING:
+        raise HTTPException(status_code=404, detail="Instance not found or not running")
+
+    running = [e for e in executions if e.status == models.NodeStatus.RUNNING]
+    if node_id is not None:
+        execution = next((e for e in running if e.node_id == node_id), None)
+        if execution is None:
+            raise HTTPException(status_code=409, detail=f"Node {node_id} is not running in instance {instance.id}")
+    elif len(running) > 1:
+        raise HTTPException(status_code=400, detail="Instance has parallel running nodes; specify node_id")
+    else:
+        execution = running[0] if running else None
+    if execution is not None and execution.id is None:
+        raise HTTPException(status_code=409, detail=f"Node {execution.node_id} was started in this batch; complete it in a later request")
+
+    created = []
+    if execution:
+        execution.end_time = now
+        execution.status = models.NodeStatus.COMPLETED
+        # Calculate actual duration
+        execution.actual_duration = int((execution.end_time - execution.start_time).total_seconds())
+        running.remove(execution)
+
+        # Start successors that are now unblocked
+        compiled = get_compiled(instance.template)
+        if execution.node_id in compiled.index:
+            completed = {e.node_id for e in executions if e.status == models.NodeStatus.COMPLETED}
+            started = {e.node_id for e in executions}
+            ready = compiled.ready_after(execution.node_id, completed, started)
+            created = create_executions(instance, ready, user_id, now)
+            executions.extend(created)
+            running.extend(created)
+
+    # Always write the instance row so its lock_version bumps, even when only
+    # one of several parallel branches finished
+    flag_modified(instance, "current_node_id")
+    if running:
+        instance.current_node_id = running[0].node_id
+    else:
+        # Finish process
+        instance.status = models.WorkflowStatus.COMPLETED
+        instance.end_time = now
+        instance.current_node_id = None
+    return execution, created
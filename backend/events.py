@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+
+from fastapi.encoders import jsonable_encoder
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+
+class Subscriber:
+    def __init__(self, loop, queue_size: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+
+class EventBus:
+    """
+    In-process fan-out of change events to SSE clients.
+
+    Endpoints publish after they commit (from worker threads); each event is
+    serialized once and handed to every subscriber's bounded queue on its
+    event loop. A subscriber that falls behind has its backlog discarded and
+    gets a single "resync" event telling the client to refetch snapshots,
+    so a slow browser never holds memory or slows down publishers.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type: str, data: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            seq = next(self._seq)
+            self.published += 1
+        if not subscribers:
+            return
+        message = format_sse(event_type, data, seq)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(self._offer, subscriber, message)
+            except RuntimeError:
+                # Loop already closed: the client went away
+                self.unsubscribe(subscriber)
+
+    def _offer(self, subscriber: Subscriber, message: str):
+        # Runs on the subscriber's event loop
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.dropped += 1
+            self.resyncs += 1
+            subscriber.queue.put_nowait(format_sse("resync", {}))
+
+    async def stream(self, subscriber: Subscriber, request, heartbeat: float = EVENT_HEARTBEAT_SECONDS):
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "queued": sum(s.queue.qsize() for s in subscribers),
+            "queue_size": self.queue_size,
+        }
+
+
+def format_sse(event_type: str, data: dict, seq: int = None) -> str:
+    lines = [f"event: {event_type}"]
+    if seq is not None:
+        lines.append(f"id: {seq}")
+    lines.append("data: " + json.dumps(jsonable_encoder(data), ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+
+def execution_delta(execution) -> dict:
+    return {
+        "node_id": execution.node_id,
+        "status": execution.status,
+        "executed_by": execution.executed_by,
+        "start_time": execution.start_time,
+        "end_time": execution.end_time,
+        "actual_duration": execution.actual_duration,
+        "predicted_duration": execution.predicted_duration,
+    }
+
+
+def instance_delta(instance, completed=None, started=()) -> dict:
+    return {
+        "id": instance.id,
+        "template_id": instance.template_id,
+        "status": instance.status,
+        "current_node_id": instance.current_node_id,
+        "start_time": instance.start_time,
+        "end_time": instance.end_time,
+        "completed": execution_delta(completed) if completed is not None else None,
+        "started": [execution_delta(e) for e in started],
+    }
+
+
+bus = EventBus()
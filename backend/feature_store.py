@@ -0,0 +1,202 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class FeatureEncoder:
+    """
+    Stable encoding of (node, template, user, start time) into model features.
+
+    Node ids go through a vocabulary that only grows: codes are handed out in
+    first-seen order and never change, and the vocabulary is stored with the
+    fitted models, so a code means the same node in every worker and after a
+    restart (unlike hash(), which is salted per process). Unseen nodes encode
+    as -1. Template and user ids are already stable integers (0 = unknown).
+    """
+
+    FEATURES = ("node_code", "template_id", "user_id", "hour", "weekday")
+    UNKNOWN = -1
+
+    def __init__(self, vocabulary: dict = None):
+        self.vocabulary = dict(vocabulary or {})
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def copy(self):
+        return FeatureEncoder(self.vocabulary)
+
+    def fit_node(self, node_id: str) -> int:
+        code = self.vocabulary.get(node_id)
+        if code is None:
+            code = self.vocabulary[node_id] = len(self.vocabulary)
+        return code
+
+    def node_codes(self, node_ids) -> np.ndarray:
+        # Encode each distinct node once and broadcast back to the rows
+        uniq, inverse = np.unique(np.asarray(node_ids, dtype=object), return_inverse=True)
+        codes = np.fromiter((self.vocabulary.get(u, self.UNKNOWN) for u in uniq), dtype=np.int64, count=len(uniq))
+        return codes[inverse.reshape(-1)]
+
+    def transform(self, node_ids, template_ids, user_ids, start_times) -> np.ndarray:
+        n = len(node_ids)
+        X = np.empty((n, len(self.FEATURES)), dtype=np.int64)
+        if n == 0:
+            return X
+        X[:, 0] = self.node_codes(node_ids)
+        X[:, 1] = np.fromiter((t or 0 for t in template_ids), dtype=np.int64, count=n)
+        X[:, 2] = np.fromiter((u or 0 for u in user_ids), dtype=np.int64, count=n)
+        X[:, 3] = np.fromiter((t.hour for t in start_times), dtype=np.int64, count=n)
+        X[:, 4] = np.fromiter((t.weekday() for t in start_times), dtype=np.int64, count=n)
+        return X
+
+
+def has_rows_after(db: Session, high_water: dict) -> bool:
+    """Whether completed executions exist past a high_water() mark (None = any at all)"""
+    E = models.NodeExecution
+    query = db.query(E.id).filter(E.status == models.NodeStatus.COMPLETED, E.actual_duration != None)
+    if high_water and high_water.get("max_end_time"):
+        max_end_time = datetime.fromisoformat(high_water["max_end_time"])
+        query = query.filter(or_(E.end_time > max_end_time, E.id > high_water["max_id"]))
+    return query.first() is not None
+
+
+class FeatureStore:
+    """
+    Columnar, incrementally refreshed training set for the duration predictor.
+
+    Each refresh only fetches completed executions past the high-water mark
+    (end_time, with a short overlap for late commits, or id for rows inserted
+    with back-dated timestamps) and appends them to preallocated NumPy
+    columns. An optional row cap and time window drop the oldest rows.
+    """
+
+    FEATURES = FeatureEncoder.FEATURES
+    DTYPES = {
+        "id": np.int64,
+        "node_code": np.int64,
+        "template_id": np.int64,
+        "user_id": np.int64,
+        "hour": np.int64,
+        "weekday": np.int64,
+        "duration": np.float64,
+        "end_ts": np.float64,
+    }
+
+    def __init__(self, max_rows: int = None, window_days: float = None, overlap_seconds: float = 60):
+        self.max_rows = max_rows
+        self.window_days = window_days
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._capacity = 0
+        self._start = 0
+        self._size = 0
+        self._data = {name: np.empty(0, dtype=dtype) for name, dtype in self.DTYPES.items()}
+        self.node_ids = np.empty(0, dtype=object)
+        self.max_id = 0
+        self.max_end_time = None
+        self._recent = {} # id -> end_time inside the overlap window, to skip re-reads
+        self.encoder = FeatureEncoder()
+        self.version = 0
+
+    def __len__(self):
+        return self._size - self._start
+
+    def column(self, name: str) -> np.ndarray:
+        if name == "node_id":
+            return self.node_ids[self._start:self._size]
+        return self._data[name][self._start:self._size]
+
+    def high_water(self) -> dict:
+        return {
+            "max_id": self.max_id,
+            "max_end_time": self.max_end_time.isoformat() if self.max_end_time else None,
+        }
+
+    def training_data(self):
+        """(X, y, encoder) snapshot; the encoder copy matches the node codes in X"""
+        with self._lock:
+            X = np.column_stack([self.column(name) for name in self.FEATURES])
+            y = self.column("duration").copy()
+            encoder = self.encoder.copy()
+        return X, y, encoder
+
+    def refresh(self, db: Session) -> int:
+        with self._lock:
+            rows = self._fetch_new_rows(db)
+            if rows:
+                self._append(rows)
+            self._apply_window()
+            if rows:
+                self.version += 1
+            return len(rows)
+
+    def _fetch_new_rows(self, db: Session):
+        E, I = models.NodeExecution, models.WorkflowInstance
+        query = db.query(
+            E.id, E.node_id, E.executed_by, E.start_time, E.end_time, E.actual_duration, I.template_id
+        ).outerjoin(I, I.id == E.instance_id).filter(
+            E.status == models.NodeStatus.COMPLETED,
+            E.actual_duration != None
+        )
+        if self.max_end_time is not None:
+            query = query.filter(or_(E.end_time >= self.max_end_time - self.overlap, E.id > self.max_id))
+        if self.window_days is not None:
+            query = query.filter(E.end_time >= datetime.now() - timedelta(days=self.window_days))
+        rows = [r for r in query.order_by(E.end_time, E.id).all() if r.id not in self._recent]
+
+        for r in rows:
+            if r.end_time is not None and (self.max_end_time is None or r.end_time > self.max_end_time):
+                self.max_end_time = r.end_time
+            self.max_id = max(self.max_id, r.id)
+            self._recent[r.id] = r.end_time
+        if self.max_end_time is not None:
+            horizon = self.max_end_time - self.overlap
+            self._recent = {i: t for i, t in self._recent.items() if t is not None and t >= horizon}
+        return rows
+
+    def _append(self, rows):
+        n = len(rows)
+        if self._size + n > self._capacity:
+            self._grow(self._size + n)
+        end = self._size + n
+        self._data["id"][self._size:end] = [r.id for r in rows]
+        self._data["node_code"][self._size:end] = [self.encoder.fit_node(r.node_id) for r in rows]
+        self._data["template_id"][self._size:end] = [r.template_id or 0 for r in rows]
+        self._data["user_id"][self._size:end] = [r.executed_by or 0 for r in rows]
+        self._data["hour"][self._size:end] = [r.start_time.hour for r in rows]
+        self._data["weekday"][self._size:end] = [r.start_time.weekday() for r in rows]
+        self._data["duration"][self._size:end] = [r.actual_duration for r in rows]
+        self._data["end_ts"][self._size:end] = [r.end_time.timestamp() if r.end_time else 0 for r in rows]
+        self.node_ids[self._size:end] = [r.node_id for r in rows]
+        self._size = end
+
+    def _grow(self, needed: int):
+        live = self._size - self._start
+        capacity = max(1024, needed - self._start, 2 * live)
+        for name, column in self._data.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:live] = column[self._start:self._size]
+            self._data[name] = grown
+        grown = np.empty(capacity, dtype=object)
+        grown[:live] = self.node_ids[self._start:self._size]
+        self.node_ids = grown
+        self._capacity = capacity
+        self._start = 0
+        self._size = live
+
+    def _apply_window(self):
+        # Rows are appended in end_time order, so the oldest rows sit at the front
+        if self.window_days is not None and len(self):
+            cutoff = (datetime.now() - timedelta(days=self.window_days)).timestamp()
+            self._start += int(np.searchsorted(self.column("end_ts"), cutoff))
+        if self.max_rows is not None and len(self) > self.max_rows:
+            self._start = self._size - self.max_rows
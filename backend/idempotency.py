@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from . import models
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# Expired records are deleted at most this often per process, by the request that notices
+IDEMPOTENCY_PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "3600"))
+MAX_KEY_LENGTH = 100
+
+_purge_lock = threading.Lock()
+_last_purge = None
+
+
+def validate_key(key: Optional[str]):
+    if key is not None and (not key or len(key) > MAX_KEY_LENGTH):
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+
+def lookup(db: Session, key: str, user_id: int, scope: str) -> Optional[JSONResponse]:
+    """Return the stored response for a replayed key, or None if the request is new"""
+    record = db.query(models.IdempotencyRecord).filter(
+        models.IdempotencyRecord.user_id == user_id,
+        models.IdempotencyRecord.scope == scope,
+        models.IdempotencyRecord.key == key
+    ).first()
+    if record is None:
+        return None
+    if record.created_at and record.created_at < datetime.now() - timedelta(hours=IDEMPOTENCY_TTL_HOURS):
+        db.delete(record)
+        db.commit()
+        return None
+    return JSONResponse(content=record.response, headers={"Idempotent-Replayed": "true"})
+
+
+def remember(db: Session, key: str, user_id: int, scope: str, response: dict):
+    """
+    Store the response in the caller's transaction. The unique key makes a
+    concurrent duplicate fail at commit, so only one of them takes effect.
+    """
+    db.add(models.IdempotencyRecord(
+        user_id=user_id, scope=scope, key=key,
+        response=jsonable_encoder(response), created_at=datetime.now()
+    ))
+
+
+def purge_expired(db: Session) -> int:
+    """Delete records older than IDEMPOTENCY_TTL_HOURS; returns how many"""
+    cutoff = datetime.now() - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    deleted = db.query(models.IdempotencyRecord).filter(
+        models.IdempotencyRecord.created_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def maybe_purge(db: Session) -> Optional[int]:
+    """purge_expired() if IDEMPOTENCY_PURGE_SECONDS passed since this process last did; None when skipped"""
+    global _last_purge
+    now = time.monotonic()
+    with _purge_lock:
+        if _last_purge is not None and now - _last_purge < IDEMPOTENCY_PURGE_SECONDS:
+            return None
+        _last_purge = now
+    try:
+        return purge_expired(db)
+    except Exception as e:
+        db.rollback()
+        print(f"Purging idempotency records failed: {e}")
+        return None
@@ -1,17 +1,31 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, File, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, HTTPException, status, Request, File, UploadFile, Header
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
 from datetime import datetime, timedelta
 import random
+import csv
+import io
+import json
 
-from . import models, schemas, database, auth, prediction
+from . import models, schemas, database, auth, prediction, training, stats, audit, workflow, engine, idempotency, events, cache, migrations, metrics, model_registry, model_benchmark, accuracy, sla
 
 models.Base.metadata.create_all(bind=database.engine)
+# Bring databases created by older versions up to the current models
+migrations.upgrade(database.engine)
 
 app = FastAPI(title="Business Process Data Management System")
 
+# Attempts for a node completion that loses an optimistic-lock race
+COMPLETE_NODE_RETRIES = 5
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -19,41 +33,120 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event("startup")
+def build_stats_rollup():
+    db = database.SessionLocal()
+    try:
+        stats.ensure_built(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_training_worker():
+    # Reuse the latest published models; retrain in the background only if they are missing or stale
+    training.trainer.warm_start()
+    training.trainer.start()
+
+@app.on_event("shutdown")
+def stop_training_worker():
+    training.trainer.stop()
+
+@app.on_event("startup")
+def start_sla_scanner():
+    sla.scanner.start()
+
+@app.on_event("shutdown")
+def stop_sla_scanner():
+    sla.scanner.stop()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    auth.password_hasher.shutdown()
+
+@app.on_event("startup")
+def start_audit_log():
+    audit.audit_log.start()
+
+@app.on_event("shutdown")
+def drain_audit_log():
+    audit.audit_log.stop()
+
+@app.on_event("shutdown")
+async def dispose_async_engines():
+    await database.async_engine.dispose()
+    if database.async_read_engine is not database.async_engine:
+        await database.async_read_engine.dispose()
 
 # --- Helper: Log Action ---
 def log_action(db: Session, user_id: int, action: str, details: str = None):
-    log = models.SystemLog(user_id=user_id, action=action, details=details)
-    db.add(log)
-    db.commit()
+    # Buffered mode batches SystemLog inserts in the background instead of a second commit here
+    audit.audit_log.record(db, user_id, action, details)
+
+# --- Helper: Push Events ---
+def publish_template(action: str, template):
+    data = {"action": action, "template_id": template.id}
+    if action != "deleted":
+        data["template"] = schemas.TemplateResponse.model_validate(template)
+    events.bus.publish("template.changed", data)
+
+def publish_progress(deltas):
+    # deltas are events.instance_delta dicts built before the commit expired the rows
+    cache.response_cache.invalidate("dashboard")
+    finished = 0
+    for delta in deltas:
+        if delta["status"] == models.WorkflowStatus.COMPLETED:
+            finished += 1
+            events.bus.publish("instance.completed", delta)
+        else:
+            events.bus.publish("instance.advanced", delta)
+    if finished:
+        events.bus.publish("counters", {"active_instances": -finished, "completed_today": finished})
+
+def publish_started(deltas):
+    cache.response_cache.invalidate("dashboard")
+    for delta in deltas:
+        events.bus.publish("instance.started", delta)
+    if deltas:
+        events.bus.publish("counters", {"total_workflows": len(deltas), "active_instances": len(deltas)})
 
 # --- Auth ---
+def get_user_by_username(db: Session, username: str):
+    return db.query(models.User).filter(models.User.username == username).first()
+
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+    # Sync DB work goes to the threadpool and bcrypt to the hashing pool,
+    # so this coroutine never blocks the event loop
+    user = await run_in_threadpool(get_user_by_username, db, form_data.username)
+    if not user or not await auth.password_hasher.verify(form_data.password, user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     
-    access_token = auth.create_access_token(data={"sub": user.username})
+    user_id, username, role = user.id, user.username, user.role
+    access_token = auth.create_access_token(data={"sub": username})
     
     # Log Login
-    log_action(db, user.id, "LOGIN", "User logged in successfully")
+    await run_in_threadpool(log_action, db, user_id, "LOGIN", "User logged in successfully")
     
-    return {"access_token": access_token, "token_type": "bearer", "role": user.role}
+    return {"access_token": access_token, "token_type": "bearer", "role": role}
 
-@app.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = auth.get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     new_user = models.User(username=user.username, password_hash=hashed_password, role=user.role)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
-    
+    auth.user_cache.invalidate(new_user.username)
     log_action(db, new_user.id, "REGISTER", f"New user registered: {user.username}")
-    
-    return new_user
+    return schemas.UserResponse.model_validate(new_user)
+
+@app.post("/register", response_model=schemas.UserResponse)
+async def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    # Same split as /token: sync DB work on the threadpool, bcrypt on the hashing pool
+    if await run_in_threadpool(get_user_by_username, db, user.username):
+        raise HTTPException(status_code=400, detail="Username already registered")
+    hashed_password = await auth.password_hasher.hash(user.password)
+    return await run_in_threadpool(create_user, db, user, hashed_password)
 
 @app.get("/users/me", response_model=schemas.UserResponse)
 def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
@@ -79,28 +172,42 @@ def delete_user(id: int, db: Session = Depends(database.get_db), current_user: m
         
     db.delete(user)
     db.commit()
+    auth.user_cache.invalidate(user.username)
     
     log_action(db, current_user.id, "DELETE_USER", f"Deleted user: {user.username}")
     
     return {"status": "success"}
 
+@app.get("/users/cache")
+def get_auth_stats(current_user: models.User = Depends(auth.get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view cache stats")
+    return {"user_cache": auth.user_cache.stats(), "password_hasher": auth.password_hasher.stats()}
+
 # --- Process Templates ---
 @app.post("/templates", response_model=schemas.TemplateResponse)
 def create_template(template: schemas.TemplateCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can create templates")
+    engine.get_compiled(graph_json=template.graph_json)
     new_template = models.WorkflowTemplate(name=template.name, graph_json=template.graph_json)
     db.add(new_template)
     db.commit()
     db.refresh(new_template)
     
+    cache.response_cache.invalidate("templates")
+    publish_template("created", new_template)
     log_action(db, current_user.id, "CREATE_TEMPLATE", f"Created template: {template.name}")
     
     return new_template
 
 @app.get("/templates", response_model=list[schemas.TemplateResponse])
-def get_templates(db: Session = Depends(database.get_db)):
-    return db.query(models.WorkflowTemplate).filter(models.WorkflowTemplate.is_deleted == 0).all()
+async def get_templates(request: Request, db: AsyncSession = Depends(database.get_async_db)):
+    # Served from the response cache until a template is created, updated or deleted
+    async def load():
+        rows = await db.scalars(select(models.WorkflowTemplate).where(models.WorkflowTemplate.is_deleted == 0))
+        return [schemas.TemplateResponse.model_validate(t) for t in rows]
+    return await cache.response_cache.respond_async(request, "templates", load)
 
 @app.put("/templates/{id}", response_model=schemas.TemplateResponse)
 def update_template(id: int, template: schemas.TemplateCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
@@ -110,6 +217,7 @@ def update_template(id: int, template: schemas.TemplateCreate, db: Session = Dep
     db_template = db.query(models.WorkflowTemplate).filter(models.WorkflowTemplate.id == id, models.WorkflowTemplate.is_deleted == 0).first()
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
+    engine.get_compiled(graph_json=template.graph_json)
     
     # Version control: Increment version
     db_template.version += 1
@@ -118,6 +226,9 @@ def update_template(id: int, template: schemas.TemplateCreate, db: Session = Dep
     
     db.commit()
     db.refresh(db_template)
+    workflow.template_cache.invalidate(db_template.id)
+    cache.response_cache.invalidate("templates")
+    publish_template("updated", db_template)
     
     log_action(db, current_user.id, "UPDATE_TEMPLATE", f"Updated template: {template.name} to v{db_template.version}")
     
@@ -135,6 +246,9 @@ def delete_template(id: int, db: Session = Depends(database.get_db), current_use
     # Soft Delete Implementation
     db_template.is_deleted = 1
     db.commit()
+    workflow.template_cache.invalidate(id)
+    cache.response_cache.invalidate("templates")
+    publish_template("deleted", db_template)
     
     log_action(db, current_user.id, "DELETE_TEMPLATE", f"Soft deleted template id: {id}")
     
@@ -147,135 +261,302 @@ def start_instance(instance_in: schemas.InstanceCreate, db: Session = Depends(da
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    # Logic to start first node
-    nodes = template.graph_json.get("nodes", [])
-    if not nodes:
-        raise HTTPException(status_code=400, detail="Invalid template: no nodes")
-    
-    start_node = nodes[0] # Simplification: Assume linear or ordered list for now
-    
-    new_instance = models.WorkflowInstance(
-        template_id=template.id,
-        current_node_id=start_node["id"],
-        status=models.WorkflowStatus.RUNNING
-    )
-    db.add(new_instance)
+    # Every node without predecessors starts immediately (parallel branches)
+    engine.get_compiled(template)
+    (new_instance,), executions = engine.start_instances(db, [template], current_user.id, datetime.now())
+    engine.assign_predictions(executions, [new_instance])
+    engine.insert_executions(db, executions)
+    delta = events.instance_delta(new_instance, started=executions)
     db.commit()
     db.refresh(new_instance)
-
-    # Predict duration
-    pred = prediction.predictor.predict(start_node["id"], current_user.id, datetime.now())
-
-    # Create first execution record
-    execution = models.NodeExecution(
-        instance_id=new_instance.id,
-        node_id=start_node["id"],
-        executed_by=current_user.id,
-        status=models.NodeStatus.RUNNING,
-        start_time=datetime.now(),
-        predicted_duration=pred
-    )
-    db.add(execution)
-    db.commit()
+    publish_started([delta])
     
     log_action(db, current_user.id, "START_INSTANCE", f"Started instance {new_instance.id} from template {template.name}")
 
     return new_instance
 
-@app.get("/instances", response_model=list[schemas.InstanceResponse])
-def get_instances(db: Session = Depends(database.get_db)):
-    return db.query(models.WorkflowInstance).all()
+@app.post("/instances/bulk")
+def start_instances_bulk(req: schemas.BulkInstanceCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    """
+    Start many instances in one transaction with one prediction call and one
+    audit entry. Returns a per-item result; failed items do not abort the batch.
+    """
+    if len(req.items) > schemas.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {schemas.BULK_MAX_ITEMS} items per request")
+    template_ids = {item.template_id for item in req.items}
+    templates = {t.id: t for t in db.query(models.WorkflowTemplate).filter(
+        models.WorkflowTemplate.id.in_(template_ids), models.WorkflowTemplate.is_deleted == 0
+    )}
+
+    results, valid = [], []
+    for index, item in enumerate(req.items):
+        result = {"index": index, "template_id": item.template_id}
+        template = templates.get(item.template_id)
+        try:
+            if template is None:
+                raise HTTPException(status_code=404, detail="Template not found")
+            engine.get_compiled(template)
+        except HTTPException as e:
+            results.append({**result, "ok": False, "error": e.detail})
+            continue
+        results.append({**result, "ok": True})
+        valid.append(template)
+
+    # One flush for the instances, one prediction call and one executemany for the executions
+    started, executions = engine.start_instances(db, valid, current_user.id, datetime.now())
+    engine.assign_predictions(executions, started)
+    engine.insert_executions(db, executions)
+    instance_ids = iter([i.id for i in started])
+    for r in results:
+        if r["ok"]:
+            r["instance_id"] = next(instance_ids)
+    by_instance = {i.id: [] for i in started}
+    for e in executions:
+        by_instance[e.instance_id].append(e)
+    deltas = [events.instance_delta(i, started=by_instance[i.id]) for i in started]
+    db.commit()
+    publish_started(deltas)
+
+    if started:
+        log_action(db, current_user.id, "BULK_START_INSTANCE", f"Started {len(started)} instances ({len(req.items) - len(started)} failed)")
+    return {"started": len(started), "failed": len(req.items) - len(started), "results": results}
+
+@app.get("/instances", response_model=schemas.InstancePage)
+async def get_instances(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    template_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    include_executions: bool = True,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Newest-first keyset pagination over instance ids: pass the returned
+    next_cursor back as ?cursor= to get the following page.
+    """
+    limit = max(1, min(limit, 500))
+    query = select(models.WorkflowInstance)
+    if cursor is not None:
+        try:
+            query = query.where(models.WorkflowInstance.id < int(cursor))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if status:
+        query = query.where(models.WorkflowInstance.status == status)
+    if template_id is not None:
+        query = query.where(models.WorkflowInstance.template_id == template_id)
+    if start_from:
+        query = query.where(models.WorkflowInstance.start_time >= start_from)
+    if start_to:
+        query = query.where(models.WorkflowInstance.start_time < start_to)
+    if include_executions:
+        # One extra IN query for the whole page instead of one lazy load per instance
+        query = query.options(selectinload(models.WorkflowInstance.executions))
+
+    rows = (await db.scalars(query.order_by(models.WorkflowInstance.id.desc()).limit(limit + 1))).all()
+    page = rows[:limit]
+    item_schema = schemas.InstanceResponse if include_executions else schemas.InstanceSummary
+    return {
+        "items": [item_schema.model_validate(i) for i in page],
+        "next_cursor": page[-1].id if len(rows) > limit else None
+    }
 
-@app.post("/instances/{id}/complete_node")
-def complete_node(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
-    instance = db.query(models.WorkflowInstance).filter(models.WorkflowInstance.id == id).first()
+def complete_node_once(db: Session, id: int, node_id, user_id: int, idempotency_key=None):
+    # FOR UPDATE serializes completions where supported (MySQL); the instance's
+    # lock_version catches lost updates everywhere else (SQLite)
+    instance = db.query(models.WorkflowInstance).filter(models.WorkflowInstance.id == id).with_for_update().first()
     if not instance or instance.status != models.WorkflowStatus.RUNNING:
         raise HTTPException(status_code=404, detail="Instance not found or not running")
 
-    # Find current execution
-    execution = db.query(models.NodeExecution).filter(
-        models.NodeExecution.instance_id == id,
-        models.NodeExecution.status == models.NodeStatus.RUNNING
-    ).first()
-
+    executions = db.query(models.NodeExecution).filter(models.NodeExecution.instance_id == id).order_by(models.NodeExecution.id).all()
+    execution, created = engine.complete_node(db, instance, executions, node_id, user_id, datetime.now())
+    engine.assign_predictions(created, [instance])
+    engine.insert_executions(db, created)
     if execution:
-        execution.end_time = datetime.now()
-        execution.status = models.NodeStatus.COMPLETED
-        # Calculate actual duration
-        duration = (execution.end_time - execution.start_time).total_seconds()
-        execution.actual_duration = int(duration)
-        db.commit()
+        stats.record_completion(db, execution, instance.template_id)
 
-        # Retrain model periodically (simplification: just call train)
-        # In production this would be async
+    response = {
+        "status": "success",
+        "node_id": execution.node_id if execution else None,
+        "started_node_ids": [e.node_id for e in created],
+        "instance_status": instance.status
+    }
+    if idempotency_key:
+        idempotency.remember(db, idempotency_key, user_id, f"complete_node:{id}", response)
+    delta = events.instance_delta(instance, execution, created)
+    observed = accuracy.observation(execution, instance.template_id) if execution else None
+    db.commit()
+    if observed:
+        accuracy.monitor.observe(*observed)
+    return response, delta
+
+@app.post("/instances/{id}/complete_node")
+def complete_node(
+    id: int,
+    node_id: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Complete one running node of an instance and start every successor whose
+    predecessors are now all complete. node_id is required when the instance
+    has several nodes running in parallel. Requests repeated with the same
+    Idempotency-Key return the first response without completing again.
+    """
+    idempotency.validate_key(idempotency_key)
+    scope = f"complete_node:{id}"
+    for attempt in range(COMPLETE_NODE_RETRIES):
+        if idempotency_key:
+            replay = idempotency.lookup(db, idempotency_key, current_user.id, scope)
+            if replay is not None:
+                return replay
         try:
-            prediction.predictor.train(db)
-        except:
-            pass
-
-    # Move to next node
-    # Find next node in template
-    template = instance.template
-    nodes = template.graph_json.get("nodes", [])
-    current_node_index = -1
-    for i, node in enumerate(nodes):
-        if node["id"] == instance.current_node_id:
-            current_node_index = i
+            response, delta = complete_node_once(db, id, node_id, current_user.id, idempotency_key)
             break
-    
-    if current_node_index != -1 and current_node_index < len(nodes) - 1:
-        next_node = nodes[current_node_index + 1]
-        instance.current_node_id = next_node["id"]
-        
-        # Create new execution for next node
-        pred = prediction.predictor.predict(next_node["id"], current_user.id, datetime.now())
-        new_exec = models.NodeExecution(
-            instance_id=instance.id,
-            node_id=next_node["id"],
-            executed_by=current_user.id, # Simplification: Auto-assigned to current user or need assignment logic
-            status=models.NodeStatus.RUNNING,
-            start_time=datetime.now(),
-            predicted_duration=pred
-        )
-        db.add(new_exec)
+        except (StaleDataError, IntegrityError, OperationalError):
+            # Lost a race with another completion (or a duplicate key): re-read and retry
+            db.rollback()
     else:
-        # Finish process
-        instance.status = models.WorkflowStatus.COMPLETED
-        instance.end_time = datetime.now()
-        instance.current_node_id = None
+        raise HTTPException(status_code=409, detail="Instance was modified concurrently, please retry")
+
+    publish_progress([delta])
+    if response["node_id"]:
+        # Retraining runs on the background worker according to its retrain policy
+        training.trainer.notify_completion()
+    log_action(db, current_user.id, "COMPLETE_TASK", f"Completed node {response['node_id'] or '-'} in instance {id}")
+    if idempotency_key:
+        idempotency.maybe_purge(db)
+    return response
+
+@app.post("/instances/complete_nodes/bulk")
+def complete_nodes_bulk(req: schemas.BulkCompleteRequest, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    """
+    Complete many nodes in one transaction. Items for the same instance are
+    applied in order; a node started by an earlier item is not completed
+    (it would get a zero duration) and that item fails instead.
+    """
+    if len(req.items) > schemas.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {schemas.BULK_MAX_ITEMS} items per request")
+    instance_ids = {item.instance_id for item in req.items}
+    # Lock in id order so concurrent batches cannot deadlock each other
+    instances = {i.id: i for i in db.query(models.WorkflowInstance).options(
+        selectinload(models.WorkflowInstance.template)
+    ).filter(models.WorkflowInstance.id.in_(instance_ids)).order_by(models.WorkflowInstance.id).with_for_update()}
+    executions = {i: [] for i in instances}
+    for e in db.query(models.NodeExecution).filter(models.NodeExecution.instance_id.in_(instance_ids)).order_by(models.NodeExecution.id):
+        executions[e.instance_id].append(e)
+
+    now = datetime.now()
+    results, completed, created_all = [], [], []
+    progress = {}  # instance id -> (instance, completed executions, started executions)
+    for index, item in enumerate(req.items):
+        result = {"index": index, "instance_id": item.instance_id, "node_id": item.node_id}
+        instance = instances.get(item.instance_id)
+        if instance is None:
+            results.append({**result, "ok": False, "error": "Instance not found or not running"})
+            continue
+        try:
+            execution, created = engine.complete_node(db, instance, executions[instance.id], item.node_id, current_user.id, now)
+        except HTTPException as e:
+            results.append({**result, "ok": False, "error": e.detail})
+            continue
+        if execution:
+            completed.append((execution, instance.template_id))
+        created_all.extend(created)
+        _, done, new = progress.setdefault(instance.id, (instance, [], []))
+        if execution:
+            done.append(execution)
+        new.extend(created)
+        results.append({
+            **result,
+            "ok": True,
+            "node_id": execution.node_id if execution else None,
+            "started_node_ids": [e.node_id for e in created],
+            "instance_status": instance.status
+        })
 
-    db.commit()
-    log_action(db, current_user.id, "COMPLETE_TASK", f"Completed node in instance {id}")
-    return {"status": "success"}
+    engine.assign_predictions(created_all, instances.values())
+    engine.insert_executions(db, created_all)
+    stats.record_completions(db, completed)
+    deltas = []
+    for instance, done, new in progress.values():
+        delta = events.instance_delta(instance, done[-1] if done else None, new)
+        # A batch can finish several steps of one instance; send them all
+        delta["completed_all"] = [events.execution_delta(e) for e in done]
+        deltas.append(delta)
+    observed = [accuracy.observation(e, t) for e, t in completed]
+    try:
+        db.commit()
+    except (StaleDataError, OperationalError):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Instances were modified concurrently, please retry the batch")
+    publish_progress(deltas)
+    accuracy.monitor.observe_many(observed)
+
+    if completed:
+        training.trainer.notify_completion(len(completed))
+    succeeded = sum(1 for r in results if r["ok"])
+    if succeeded:
+        log_action(db, current_user.id, "BULK_COMPLETE_TASK", f"Completed {succeeded} nodes ({len(results) - succeeded} failed)")
+    return {"completed": succeeded, "failed": len(results) - succeeded, "results": results}
+
+# --- Live Updates ---
+@app.get("/events")
+async def stream_events(request: Request, token: Optional[str] = None, authorization: Optional[str] = Header(None)):
+    """
+    Server-sent events with incremental changes: instance.started,
+    instance.advanced, instance.completed, template.changed and counters
+    (deltas for the dashboard KPIs). EventSource cannot send headers, so the
+    JWT may also be passed as ?token=. On a "resync" event the client should
+    refetch its snapshots.
+    """
+    if token is None and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    # Own short-lived session: a get_db dependency would hold a connection for the whole stream
+    db = database.SessionLocal()
+    try:
+        await run_in_threadpool(auth.get_current_user, token, db)
+    finally:
+        db.close()
+
+    subscriber = events.bus.subscribe()
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events.bus.stream(subscriber, request), media_type="text/event-stream", headers=headers)
+
+@app.get("/events/stats")
+def get_event_stats(current_user: models.User = Depends(auth.get_current_user)):
+    return events.bus.stats()
 
 @app.get("/dashboard/stats")
-def get_stats(db: Session = Depends(database.get_db)):
+async def get_stats(request: Request, db: AsyncSession = Depends(database.get_async_read_db)):
+    # run_sync reuses the Session-based helpers while the queries await on the event loop
+    return await cache.response_cache.respond_async(request, "dashboard", lambda: db.run_sync(compute_stats))
+
+def compute_stats(db: Session):
     total_instances = db.query(models.WorkflowInstance).count()
     active_instances = db.query(models.WorkflowInstance).filter(models.WorkflowInstance.status == models.WorkflowStatus.RUNNING).count()
     
-    # Prediction accuracy stats
-    executions = db.query(models.NodeExecution).filter(models.NodeExecution.actual_duration != None).all()
-    accuracy_data = []
-    for ex in executions:
-        accuracy_data.append({
-            "id": ex.id,
-            "actual": ex.actual_duration,
-            "predicted": ex.predicted_duration
-        })
-
+    # Prediction accuracy stats: daily averages from the rollup table (bounded size)
     return {
         "total_instances": total_instances,
         "active_instances": active_instances,
-        "accuracy_data": accuracy_data
+        "accuracy_data": stats.by_day(db),
+        "by_template": stats.by_template(db)
     }
 
 @app.get("/dashboard/overview")
-def get_overview(db: Session = Depends(database.get_db)):
+async def get_overview(request: Request, db: AsyncSession = Depends(database.get_async_read_db)):
     """
-    获取运营指挥中心所需的真实统计数据
+    获取运营指挥中心所需的真实统计数据 (缓存, 实例启动/节点完成时失效)
     """
-    from datetime import datetime, timedelta
-    
+    return await cache.response_cache.respond_async(request, "dashboard", lambda: db.run_sync(compute_overview))
+
+def compute_overview(db: Session):
     # 1. 总流程数 (所有实例数量)
     total_workflows = db.query(models.WorkflowInstance).count()
     
@@ -291,18 +572,8 @@ def get_overview(db: Session = Depends(database.get_db)):
         models.WorkflowInstance.end_time >= today_start
     ).count()
     
-    # 4. 平均耗时 (所有已完成实例的平均耗时，单位：分钟)
-    completed_executions = db.query(models.NodeExecution).filter(
-        models.NodeExecution.status == models.NodeStatus.COMPLETED,
-        models.NodeExecution.actual_duration != None
-    ).all()
-    
-    if completed_executions:
-        total_duration = sum(ex.actual_duration for ex in completed_executions)
-        avg_duration_seconds = total_duration / len(completed_executions)
-        avg_duration_minutes = round(avg_duration_seconds / 60, 1)
-    else:
-        avg_duration_minutes = 0
+    # 4. 平均耗时 (所有已完成节点的平均耗时，单位：分钟；读取汇总表而非逐行加载)
+    avg_duration_minutes = round(stats.average_duration(db) / 60, 1)
     
     return {
         "total_workflows": total_workflows,
@@ -311,29 +582,260 @@ def get_overview(db: Session = Depends(database.get_db)):
         "average_duration": avg_duration_minutes
     }
 
+@app.get("/dashboard/nodes")
+async def get_node_stats(db: AsyncSession = Depends(database.get_async_read_db)):
+    return await db.run_sync(stats.by_node)
+
+def benchmark_report():
+    # Serving model's holdout metrics, plus the cross-validated comparison under "benchmark";
+    # the benchmark thread refreshes its own feature store from the replica, not this request
+    return {**prediction.predictor.get_metrics(), "benchmark": model_benchmark.engine.report(model_benchmark.store)}
+
 @app.get("/analytics/benchmarks")
-def get_benchmarks(db: Session = Depends(database.get_db)):
-    # Ensure model is trained (lazy training if needed, though usually done on completion)
-    if not prediction.predictor.is_trained:
-        prediction.predictor.train(db)
-        
-    return prediction.predictor.get_metrics()
+async def get_benchmarks(request: Request):
+    # Retraining and finished benchmark runs invalidate this entry
+    async def report():
+        return await run_in_threadpool(benchmark_report)
+    return await cache.response_cache.respond_async(request, "analytics", report)
+
+@app.get("/analytics/accuracy")
+def get_prediction_accuracy(limit: int = 20):
+    # Rolling prediction error per template and node (worst `limit` nodes) since the current model went live
+    return accuracy.monitor.report(max(0, min(limit, 500)))
+
+@app.get("/analytics/at-risk")
+def get_at_risk_instances(limit: int = 50, min_probability: Optional[float] = None, refresh: bool = False):
+    """
+    Running instances likely to miss their SLA (template graph_json
+    "sla_seconds", or SLA_DEFAULT_SECONDS), by breach probability. Served
+    from the periodic background scan; refresh=true scans now.
+    """
+    return sla.scanner.report(max(0, min(limit, 1000)), min_probability, refresh)
+
+@app.get("/analytics/training")
+def get_training_status():
+    return training.trainer.status()
+
+@app.get("/analytics/models")
+def get_model_registry():
+    # Published model versions with their metrics and dataset high-water marks
+    return model_registry.registry.stats()
+
+# --- Prediction API ---
+@app.post("/predict/batch")
+def predict_batch(req: schemas.BatchPredictionRequest, current_user: models.User = Depends(auth.get_current_user)):
+    now = datetime.now()
+    args = (
+        [item.node_id for item in req.items],
+        [item.user_id if item.user_id is not None else current_user.id for item in req.items],
+        [item.start_time or now for item in req.items],
+        [item.template_id for item in req.items]
+    )
+    if not req.quantiles:
+        return {"predictions": prediction.predictor.predict_many(*args).tolist()}
+    if any(not 0 < q < 1 for q in req.quantiles):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    point, quantiles = prediction.predictor.predict_distribution(*args)
+    table = prediction.at_levels(quantiles, req.quantiles)
+    return {
+        "predictions": point.astype(int).tolist(),
+        "quantiles": {str(q): table[:, k].astype(int).tolist() for k, q in enumerate(req.quantiles)}
+    }
+
+@app.post("/predict/forecast")
+def forecast_instances(req: schemas.ForecastRequest, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    """
+    Forecast the remaining nodes of running instances (all of them by default)
+    with a single batched model call. Remaining time follows the critical path
+    through parallel branches.
+    """
+    E, I = models.NodeExecution, models.WorkflowInstance
+    query = db.query(E.instance_id, E.node_id, E.status, E.start_time, E.executed_by, I.template_id).join(I, I.id == E.instance_id).filter(
+        I.status == models.WorkflowStatus.RUNNING
+    )
+    if req.instance_ids is not None:
+        query = query.filter(I.id.in_(req.instance_ids))
+
+    instances = {}
+    for row in query:
+        inst = instances.setdefault(row.instance_id, {"template_id": row.template_id, "user_id": row.executed_by, "running": {}, "done": set()})
+        if row.status == models.NodeStatus.RUNNING:
+            inst["running"][row.node_id] = row.start_time
+            inst["user_id"] = row.executed_by
+        else:
+            inst["done"].add(row.node_id)
+
+    template_ids = {inst["template_id"] for inst in instances.values()}
+    templates = {t.id: workflow.compile_template(t) for t in db.query(models.WorkflowTemplate).filter(models.WorkflowTemplate.id.in_(template_ids))}
+
+    ids = list(instances)
+    jobs = [(templates[instances[i]["template_id"]], instances[i]["user_id"], instances[i]["running"], instances[i]["done"]) for i in ids]
+    now = datetime.now()
+    results = []
+    for instance_id, (durations, remaining_seconds) in zip(ids, prediction.predictor.forecast_graphs(jobs, now)):
+        results.append({
+            "instance_id": instance_id,
+            "running_node_ids": list(instances[instance_id]["running"]),
+            "remaining_nodes": [{"node_id": n, "predicted_duration": d} for n, d in durations.items()],
+            "remaining_seconds": remaining_seconds,
+            "eta": now + timedelta(seconds=remaining_seconds)
+        })
+    return results
 
 # --- System Logs API ---
+def encode_log_cursor(log_row) -> str:
+    return f"{log_row.created_at.isoformat()}_{log_row.id}"
+
+def decode_log_cursor(cursor: str):
+    try:
+        created_at, log_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def query_logs(user_id=None, action=None, since=None, until=None, cursor=None):
+    L = models.SystemLog
+    # Outer join pulls the username in the same query instead of a lazy load per row
+    query = select(L.id, L.user_id, L.action, L.details, L.ip_address, L.created_at, models.User.username).outerjoin(
+        models.User, models.User.id == L.user_id
+    )
+    if user_id is not None:
+        query = query.where(L.user_id == user_id)
+    if action:
+        query = query.where(L.action == action)
+    if since:
+        query = query.where(L.created_at >= since)
+    if until:
+        query = query.where(L.created_at < until)
+    if cursor:
+        created_at, log_id = decode_log_cursor(cursor)
+        query = query.where(or_(L.created_at < created_at, and_(L.created_at == created_at, L.id < log_id)))
+    return query.order_by(L.created_at.desc(), L.id.desc())
+
+def serialize_log(row):
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "user": row.username or "System",
+        "action": row.action,
+        "details": row.details,
+        "ip_address": row.ip_address,
+        "created_at": row.created_at
+    }
+
+async def stream_logs(filters: dict, fmt: str):
+    # Own session: the stream outlives the request-scoped dependency
+    async with database.AsyncReadSessionLocal() as db:
+        if fmt == "csv":
+            header = ["id", "user_id", "user", "action", "details", "ip_address", "created_at"]
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=header)
+            writer.writeheader()
+        result = await db.stream(query_logs(**filters).execution_options(yield_per=1000))
+        async for row in result:
+            item = serialize_log(row)
+            item["created_at"] = item["created_at"].isoformat() if item["created_at"] else None
+            if fmt == "csv":
+                writer.writerow(item)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            else:
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+
 @app.get("/logs")
-def get_system_logs(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+async def get_system_logs(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = "json",
+    db: AsyncSession = Depends(database.get_async_read_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
     # Only admin should see all logs, but for simplicity/demo allow all or restrict
     # if current_user.role != "admin": ...
-    logs = db.query(models.SystemLog).order_by(models.SystemLog.created_at.desc()).limit(100).all()
-    return [{
-        "id": l.id,
-        "user": l.user.username if l.user else "System",
-        "action": l.action,
-        "details": l.details,
-        "created_at": l.created_at
-    } for l in logs]
+    filters = {"user_id": user_id, "action": action, "since": since, "until": until, "cursor": cursor}
+    if format in ("ndjson", "csv"):
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        headers = {"Content-Disposition": f"attachment; filename=system_logs.{format}"}
+        return StreamingResponse(stream_logs(filters, format), media_type=media_type, headers=headers)
+
+    limit = max(1, min(limit, 1000))
+    rows = (await db.execute(query_logs(**filters).limit(limit + 1))).all()
+    page = rows[:limit]
+    return {
+        "items": [serialize_log(r) for r in page],
+        "next_cursor": encode_log_cursor(page[-1]) if len(rows) > limit else None
+    }
+
+# --- Metrics ---
+@metrics.registry.collector
+def collect_runtime_gauges():
+    # Point-in-time state of pools, caches and background workers, read at scrape time
+    lines = ["# TYPE db_pool_connections gauge"]
+    for name, pool in database.stats().items():
+        for field in ("checked_out", "checked_in", "overflow"):
+            if field in pool:
+                lines.append(f'db_pool_connections{{engine="{name}",state="{field}"}} {pool[field]}')
+        if "wait_avg_ms" in pool:
+            lines.append(f'db_pool_wait_avg_ms{{engine="{name}"}} {pool["wait_avg_ms"]}')
+            lines.append(f'db_pool_timeouts_total{{engine="{name}"}} {pool["timeouts"]}')
+    cache_stats = cache.response_cache.stats()
+    audit_stats = audit.audit_log.stats()
+    lines += [
+        "# TYPE response_cache_requests_total counter",
+        f'response_cache_requests_total{{result="hit"}} {cache_stats["hits"]}',
+        f'response_cache_requests_total{{result="miss"}} {cache_stats["misses"]}',
+        f'response_cache_requests_total{{result="not_modified"}} {cache_stats["not_modified"]}',
+        "# TYPE audit_log_pending gauge",
+        f"audit_log_pending {audit_stats['pending']}",
+        "# TYPE event_subscribers gauge",
+        f"event_subscribers {events.bus.stats()['subscribers']}",
+        "# TYPE training_pending_completions gauge",
+        f"training_pending_completions {training.trainer.status()['pending_completions']}",
+        "# TYPE model_version gauge",
+        f"model_version {prediction.predictor.version or 0}",
+    ]
+    scan = sla.scanner.status()
+    lines += [
+        "# TYPE sla_running_instances gauge",
+        f"sla_running_instances {scan['running']}",
+        "# TYPE sla_at_risk_instances gauge",
+        f"sla_at_risk_instances {scan['at_risk']}",
+        "# TYPE sla_scan_duration_ms gauge",
+        f"sla_scan_duration_ms {scan['scan_ms'] or 0}",
+    ]
+    overall = accuracy.monitor.report(0)
+    lines += [
+        "# TYPE prediction_error_mae_seconds gauge",
+        f"prediction_error_mae_seconds {overall['overall']['mae']}",
+        "# TYPE prediction_error_bias_seconds gauge",
+        f"prediction_error_bias_seconds {overall['overall']['bias']}",
+        "# TYPE prediction_drifting_keys gauge",
+        f"prediction_drifting_keys {len(overall['drifting'])}",
+        "# TYPE prediction_drift_retrains_total counter",
+        f"prediction_drift_retrains_total {overall['retrains_requested']}",
+    ]
+    return lines
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    # Prometheus text exposition format
+    return Response(content=metrics.registry.expose(), media_type=metrics.CONTENT_TYPE)
 
 # --- System Maintenance API ---
+@app.get("/system/db")
+def get_db_stats(current_user: models.User = Depends(auth.get_current_user)):
+    # Connection pool usage per engine: checked out, overflow, checkout wait times
+    return database.stats()
+
+@app.get("/system/cache")
+def get_cache_stats(current_user: models.User = Depends(auth.get_current_user)):
+    return cache.response_cache.stats()
+
 @app.post("/system/backup")
 def backup_database(current_user: models.User = Depends(auth.get_current_user)):
     if current_user.role != "admin":
@@ -0,0 +1,264 @@
+"""
+In-process metrics in the Prometheus text exposition format, served by
+GET /metrics.
+
+Request latency comes from MetricsMiddleware, SQL query counts and time from
+SQLAlchemy engine events (attributed to the request that issued them through
+a context variable), and the predictor, training and audit log code observe
+their own histograms and counters.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _samples(self, key, value):
+        counts, count, total = value
+        names = self.labelnames + ("le",)
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+        lines.append(f"{self.name}_bucket{_labels(names, key + ('+Inf',))} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Register fn() -> list of exposition lines, evaluated at scrape time"""
+        self._collectors.append(fn)
+        return fn
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for collect in self._collectors:
+            try:
+                lines.extend(collect())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+http_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being served"))
+
+db_queries = registry.register(Counter("db_queries_total", "SQL statements executed"))
+db_query_latency = registry.register(Histogram("db_query_duration_seconds", "SQL statement latency"))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request", ("route",), COUNT_BUCKETS))
+db_time_per_request = registry.register(Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per HTTP request", ("route",)))
+
+training_duration = registry.register(Histogram(
+    "model_training_duration_seconds", "Duration of a predictor training run",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)))
+training_rows = registry.register(Gauge("model_training_rows", "Rows in the last training set"))
+training_runs = registry.register(Counter("model_training_runs_total", "Predictor training runs by outcome", ("outcome",)))
+prediction_latency = registry.register(Histogram(
+    "prediction_duration_seconds", "Prediction call latency", ("operation",)))
+prediction_rows = registry.register(Counter("prediction_rows_total", "Rows scored by the predictor"))
+prediction_errors = registry.register(Counter("prediction_errors_total", "Failed prediction calls", ("operation",)))
+
+audit_flush_latency = registry.register(Histogram("audit_log_flush_duration_seconds", "Audit log bulk insert latency"))
+audit_flushed_rows = registry.register(Counter("audit_log_flushed_rows_total", "Audit log rows written"))
+audit_dropped_rows = registry.register(Counter("audit_log_dropped_rows_total", "Audit log rows dropped while flushes kept failing"))
+
+
+# --- Per-request SQL accounting ---
+_request_sql = contextvars.ContextVar("request_sql", default=None)
+
+
+class RequestSQL:
+    """SQL statements and time of one request; threadpool workers running its code share it"""
+
+    __slots__ = ("queries", "seconds", "_lock")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float):
+        with self._lock:
+            self.queries += 1
+            self.seconds += elapsed
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    db_queries.inc()
+    db_query_latency.observe(elapsed)
+    # The holder object is shared with copies of the request context (threadpool, greenlets)
+    current = _request_sql.get()
+    if current is not None:
+        current.add(elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL usage per route template"""
+
+    # Long-lived streams would only distort the latency histograms
+    SKIP_ROUTES = ("/metrics", "/events")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        sql = RequestSQL()
+        token = _request_sql.set(sql)
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.inc(-1)
+            _request_sql.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            if route not in self.SKIP_ROUTES:
+                method = scope["method"]
+                http_requests.inc(method=method, route=route, status=status["code"])
+                http_latency.observe(elapsed, method=method, route=route)
+                db_queries_per_request.observe(sql.queries, route=route)
+                db_time_per_request.observe(sql.seconds, route=route)
@@ -0,0 +1,104 @@
+"""
+Schema migrations for databases created before a model change.
+
+create_all() only creates missing tables; it never adds columns or indexes
+to tables that already exist. Each migration below brings an existing
+database up to the current models and is recorded in schema_migrations so
+it runs once. Migrations must be idempotent (check before altering), since
+a fresh database already gets everything from create_all().
+
+Usage: python -m backend.migrations            # apply pending migrations
+       python -m backend.migrations --status   # list applied / pending
+"""
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+
+metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", metadata,
+    Column("version", String(100), primary_key=True),
+    Column("applied_at", DateTime),
+)
+
+
+def _add_column(conn, table: str, column: str, ddl: str):
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_indexes(conn, *indexes):
+    for index in indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _index(table, name: str):
+    return next(i for i in table.indexes if i.name == name)
+
+
+def add_instance_lock_version(conn):
+    _add_column(conn, "workflow_instances", "lock_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def add_system_log_created_at_index(conn):
+    _create_indexes(conn, _index(models.SystemLog.__table__, "ix_system_logs_created_at_id"))
+
+
+def add_hot_query_indexes(conn):
+    E, I, T = models.NodeExecution.__table__, models.WorkflowInstance.__table__, models.WorkflowTemplate.__table__
+    _create_indexes(
+        conn,
+        _index(E, "ix_node_executions_instance_id_status"),
+        _index(E, "ix_node_executions_status_actual_duration"),
+        _index(E, "ix_node_executions_status_end_time"),
+        _index(I, "ix_workflow_instances_status_end_time"),
+        _index(T, "ix_workflow_templates_is_deleted"),
+    )
+
+
+# Append only; never reorder or rename an entry that may have been applied
+MIGRATIONS = [
+    ("0001_instance_lock_version", add_instance_lock_version),
+    ("0002_system_log_created_at_index", add_system_log_created_at_index),
+    ("0003_hot_query_indexes", add_hot_query_indexes),
+]
+
+
+def applied_versions(engine: Engine):
+    metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return {row.version for row in conn.execute(schema_migrations.select())}
+
+
+def upgrade(engine: Engine):
+    """Apply pending migrations in order; returns the versions applied"""
+    done = applied_versions(engine)
+    applied = []
+    for version, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                migrate(conn)
+                conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.now()))
+        except IntegrityError:
+            continue  # Another worker applied it concurrently
+        print(f"Applied migration {version}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    from . import database
+    models.Base.metadata.create_all(bind=database.engine)
+    if "--status" in sys.argv:
+        done = applied_versions(database.engine)
+        for version, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version}")
+    else:
+        upgrade(database.engine)
@@ -0,0 +1,202 @@
+"""
+Cross-validated comparison of regressors on the predictor's training set,
+served by GET /analytics/benchmarks.
+
+Every (model, fold) pair is fitted in parallel with joblib. Results are
+cached per dataset version of the FeatureStore, so repeated requests and
+requests without new completions reuse the last run; a changed dataset
+starts one background re-run while the previous report stays readable.
+The background thread also refreshes the store from the read replica
+(at most once per BENCHMARK_MIN_INTERVAL_SECONDS), so requests never
+query the database. The store is the benchmark's own copy of the training
+set: the predictor's store tracks the primary, and a replica that lags
+behind must not move its high-water marks.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.compose import TransformedTargetRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, TimeSeriesSplit
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVR
+
+from . import cache, database, prediction
+from .feature_store import FeatureStore
+
+BENCHMARK_MODELS = [m.strip() for m in os.getenv("BENCHMARK_MODELS", "rf,lr,gb,svr").split(",") if m.strip()]
+BENCHMARK_FOLDS = int(os.getenv("BENCHMARK_FOLDS", "5"))
+# "timeseries": train on older rows, test on the next ones (rows are in end_time order); "kfold": shuffled K-fold
+BENCHMARK_SPLIT = os.getenv("BENCHMARK_SPLIT", "timeseries")
+# joblib n_jobs for the fold fits; -2 = every CPU but one, so the API keeps a core
+BENCHMARK_N_JOBS = int(os.getenv("BENCHMARK_N_JOBS", "-2"))
+# Most recent rows evaluated, and the cap for SVR whose fit time grows quadratically
+BENCHMARK_MAX_ROWS = int(os.getenv("BENCHMARK_MAX_ROWS", "20000"))
+BENCHMARK_SVR_MAX_ROWS = int(os.getenv("BENCHMARK_SVR_MAX_ROWS", "5000"))
+# A changed dataset re-runs at most this often; until then the previous report is served as stale
+BENCHMARK_MIN_INTERVAL_SECONDS = float(os.getenv("BENCHMARK_MIN_INTERVAL_SECONDS", "300"))
+BENCHMARK_MIN_ROWS = 50
+
+MODELS = {
+    "rf": ("Random Forest", lambda: RandomForestRegressor(n_estimators=100, random_state=42)),
+    "lr": ("Linear Regression", LinearRegression),
+    "gb": ("Gradient Boosting", lambda: HistGradientBoostingRegressor(random_state=42)),
+    "svr": ("SVR", lambda: TransformedTargetRegressor(
+        regressor=make_pipeline(StandardScaler(), SVR(C=10.0, epsilon=0.05)), transformer=StandardScaler())),
+}
+
+
+def _fit_fold(name, X, y, train, test, max_rows):
+    if max_rows and len(train) > max_rows:
+        train = train[-max_rows:]  # The most recent rows of the training fold
+    model = MODELS[name][1]()
+    started = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    pred = model.predict(X[test])
+    predict_seconds = time.perf_counter() - started
+    return name, {
+        "mse": mean_squared_error(y[test], pred),
+        "mae": mean_absolute_error(y[test], pred),
+        "r2": r2_score(y[test], pred),
+        "fit_seconds": fit_seconds,
+        "predict_ms_per_1k": 1000 * predict_seconds * 1000 / len(test),
+        "train_rows": len(train),
+    }
+
+
+def _summarize(folds):
+    summary = {"folds": len(folds)}
+    for field in ("mse", "mae", "r2", "fit_seconds", "predict_ms_per_1k", "train_rows"):
+        values = np.array([f[field] for f in folds], dtype=float)
+        summary[field] = int(values.mean()) if field == "train_rows" else round(float(values.mean()), 4)
+        if field in ("mse", "mae", "r2"):
+            summary[field + "_std"] = round(float(values.std()), 4)
+    return summary
+
+
+def evaluate(X, y, models=None, folds=BENCHMARK_FOLDS, split=BENCHMARK_SPLIT, n_jobs=BENCHMARK_N_JOBS,
+             max_rows=BENCHMARK_MAX_ROWS, svr_max_rows=BENCHMARK_SVR_MAX_ROWS) -> dict:
+    """Cross-validate models on (X, y), which must be in chronological order for the time-series split"""
+    models = [m for m in (models or BENCHMARK_MODELS) if m in MODELS]
+    if max_rows and len(y) > max_rows:
+        X, y = X[-max_rows:], y[-max_rows:]
+    config = {"models": models, "folds": folds, "split": split, "rows": len(y)}
+    if len(y) < max(BENCHMARK_MIN_ROWS, folds + 1):
+        return {"status": "insufficient_data", "config": config, "models": {}, "best_model": None}
+
+    if split == "kfold":
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=42)
+    else:
+        splitter = TimeSeriesSplit(n_splits=folds)
+    started = time.perf_counter()
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(name, X, y, train, test, svr_max_rows if name == "svr" else None)
+        for train, test in splitter.split(X)
+        for name in models
+    )
+    per_model = {name: [] for name in models}
+    for name, fold in results:
+        per_model[name].append(fold)
+
+    report = {}
+    for name, fold_results in per_model.items():
+        report[name] = {"name": MODELS[name][0], **_summarize(fold_results)}
+    return {
+        "status": "ok",
+        "config": config,
+        "models": report,
+        "best_model": max(report, key=lambda n: report[n]["r2"]),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def refresh_from_replica(store):
+    db = database.ReadSessionLocal()
+    try:
+        store.refresh(db)
+    finally:
+        db.close()
+
+
+class BenchmarkEngine:
+    """Runs evaluate() on a background thread, at most once per dataset version"""
+
+    def __init__(self, min_interval: float = BENCHMARK_MIN_INTERVAL_SECONDS, refresh=None, **options):
+        self.min_interval = min_interval
+        self.refresh = refresh  # Called with the store on the background thread before each run
+        self.options = options
+        self._finished_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self.result = None
+        self.dataset = None   # Dataset key the result belongs to
+        self.failed = None    # Dataset key of the last failed run, not retried
+        self.last_error = None
+
+    @staticmethod
+    def dataset_key(store):
+        return (store.version, len(store))
+
+    def report(self, store, wait: bool = False) -> dict:
+        """Latest report for store; starts a re-run when the dataset changed since the last one"""
+        key = self.dataset_key(store)
+        with self._lock:
+            fresh = self.result is not None and self.dataset == key
+            running = self._thread is not None and self._thread.is_alive()
+            throttled = self._finished_at is not None and time.monotonic() - self._finished_at < self.min_interval
+            due = not throttled or self.result is None
+            # A fresh report still polls the store for new rows when the engine owns the refresh
+            if (not fresh or self.refresh is not None) and key != self.failed and not running and due:
+                running = True
+                self._thread = threading.Thread(target=self._run, args=(store, key), name="model-benchmark", daemon=True)
+                self._thread.start()
+            thread = self._thread
+        if not fresh and wait and running:
+            thread.join()
+            return self.report(store)
+        result = dict(self.result or {"models": {}, "best_model": None})
+        if not fresh and running:
+            result["status"] = "running"
+        elif not fresh and key == self.failed:
+            result["status"] = "error"
+        result["stale"] = not fresh and self.result is not None
+        result["dataset"] = {"version": key[0], "rows": key[1]}
+        if self.last_error:
+            result["error"] = self.last_error
+        return result
+
+    def _run(self, store, key):
+        changed = True
+        try:
+            if self.refresh is not None:
+                self.refresh(store)
+                key = self.dataset_key(store)
+                changed = key != self.dataset or self.result is None
+                if not changed:
+                    return
+            X, y, _ = store.training_data()
+            result = evaluate(X, y, **self.options)
+            result["computed_at"] = datetime.now().isoformat(timespec="seconds")
+            with self._lock:
+                self.result, self.dataset, self.last_error = result, key, None
+        except Exception as e:
+            with self._lock:
+                self.failed, self.last_error = key, str(e)
+            print(f"Model benchmark failed: {e}")
+        finally:
+            self._finished_at = time.monotonic()
+            if changed:
+                cache.response_cache.invalidate("analytics")
+
+
+store = FeatureStore(max_rows=prediction.TRAINING_MAX_ROWS, window_days=prediction.TRAINING_WINDOW_DAYS)
+engine = BenchmarkEngine(refresh=refresh_from_replica)
@@ -0,0 +1,136 @@
+"""
+On-disk registry of trained predictor models shared by all worker processes.
+
+Every publish writes a new numbered version directory holding the fitted
+bundle (joblib, uncompressed so NumPy arrays can be memory-mapped on load)
+and a meta.json with metrics, training-set size and the dataset high-water
+mark, then atomically repoints LATEST at it. Workers load LATEST at startup
+and poll it to hot-reload versions published by other processes.
+
+Memory-mapping only shares plain NumPy arrays in the bundle (the encoder
+and linear model). scikit-learn rebuilds every decision tree through
+Tree.__setstate__, which copies its node and value arrays into private
+memory, so each worker still holds its own copy of the forests, which is
+nearly all of a bundle's size.
+"""
+import json
+import os
+import re
+import shutil
+import socket
+from contextlib import contextmanager
+from datetime import datetime
+
+import joblib
+
+try:
+    import fcntl  # POSIX only; without it every worker may train on its own
+except ImportError:
+    fcntl = None
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "model_registry")
+MODEL_REGISTRY_KEEP = int(os.getenv("MODEL_REGISTRY_KEEP", "5"))
+# "r": map plain arrays from the page cache (forest trees are always copied, see above); empty = load into private memory
+MODEL_REGISTRY_MMAP = os.getenv("MODEL_REGISTRY_MMAP", "r") or None
+
+VERSION_DIR = re.compile(r"^v(\d+)$")
+
+
+class ModelRegistry:
+    def __init__(self, root: str = MODEL_REGISTRY_DIR, keep: int = MODEL_REGISTRY_KEEP, mmap_mode=MODEL_REGISTRY_MMAP):
+        self.root = root
+        self.keep = max(1, keep)
+        self.mmap_mode = mmap_mode
+
+    def _path(self, version: int, *parts) -> str:
+        return os.path.join(self.root, f"v{version:06d}", *parts)
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        found = (VERSION_DIR.match(name) for name in os.listdir(self.root))
+        return sorted(int(m.group(1)) for m in found if m)
+
+    def latest_version(self):
+        try:
+            with open(os.path.join(self.root, "LATEST")) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def meta(self, version: int) -> dict:
+        with open(self._path(version, "meta.json")) as f:
+            return json.load(f)
+
+    def publish(self, bundle, meta: dict) -> int:
+        """Store bundle as the next version and make it the latest one"""
+        os.makedirs(self.root, exist_ok=True)
+        version = (self.versions() or [0])[-1] + 1
+        while True:
+            try:
+                os.mkdir(self._path(version))  # Claims the number even if another worker publishes too
+                break
+            except FileExistsError:
+                version += 1
+
+        meta = dict(meta, version=version, created_at=datetime.now().isoformat(),
+                    host=socket.gethostname(), pid=os.getpid())
+        joblib.dump(bundle, self._path(version, "models.joblib"))
+        with open(self._path(version, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+
+        # Readers only follow LATEST, so they never see a half-written version
+        tmp = os.path.join(self.root, f"LATEST.{os.getpid()}")
+        with open(tmp, "w") as f:
+            f.write(str(version))
+        if version > (self.latest_version() or 0):
+            os.replace(tmp, os.path.join(self.root, "LATEST"))
+        else:
+            os.remove(tmp)
+        self.prune()
+        return version
+
+    def load(self, version: int = None):
+        """(bundle, meta) of version (default: latest), or None when nothing is published"""
+        version = self.latest_version() if version is None else version
+        if version is None:
+            return None
+        bundle = joblib.load(self._path(version, "models.joblib"), mmap_mode=self.mmap_mode)
+        return bundle, self.meta(version)
+
+    def prune(self):
+        latest = self.latest_version()
+        for version in self.versions()[:-self.keep]:
+            if version != latest:
+                # Already mapped files stay readable for workers still using them
+                shutil.rmtree(self._path(version), ignore_errors=True)
+
+    @contextmanager
+    def training_lock(self):
+        """Yields True for the one process allowed to train right now"""
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, "train.lock"), "w") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self):
+        latest = self.latest_version()
+        return {
+            "root": os.path.abspath(self.root),
+            "latest_version": latest,
+            "versions": self.versions(),
+            "latest": self.meta(latest) if latest is not None else None,
+        }
+
+
+registry = ModelRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Enum, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, JSON, Enum, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -37,13 +37,15 @@ class WorkflowTemplate(Base):
     name = Column(String(100), index=True)
     graph_json = Column(JSON) # Stores nodes and edges definition
     version = Column(Integer, default=1)
-    is_deleted = Column(Integer, default=0) # 0: Active, 1: Deleted
+    is_deleted = Column(Integer, default=0, index=True) # 0: Active, 1: Deleted
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     instances = relationship("WorkflowInstance", back_populates="template")
 
 class WorkflowInstance(Base):
     __tablename__ = "workflow_instances"
+    # Active counts and "completed today" on the dashboard
+    __table_args__ = (Index("ix_workflow_instances_status_end_time", "status", "end_time"),)
 
     id = Column(Integer, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("workflow_templates.id"))
@@ -51,12 +53,25 @@ class WorkflowInstance(Base):
     status = Column(String(20), default=WorkflowStatus.RUNNING)
     start_time = Column(DateTime(timezone=True), server_default=func.now())
     end_time = Column(DateTime(timezone=True), nullable=True)
+    # Optimistic concurrency: every UPDATE checks and bumps this counter.
+    # Existing databases get it from migration 0001_instance_lock_version
+    lock_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     template = relationship("WorkflowTemplate", back_populates="instances")
     executions = relationship("NodeExecution", back_populates="instance")
 
+    __mapper_args__ = {"version_id_col": lock_version}
+
 class NodeExecution(Base):
     __tablename__ = "node_executions"
+    __table_args__ = (
+        # Running/completed executions of one instance (complete_node, listings)
+        Index("ix_node_executions_instance_id_status", "instance_id", "status"),
+        # Completed executions with a duration (stats backfill, training set)
+        Index("ix_node_executions_status_actual_duration", "status", "actual_duration"),
+        # Incremental feature-store refresh past the end_time high-water mark
+        Index("ix_node_executions_status_end_time", "status", "end_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     instance_id = Column(Integer, ForeignKey("workflow_instances.id"))
@@ -76,6 +91,8 @@ class NodeExecution(Base):
 
 class SystemLog(Base):
     __tablename__ = "system_logs"
+    # Backs newest-first keyset pagination on (created_at, id)
+    __table_args__ = (Index("ix_system_logs_created_at_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -85,3 +102,31 @@ class SystemLog(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="logs")
+
+class ExecutionStat(Base):
+    """Daily rollup of completed node executions per template/node, maintained on completion"""
+    __tablename__ = "execution_stats"
+    __table_args__ = (UniqueConstraint("day", "template_id", "node_id", name="uq_execution_stats_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    template_id = Column(Integer, ForeignKey("workflow_templates.id"), nullable=True)
+    node_id = Column(String(50))
+
+    count = Column(Integer, default=0)
+    total_actual = Column(BigInteger, default=0)      # In seconds
+    predicted_count = Column(Integer, default=0)      # Executions that had a prediction
+    total_predicted = Column(BigInteger, default=0)
+    total_abs_error = Column(BigInteger, default=0)
+
+class IdempotencyRecord(Base):
+    """Stored response for a request sent with an Idempotency-Key header"""
+    __tablename__ = "idempotency_records"
+    __table_args__ = (UniqueConstraint("user_id", "scope", "key", name="uq_idempotency_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    scope = Column(String(100))   # e.g. "complete_node:42"
+    key = Column(String(100))
+    response = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
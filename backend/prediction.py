@@ -1,104 +1,369 @@
-import pandas as pd
+import os
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 import numpy as np
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from . import models
+from . import metrics as telemetry
+from .feature_store import FeatureEncoder, FeatureStore
+
+# Optional bounds on the training set (unset = keep full history)
+TRAINING_MAX_ROWS = int(os.getenv("TRAINING_MAX_ROWS", "0")) or None
+TRAINING_WINDOW_DAYS = float(os.getenv("TRAINING_WINDOW_DAYS", "0")) or None
+
+# Second model tier: "node" or "template" fits a forest per group with enough
+# history; other rows (and groups where it does not beat the global forest on
+# the holdout) fall back to the global model. "none" disables it.
+PREDICTOR_TIER = os.getenv("PREDICTOR_TIER", "template")
+PREDICTOR_TIER_MIN_SAMPLES = int(os.getenv("PREDICTOR_TIER_MIN_SAMPLES", "200"))
+TIER_COLUMNS = {"node": FeatureEncoder.FEATURES.index("node_code"), "template": FeatureEncoder.FEATURES.index("template_id")}
+
+# Prediction intervals: quantiles of log(actual / predicted) on the training holdout,
+# at the midpoints of 20 equal-probability bins. Nodes with at least
+# INTERVAL_MIN_SAMPLES holdout rows get their own residual quantiles.
+QUANTILE_LEVELS = (np.arange(20) + 0.5) / 20
+INTERVAL_MIN_SAMPLES = int(os.getenv("INTERVAL_MIN_SAMPLES", "30"))
+
+class FittedModels:
+    """
+    Immutable bundle of models produced by one training run.
+
+    The predictor holds a single reference to the current bundle and replaces
+    it in one assignment, so readers never observe a half-trained model. The
+    encoder that produced the training features travels with the models.
+    """
+    def __init__(self, rf_model, lr_model, metrics, n_samples=0, encoder=None, tier=None, tier_models=None, residuals=None):
+        self.rf_model = rf_model
+        self.lr_model = lr_model
+        self.metrics = metrics
+        self.n_samples = n_samples
+        self.encoder = encoder or FeatureEncoder()
+        self.tier = tier
+        self.tier_models = tier_models or {}  # group key -> model
+        self.residuals = residuals  # fit_residuals() table; None = point predictions only
+
+def predict_routed(fitted: FittedModels, X: np.ndarray) -> np.ndarray:
+    """Per-group tier model where one exists, global Random Forest for the rest"""
+    if not fitted.tier_models:
+        return fitted.rf_model.predict(X)
+    preds = np.empty(len(X))
+    routed = np.zeros(len(X), dtype=bool)
+    groups = X[:, TIER_COLUMNS[fitted.tier]]
+    for key in np.unique(groups):
+        model = fitted.tier_models.get(int(key))
+        if model is not None:
+            mask = groups == key
+            preds[mask] = model.predict(X[mask])
+            routed |= mask
+    if not routed.all():
+        preds[~routed] = fitted.rf_model.predict(X[~routed])
+    return preds
+
+def fit_residuals(X_test, y_test, pred, min_samples=INTERVAL_MIN_SAMPLES):
+    """Residual quantiles per node code (rows of "table", last row global) at QUANTILE_LEVELS"""
+    log_ratio = np.log1p(np.maximum(y_test, 0)) - np.log1p(np.maximum(pred, 0))
+    codes = X_test[:, TIER_COLUMNS["node"]]
+    keys, counts = np.unique(codes, return_counts=True)
+    keys = keys[counts >= min_samples]
+    table = [np.quantile(log_ratio[codes == key], QUANTILE_LEVELS) for key in keys]
+    table.append(np.quantile(log_ratio, QUANTILE_LEVELS))
+    return {"keys": keys.astype(np.int64), "table": np.array(table)}
+
+def predict_quantiles(fitted: FittedModels, X: np.ndarray, pred: np.ndarray) -> np.ndarray:
+    """(len(X), len(QUANTILE_LEVELS)) durations around the point predictions pred"""
+    residuals = getattr(fitted, "residuals", None)  # Bundles published before intervals have none
+    if residuals is None or len(X) == 0:
+        return np.repeat(np.asarray(pred, dtype=float)[:, None], len(QUANTILE_LEVELS), axis=1)
+    keys = residuals["keys"]
+    codes = X[:, TIER_COLUMNS["node"]]
+    rows = np.minimum(np.searchsorted(keys, codes), len(keys))
+    matched = rows < len(keys)
+    matched[matched] = keys[rows[matched]] == codes[matched]
+    rows[~matched] = len(keys)  # Global row
+    return np.expm1(np.log1p(np.maximum(pred, 0))[:, None] + residuals["table"][rows])
+
+def at_levels(quantiles: np.ndarray, levels) -> np.ndarray:
+    """Columns of a QUANTILE_LEVELS table at other levels, linear in between and clamped at the ends"""
+    pos = np.interp(levels, QUANTILE_LEVELS, np.arange(len(QUANTILE_LEVELS)))
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, len(QUANTILE_LEVELS) - 1)
+    return quantiles[:, lo] * (1 - (pos - lo)) + quantiles[:, hi] * (pos - lo)
+
+def _scores(y_true, y_pred):
+    return {"mse": mean_squared_error(y_true, y_pred), "r2": r2_score(y_true, y_pred)}
+
+def fit_tier(tier, X_train, y_train, X_test, y_test, global_pred, min_samples=PREDICTOR_TIER_MIN_SAMPLES):
+    """Fit one forest per group; keep it only where it beats the global forest on the holdout"""
+    column = TIER_COLUMNS[tier]
+    keys, counts = np.unique(X_train[:, column], return_counts=True)
+    tier_models = {}
+    for key in keys[counts >= min_samples]:
+        test = X_test[:, column] == key
+        if not test.any():
+            continue
+        train = X_train[:, column] == key
+        model = RandomForestRegressor(n_estimators=50, min_samples_leaf=2, random_state=42)
+        model.fit(X_train[train], y_train[train])
+        if mean_squared_error(y_test[test], model.predict(X_test[test])) < mean_squared_error(y_test[test], global_pred[test]):
+            tier_models[int(key)] = model
+    return tier_models
+
+def fit_models(X_train, y_train, X_test, y_test, encoder=None, tier=PREDICTOR_TIER,
+               min_samples=PREDICTOR_TIER_MIN_SAMPLES, n_samples=None) -> FittedModels:
+    """Fit the global models (and the optional tier) and score them on the holdout"""
+    # Fit fresh estimators so the live models stay untouched until the swap
+    rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
+    lr_model = LinearRegression()
+    metrics = {}
+
+    # Train Random Forest
+    rf_model.fit(X_train, y_train)
+    rf_pred = rf_model.predict(X_test)
+    metrics["rf"] = _scores(y_test, rf_pred)
+
+    # Train Linear Regression
+    lr_model.fit(X_train, y_train)
+    metrics["lr"] = _scores(y_test, lr_model.predict(X_test))
+
+    fitted = FittedModels(rf_model, lr_model, metrics, len(y_train) + len(y_test) if n_samples is None else n_samples, encoder)
+    if tier in TIER_COLUMNS:
+        fitted.tier = tier
+        fitted.tier_models = fit_tier(tier, X_train, y_train, X_test, y_test, rf_pred, min_samples)
+        metrics["routed"] = _scores(y_test, predict_routed(fitted, X_test))
+        metrics["tier"] = {"by": tier, "models": len(fitted.tier_models)}
+    fitted.residuals = fit_residuals(X_test, y_test, predict_routed(fitted, X_test))
+    return fitted
 
 class DurationPredictor:
-    def __init__(self):
-        self.rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.lr_model = LinearRegression()
-        self.is_trained = False
-        self.metrics = {
-            "rf": {"mse": 0, "r2": 0},
-            "lr": {"mse": 0, "r2": 0}
-        }
+    def __init__(self, store: FeatureStore = None, tier: str = PREDICTOR_TIER):
+        self.store = store or FeatureStore(max_rows=TRAINING_MAX_ROWS, window_days=TRAINING_WINDOW_DAYS)
+        self.tier = tier
+        self.models = None
+        self.trained_at = None
+        self.version = None     # Registry version of the current bundle (None = not published)
+        self.high_water = None  # Dataset high-water mark the current bundle was trained up to
+
+    @property
+    def is_trained(self):
+        return self.models is not None
+
+    @property
+    def rf_model(self):
+        return self.models.rf_model if self.models else None
+
+    @property
+    def lr_model(self):
+        return self.models.lr_model if self.models else None
+
+    @property
+    def metrics(self):
+        if self.models is None:
+            return {"rf": {"mse": 0, "r2": 0}, "lr": {"mse": 0, "r2": 0}}
+        return self.models.metrics
+
+    def _swap(self, fitted: FittedModels, trained_at: datetime = None, version=None, high_water=None):
+        # Single reference assignment: predict() sees either the old or the new bundle
+        self.models = fitted
+        self.trained_at = trained_at or datetime.now()
+        self.version = version
+        self.high_water = high_water
+
+    def publish(self, registry):
+        """Store the current bundle in the model registry; returns its version"""
+        fitted = self.models
+        if fitted is None or not fitted.n_samples:
+            return None  # Placeholder models trained on dummy data stay local
+        self.version = registry.publish(fitted, {
+            "features": list(FeatureEncoder.FEATURES),
+            "metrics": fitted.metrics,
+            "n_samples": fitted.n_samples,
+            "tier": fitted.tier,
+            "tier_models": len(fitted.tier_models),
+            "vocabulary_size": len(fitted.encoder),
+            "high_water": self.high_water,
+            "trained_at": self.trained_at.isoformat(),
+        })
+        return self.version
+
+    def load(self, registry, version: int = None) -> bool:
+        """Replace the current bundle with a registry version (default: latest)"""
+        loaded = registry.load(version)
+        if loaded is None:
+            return False
+        fitted, meta = loaded
+        if meta.get("features") != list(FeatureEncoder.FEATURES):
+            raise ValueError(f"model version {meta['version']} was trained on other features")
+        self._swap(fitted, datetime.fromisoformat(meta["trained_at"]), meta["version"], meta["high_water"])
+        return True
 
     def train(self, db: Session):
-        # Fetch completed executions
-        query = db.query(models.NodeExecution).filter(
-            models.NodeExecution.status == "Completed",
-            models.NodeExecution.actual_duration != None
-        )
-        data = []
-        for exec in query.all():
-            data.append({
-                "node_id_code": hash(exec.node_id) % 1000, # Simple encoding
-                "user_id": exec.executed_by,
-                "hour": exec.start_time.hour,
-                "duration": exec.actual_duration
-            })
+        try:
+            with telemetry.training_duration.time():
+                self._train(db)
+        except Exception:
+            telemetry.training_runs.inc(outcome="error")
+            raise
+        telemetry.training_runs.inc(outcome="ok")
+        telemetry.training_rows.set(self.models.n_samples)
+
+    def _train(self, db: Session):
+        # Pull only executions completed since the last refresh
+        self.store.refresh(db)
+        X, y, encoder = self.store.training_data()
         
-        if len(data) < 10:
+        if len(y) < 10:
             # Not enough data, use dummy training
             print("Not enough data to train. Using dummy data.")
-            X = np.array([[1, 1, 9], [1, 1, 10], [2, 1, 9], [2, 1, 14], [3, 2, 10], [1, 1, 9], [1, 1, 10], [2, 1, 9], [2, 1, 14], [3, 2, 10]])
+            X = np.array([[1, 1, 1, 9, 0], [1, 1, 1, 10, 1], [2, 1, 1, 9, 2], [2, 1, 1, 14, 3], [3, 2, 2, 10, 4],
+                          [1, 1, 1, 9, 0], [1, 1, 1, 10, 1], [2, 1, 1, 9, 2], [2, 1, 1, 14, 3], [3, 2, 2, 10, 4]])
             y = np.array([300, 310, 400, 420, 200, 305, 315, 390, 410, 210])
             
             # Train both
-            self.rf_model.fit(X, y)
-            self.lr_model.fit(X, y)
+            rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
+            lr_model = LinearRegression()
+            rf_model.fit(X, y)
+            lr_model.fit(X, y)
             
-            # Dummy metrics
-            self.metrics = {
-                "rf": {"mse": 120.5, "r2": 0.85},
-                "lr": {"mse": 350.2, "r2": 0.65}
+            # Placeholder models are not evaluated: report no accuracy instead of made-up numbers
+            metrics = {
+                "rf": {"mse": 0, "r2": 0},
+                "lr": {"mse": 0, "r2": 0}
             }
             
-            self.is_trained = True
+            self._swap(FittedModels(rf_model, lr_model, metrics, 0))
             return
 
-        df = pd.DataFrame(data)
-        X = df[["node_id_code", "user_id", "hour"]]
-        y = df["duration"]
-        
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train Random Forest
-        self.rf_model.fit(X_train, y_train)
-        rf_pred = self.rf_model.predict(X_test)
-        self.metrics["rf"]["mse"] = mean_squared_error(y_test, rf_pred)
-        self.metrics["rf"]["r2"] = r2_score(y_test, rf_pred)
-        
-        # Train Linear Regression
-        self.lr_model.fit(X_train, y_train)
-        lr_pred = self.lr_model.predict(X_test)
-        self.metrics["lr"]["mse"] = mean_squared_error(y_test, lr_pred)
-        self.metrics["lr"]["r2"] = r2_score(y_test, lr_pred)
-
-        self.is_trained = True
-        print(f"Models trained on {len(data)} records.")
-
-    def predict(self, node_id: str, user_id: int, start_time) -> int:
-        if not self.is_trained:
-            return 300 # Default fallback (5 mins)
-        
-        node_code = hash(node_id) % 1000
-        hour = start_time.hour
-        # Use Random Forest for actual predictions as it's generally better for this data
-        prediction = self.rf_model.predict([[node_code, user_id, hour]])
-        return int(prediction[0])
+        fitted = fit_models(X_train, y_train, X_test, y_test, encoder, self.tier)
+        self._swap(fitted, high_water=self.store.high_water())
+        print(f"Models trained on {len(y)} records.")
+
+    def predict(self, node_id: str, user_id: int, start_time, template_id: int = None) -> int:
+        return int(self.predict_many([node_id], [user_id], [start_time], [template_id])[0])
+
+    def predict_many(self, node_ids, user_ids, start_times, template_ids=None) -> np.ndarray:
+        """
+        Score many (node_id, user_id, start_time[, template_id]) rows with one
+        model call per model tier. Returns an int array of predicted durations
+        in seconds.
+        """
+        if template_ids is None:
+            template_ids = [None] * len(node_ids)
+        try:
+            with telemetry.prediction_latency.time(operation="predict_many"):
+                preds = self._predict_many(node_ids, user_ids, start_times, template_ids)
+        except Exception:
+            telemetry.prediction_errors.inc(operation="predict_many")
+            raise
+        telemetry.prediction_rows.inc(len(preds))
+        return preds
+
+    def predict_distribution(self, node_ids, user_ids, start_times, template_ids=None):
+        """
+        Like predict_many, plus the quantiles of each prediction: returns
+        (point durations, (n, len(QUANTILE_LEVELS)) quantile durations), in seconds.
+        """
+        if template_ids is None:
+            template_ids = [None] * len(node_ids)
+        try:
+            with telemetry.prediction_latency.time(operation="predict_distribution"):
+                point, quantiles = self._predict_distribution(node_ids, user_ids, start_times, template_ids)
+        except Exception:
+            telemetry.prediction_errors.inc(operation="predict_distribution")
+            raise
+        telemetry.prediction_rows.inc(len(point))
+        return point, quantiles
+
+    def _predict_distribution(self, node_ids, user_ids, start_times, template_ids):
+        fitted = self.models
+        if fitted is None or len(node_ids) == 0:
+            point = np.full(len(node_ids), 300.0)
+            return point, np.repeat(point[:, None], len(QUANTILE_LEVELS), axis=1)
+        X = fitted.encoder.transform(node_ids, template_ids, user_ids, start_times)
+        point = predict_routed(fitted, X)
+        return point, predict_quantiles(fitted, X, point)
+
+    def _predict_many(self, node_ids, user_ids, start_times, template_ids) -> np.ndarray:
+        n = len(node_ids)
+        fitted = self.models  # Read once; training may swap in a new bundle concurrently
+        if fitted is None:
+            return np.full(n, 300, dtype=np.int64) # Default fallback (5 mins)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+
+        X = fitted.encoder.transform(node_ids, template_ids, user_ids, start_times)
+        # Use Random Forest for actual predictions as it's generally better for this data (per group where tiered)
+        return predict_routed(fitted, X).astype(np.int64)
+
+    def forecast_graphs(self, jobs, now: datetime):
+        """
+        Forecast the remaining work of many instances in one pass.
+
+        jobs: list of (compiled_template, user_id, running, done) where running
+        maps running node ids to their start time and done is the set of
+        completed node ids. Returns (durations, remaining_seconds) per job:
+        the predicted duration of every unfinished node and the critical-path
+        time until the instance finishes.
+        """
+        rows = []  # (job index, node_id, start_time)
+        for k, (compiled, _, running, done) in enumerate(jobs):
+            rows.extend((k, n, running.get(n, now)) for n in compiled.node_ids if n not in done)
+        user_ids = [jobs[k][1] for k, _, _ in rows]
+        node_ids = [n for _, n, _ in rows]
+        template_ids = [jobs[k][0].template_id for k, _, _ in rows]
+        preds = self.predict_many(node_ids, user_ids, [t for _, _, t in rows], template_ids)
+
+        def plan(preds):
+            per_job = [{} for _ in jobs]
+            for (k, node_id, _), pred in zip(rows, preds):
+                per_job[k][node_id] = int(pred)
+            results = []
+            for (compiled, _, running, done), durations in zip(jobs, per_job):
+                # Running nodes only contribute their predicted time still to go
+                left = dict(durations)
+                for node_id, started in running.items():
+                    if node_id in left:
+                        left[node_id] = max(left[node_id] - (now - started).total_seconds(), 0)
+                starts, makespan = compiled.schedule(left, done)
+                results.append((durations, starts, int(makespan)))
+            return results
+
+        # Second pass: nodes not yet started are scored at their forecast start hour
+        first = plan(preds)
+        if rows:
+            shifted = [
+                t if n in jobs[k][2] else now + timedelta(seconds=first[k][1].get(n, 0))
+                for k, n, t in rows
+            ]
+            preds = self.predict_many(node_ids, user_ids, shifted, template_ids)
+        return [(durations, makespan) for durations, _, makespan in plan(preds)]
         
     def get_metrics(self):
+        metrics = self.metrics
         # 计算准确率百分比 (基于 R2 score)
-        rf_r2 = self.metrics["rf"]["r2"]
-        lr_r2 = self.metrics["lr"]["r2"]
+        rf_r2 = metrics["rf"]["r2"]
+        lr_r2 = metrics["lr"]["r2"]
         # R2 通常在 0-1 之间，转换为百分比
         rf_accuracy = max(0, rf_r2 * 100) if rf_r2 > 0 else 0
         lr_accuracy = max(0, lr_r2 * 100) if lr_r2 > 0 else 0
         
-        return {
-            "rf": self.metrics["rf"],
-            "lr": self.metrics["lr"],
+        result = {
+            "rf": metrics["rf"],
+            "lr": metrics["lr"],
             "accuracy": {
                 "random_forest": round(rf_accuracy, 1),
                 "linear_regression": round(lr_accuracy, 1),
                 "best_model": "random_forest" if rf_r2 >= lr_r2 else "linear_regression"
             }
         }
+        # Served predictions go through the tier when one is configured
+        if "routed" in metrics:
+            result["routed"] = metrics["routed"]
+            result["tier"] = metrics["tier"]
+            result["accuracy"]["routed"] = round(max(0, metrics["routed"]["r2"] * 100), 1)
+        return result
 
 predictor = DurationPredictor()
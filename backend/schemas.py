@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List, Any
+from pydantic import BaseModel, Field
+from typing import Optional, List, Any, Union
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -40,11 +40,44 @@ class ExecutionResponse(BaseModel):
 class InstanceCreate(BaseModel):
     template_id: int
 
-class InstanceResponse(BaseModel):
+BULK_MAX_ITEMS = 5000
+
+class BulkInstanceCreate(BaseModel):
+    items: List[InstanceCreate]
+
+class NodeCompletion(BaseModel):
+    instance_id: int
+    node_id: Optional[str] = None # Required when the instance has parallel running nodes
+
+class BulkCompleteRequest(BaseModel):
+    items: List[NodeCompletion]
+
+class InstanceSummary(BaseModel):
     id: int
     template_id: int
     status: str
     current_node_id: Optional[str]
-    executions: List[ExecutionResponse] = []
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
     class Config:
         from_attributes = True
+
+class InstanceResponse(InstanceSummary):
+    executions: List[ExecutionResponse] = []
+
+class InstancePage(BaseModel):
+    items: List[Union[InstanceResponse, InstanceSummary]]
+    next_cursor: Optional[int] = None # Pass back as ?cursor= to fetch the next page
+
+class PredictionItem(BaseModel):
+    node_id: str
+    user_id: Optional[int] = None
+    start_time: Optional[datetime] = None
+    template_id: Optional[int] = None
+
+class BatchPredictionRequest(BaseModel):
+    items: List[PredictionItem] = Field(max_length=BULK_MAX_ITEMS)
+    quantiles: Optional[List[float]] = None # e.g. [0.1, 0.9]: prediction interval bounds per item
+
+class ForecastRequest(BaseModel):
+    instance_ids: Optional[List[int]] = None # None = all running instances
@@ -1,5 +1,11 @@
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
-from backend import models, database, auth
+from backend import models, database, auth, stats, migrations
 
 def seed_db():
     db = database.SessionLocal()
@@ -153,6 +159,7 @@ def seed_db():
             )
             db.add(execution)
         db.commit()
+        stats.rebuild(db)
         print("Sample instance data seeded.")
             
     except Exception as e:
@@ -160,5 +167,120 @@ def seed_db():
     finally:
         db.close()
 
+BULK_TEMPLATES = {
+    "Bulk Purchase": ["Submit", "Manager", "Finance", "GM", "Archive"],
+    "Bulk Leave": ["Submit", "Supervisor", "HR"],
+    "Bulk Contract": ["Draft", "Legal", "Finance", "Sign"],
+}
+
+def seed_bulk(instances: int, users: int = 50, running_ratio: float = 0.1, days: int = 90,
+              batch_size: int = 5000, seed: int = 42):
+    """
+    Generate `instances` workflow instances with their executions for load and
+    benchmark runs (about 4 executions each, so 250k instances is ~1M rows).
+    Rows go in with chunked executemany INSERTs and explicit ids instead of
+    one ORM object per row; the stats rollup is rebuilt once at the end.
+    Appends to whatever is already in the database.
+    """
+    # Also usable on an empty database, before the app has ever started
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.upgrade(database.engine)
+
+    rng = random.Random(seed)
+    db = database.SessionLocal()
+    try:
+        # Operators share one password hash; bcrypt per user would dominate the run
+        password_hash = auth.get_password_hash("bench123")
+        existing = {u for (u,) in db.query(models.User.username).filter(models.User.username.like("bench_user_%"))}
+        new_users = [
+            {"username": f"bench_user_{i}", "password_hash": password_hash, "role": models.UserRole.OPERATOR}
+            for i in range(users) if f"bench_user_{i}" not in existing
+        ]
+        if new_users:
+            db.execute(insert(models.User), new_users)
+        user_ids = [u for (u,) in db.query(models.User.id).filter(models.User.username.like("bench_user_%"))]
+
+        templates = []
+        for name, nodes in BULK_TEMPLATES.items():
+            template = db.query(models.WorkflowTemplate).filter(models.WorkflowTemplate.name == name).first()
+            if template is None:
+                template = models.WorkflowTemplate(name=name, graph_json={"nodes": [{"id": n} for n in nodes]}, version=1)
+                db.add(template)
+                db.flush()
+            templates.append((template.id, nodes))
+        db.commit()
+
+        next_instance = (db.query(func.max(models.WorkflowInstance.id)).scalar() or 0) + 1
+        now = datetime.now()
+        node_hours = {n: rng.randint(9, 17) for _, nodes in templates for n in nodes}
+        # Durations depend on the step within its template, the operator and the weekday,
+        # so prediction benchmarks have structure to learn
+        node_mean = {(t, n): rng.randint(300, 3600) for t, nodes in templates for n in nodes}
+        user_speed = {u: rng.uniform(0.6, 1.6) for u in user_ids}
+        weekday_factor = [1.0, 0.95, 0.95, 1.0, 1.3, 1.6, 1.6]
+        created = 0
+        while created < instances:
+            instance_rows, execution_rows = [], []
+            for _ in range(min(batch_size, instances - created)):
+                template_id, nodes = rng.choice(templates)
+                user_id = rng.choice(user_ids)
+                running = rng.random() < running_ratio
+                start = now - timedelta(days=rng.uniform(0, days))
+                start = start.replace(hour=node_hours[nodes[0]], minute=rng.randint(0, 59))
+                # Running instances have `done` completed nodes and one running
+                done = rng.randint(0, len(nodes) - 1) if running else len(nodes)
+                t = start
+                for index, node in enumerate(nodes[:done + 1] if running else nodes):
+                    mean = node_mean[(template_id, node)] * user_speed[user_id] * weekday_factor[t.weekday()]
+                    actual = max(30, int(rng.gauss(mean, mean * 0.2)))
+                    completed = index < done
+                    execution_rows.append({
+                        "instance_id": next_instance,
+                        "node_id": node,
+                        "executed_by": user_id,
+                        "status": models.NodeStatus.COMPLETED if completed else models.NodeStatus.RUNNING,
+                        "start_time": t,
+                        "end_time": t + timedelta(seconds=actual) if completed else None,
+                        "predicted_duration": max(30, actual + rng.randint(-600, 600)),
+                        "actual_duration": actual if completed else None,
+                    })
+                    t += timedelta(seconds=actual + 60)
+                # The hour replaced on today's date, or a long chain after it, can pass now: move the
+                # instance back by whole days (keeping the hour of day) so nothing starts or ends later
+                latest = execution_rows[-1]["start_time"] if running else t  # t is also the instance's end_time
+                shift = math.ceil((latest - now) / timedelta(days=1))
+                if shift > 0:
+                    delta = timedelta(days=shift)
+                    start, t = start - delta, t - delta
+                    for row in execution_rows[-(index + 1):]:
+                        row["start_time"] -= delta
+                        if row["end_time"] is not None:
+                            row["end_time"] -= delta
+                instance_rows.append({
+                    "id": next_instance,
+                    "template_id": template_id,
+                    "current_node_id": nodes[done] if running else None,
+                    "status": models.WorkflowStatus.RUNNING if running else models.WorkflowStatus.COMPLETED,
+                    "start_time": start,
+                    "end_time": None if running else t,
+                    "lock_version": 1,
+                })
+                next_instance += 1
+            db.execute(insert(models.WorkflowInstance), instance_rows)
+            db.execute(insert(models.NodeExecution), execution_rows)
+            db.commit()
+            created += len(instance_rows)
+            print(f"Seeded {created}/{instances} instances")
+        stats.rebuild(db)
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    seed_db()
+    parser = argparse.ArgumentParser(description="Seed demo data, or bulk data with --bulk")
+    parser.add_argument("--bulk", type=int, default=0, help="number of instances to generate (~4 executions each)")
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    if args.bulk:
+        seed_bulk(args.bulk, users=args.users)
+    else:
+        seed_db()
@@ -0,0 +1,369 @@
+"""
+SLA-breach forecasting for running instances, served by GET /analytics/at-risk.
+
+An instance's deadline is its start time plus the template's
+graph_json["sla_seconds"] (SLA_DEFAULT_SECONDS when unset; 0 = no default).
+For every unfinished node the scanner keeps the predicted duration at each
+of prediction.QUANTILE_LEVELS and rescores an instance only when it changed
+(lock_version), its template version changed or another model went live.
+The trainer refits every few completions, so a new model triggers a full
+rescore at most once per SLA_MODEL_RESCORE_SECONDS; until then only changed
+instances pick it up.
+A scan therefore reads one row per running instance, scores the changed
+ones in one batched call and walks each template's graph once with NumPy
+over all of its instances and quantile levels.
+
+Node errors within an instance are treated as fully correlated (every node
+at the same level), so the makespan at each level is a quantile of the
+remaining time; this errs towards wide intervals. The breach probability
+is the share of levels whose remaining time overruns the deadline.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from . import database, models, prediction, workflow
+
+SLA_DEFAULT_SECONDS = float(os.getenv("SLA_DEFAULT_SECONDS", "86400"))
+# Background scan period; the endpoint serves the latest scan
+SLA_SCAN_SECONDS = float(os.getenv("SLA_SCAN_SECONDS", "30"))
+# Instances at or above this breach probability are reported as at risk
+SLA_RISK_THRESHOLD = float(os.getenv("SLA_RISK_THRESHOLD", "0.5"))
+# Minimum time between full rescores caused by a newly trained model
+SLA_MODEL_RESCORE_SECONDS = float(os.getenv("SLA_MODEL_RESCORE_SECONDS", "600"))
+# Instance ids per IN (...) when loading the executions of changed instances
+SLA_LOAD_CHUNK = 5000
+
+
+class InstanceState:
+    """Cached forecast inputs of one running instance: its row in a TemplateBlock"""
+    __slots__ = ("key", "block", "slot", "template_id", "start_time", "deadline")
+
+
+class TemplateBlock:
+    """
+    Node quantiles, running-node start timestamps and done flags of every
+    cached instance of one template version, one preallocated row per
+    instance, so a scan evaluates them without copying per-instance arrays.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        n = len(compiled.node_ids)
+        self.quantiles = np.zeros((0, n, len(prediction.QUANTILE_LEVELS)))
+        self.running_start = np.zeros((0, n))
+        self.done = np.zeros((0, n), dtype=bool)
+        self.deadline = np.zeros(0)
+        self.instance_id = np.zeros(0, dtype=np.int64)
+        self.free = []
+
+    def add(self, instance_id: int) -> int:
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.instance_id[slot] = instance_id
+        return slot
+
+    def reset(self, slot: int, deadline):
+        self.quantiles[slot] = 0.0
+        self.running_start[slot] = np.nan
+        self.done[slot] = False
+        self.deadline[slot] = deadline
+
+    def remove(self, slot: int):
+        self.instance_id[slot] = -1
+        self.done[slot] = True  # Free rows add nothing to the schedule
+        self.free.append(slot)
+
+    def __len__(self):
+        return len(self.instance_id) - len(self.free)
+
+    def _grow(self):
+        old = len(self.instance_id)
+        extra = max(64, old)
+
+        def pad(array, value):
+            return np.concatenate([array, np.full((extra,) + array.shape[1:], value, dtype=array.dtype)])
+
+        self.quantiles = pad(self.quantiles, 0.0)
+        self.running_start = pad(self.running_start, np.nan)
+        self.done = pad(self.done, True)
+        self.deadline = pad(self.deadline, np.nan)
+        self.instance_id = pad(self.instance_id, -1)
+        self.free.extend(range(old + extra - 1, old - 1, -1))
+
+
+class SLAScanner:
+    def __init__(self, predictor=None, interval: float = SLA_SCAN_SECONDS,
+                 default_sla: float = SLA_DEFAULT_SECONDS, threshold: float = SLA_RISK_THRESHOLD,
+                 model_rescore_interval: float = SLA_MODEL_RESCORE_SECONDS):
+        self.predictor = predictor or prediction.predictor
+        self.interval = interval
+        self.default_sla = default_sla
+        self.threshold = threshold
+        self.model_rescore_interval = model_rescore_interval
+        self._model = None  # Model the cached forecasts are keyed on
+        self._model_adopted = None
+        self._states = {}  # instance id -> InstanceState
+        self._blocks = {}  # (template id, version) -> TemplateBlock
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.result = None
+        self.scans = 0
+        self.last_error = None
+
+    def scan(self, db, now: datetime = None) -> dict:
+        """Forecast every running instance; only changed instances are rescored"""
+        with self._scan_lock:
+            return self._scan(db, now or datetime.now())
+
+    def _scan(self, db, now):
+        started = time.perf_counter()
+        I = models.WorkflowInstance
+        # Integers only: start times are read just for the instances that get rescored
+        rows = db.execute(
+            select(I.id, I.lock_version, I.template_id).where(I.status == models.WorkflowStatus.RUNNING)
+        ).all()
+        templates = self._templates(db, {r.template_id for r in rows})
+        model = self._current_model()
+
+        states, stale = {}, []
+        for instance_id, lock_version, template_id in rows:
+            compiled = templates.get(template_id)
+            if compiled is None:
+                continue
+            key = (lock_version, compiled.version, model)
+            state = self._states.get(instance_id)
+            if state is not None and state.key == key:
+                states[instance_id] = state
+            else:
+                stale.append((instance_id, template_id, compiled, key))
+        for instance_id, state in self._states.items():
+            if instance_id not in states:
+                state.block.remove(state.slot)  # Finished, or about to be rescored into a fresh row
+        if stale:
+            states.update(self._build(db, stale, now))
+        self._states = states
+        for key in [k for k, block in self._blocks.items() if not len(block)]:
+            del self._blocks[key]
+
+        result = self._evaluate(now)
+        result.update({
+            "states": states,
+            "scanned_at": now,
+            "scan_ms": round((time.perf_counter() - started) * 1000, 1),
+            "rescored": len(stale),
+            "finished": time.monotonic(),
+        })
+        self.result = result
+        self.scans += 1
+        return result
+
+    def _current_model(self):
+        model = self.predictor.trained_at
+        if model != self._model:
+            clock = time.monotonic()
+            if self._model_adopted is None or clock - self._model_adopted >= self.model_rescore_interval:
+                self._model, self._model_adopted = model, clock
+        return self._model
+
+    def _templates(self, db, template_ids):
+        compiled = {}
+        for template in db.query(models.WorkflowTemplate).filter(models.WorkflowTemplate.id.in_(template_ids)):
+            try:
+                compiled[template.id] = workflow.compile_template(template)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass  # Instances of a malformed graph cannot be forecast
+        return compiled
+
+    def _build(self, db, stale, now):
+        E, I = models.NodeExecution, models.WorkflowInstance
+        ids = [instance_id for instance_id, _, _, _ in stale]
+        executions, start_times = defaultdict(list), {}
+        for i in range(0, len(ids), SLA_LOAD_CHUNK):
+            chunk = ids[i:i + SLA_LOAD_CHUNK]
+            start_times.update(db.execute(select(I.id, I.start_time).where(I.id.in_(chunk))).all())
+            query = select(E.instance_id, E.node_id, E.status, E.start_time, E.executed_by).where(E.instance_id.in_(chunk))
+            for e in db.execute(query):
+                executions[e.instance_id].append(e)
+
+        states = {}
+        rows = []  # (state, node index, user_id, start time of a running node or None)
+        for instance_id, template_id, compiled, key in stale:
+            block = self._blocks.get((compiled.template_id, compiled.version))
+            if block is None:
+                block = self._blocks[(compiled.template_id, compiled.version)] = TemplateBlock(compiled)
+            state = InstanceState()
+            state.key, state.block, state.slot = key, block, block.add(instance_id)
+            state.template_id, state.start_time = template_id, start_times.get(instance_id)
+            sla = compiled.sla_seconds or self.default_sla
+            state.deadline = state.start_time + timedelta(seconds=sla) if sla and state.start_time else None
+            block.reset(state.slot, state.deadline.timestamp() if state.deadline else np.nan)
+
+            running, user_id = {}, None
+            for e in executions[instance_id]:
+                index = compiled.index.get(e.node_id)
+                if index is None:
+                    continue  # Node no longer in the template
+                if e.status == models.NodeStatus.RUNNING:
+                    running[index] = e.start_time
+                    block.running_start[state.slot, index] = e.start_time.timestamp()
+                else:
+                    block.done[state.slot, index] = True
+                if user_id is None or e.status == models.NodeStatus.RUNNING:
+                    user_id = e.executed_by
+            done = block.done[state.slot]
+            rows.extend((state, i, user_id, running.get(i)) for i in range(len(done)) if not done[i])
+            states[instance_id] = state
+        if not rows:
+            return states
+
+        node_ids = [s.block.compiled.node_ids[i] for s, i, _, _ in rows]
+        user_ids = [u for _, _, u, _ in rows]
+        template_ids = [s.template_id for s, _, _, _ in rows]
+        point, quantiles = self.predictor.predict_distribution(
+            node_ids, user_ids, [t or now for _, _, _, t in rows], template_ids)
+        for (state, i, _, _), q in zip(rows, quantiles):
+            state.block.quantiles[state.slot, i] = q
+
+        # As in forecast_graphs, nodes not started yet are rescored at their forecast start
+        pending = [k for k, row in enumerate(rows) if row[3] is None]
+        if pending:
+            offsets = self._start_offsets(states, rows, point, now)
+            _, quantiles = self.predictor.predict_distribution(
+                [node_ids[k] for k in pending],
+                [user_ids[k] for k in pending],
+                [now + timedelta(seconds=float(offsets[k])) for k in pending],
+                [template_ids[k] for k in pending])
+            for k, q in zip(pending, quantiles):
+                state, i, _, _ = rows[k]
+                state.block.quantiles[state.slot, i] = q
+        return states
+
+    def _start_offsets(self, states, rows, point, now):
+        # Earliest start of every row's node on the point-forecast schedule of the rescored instances
+        durations = {id(s): np.zeros(s.block.done.shape[1]) for s in states.values()}
+        for (state, i, _, started), p in zip(rows, point):
+            durations[id(state)][i] = max(p - (now - started).total_seconds(), 0.0) if started else p
+        groups = defaultdict(list)
+        for state in states.values():
+            groups[id(state.block)].append(state)
+        starts = {}
+        for group in groups.values():
+            block = group[0].block
+            d = np.stack([durations[id(s)] for s in group])
+            finish = block.compiled.schedule_many(d, block.done[[s.slot for s in group]])
+            starts.update((id(s), f - x) for s, f, x in zip(group, finish, d))
+        return np.array([starts[id(state)][i] for state, i, _, _ in rows])
+
+    def _evaluate(self, now):
+        ts = now.timestamp()
+        ids, remaining, time_left = [], [], []
+        for block in self._blocks.values():
+            elapsed = ts - block.running_start[..., None]
+            # Running nodes only contribute the time still to go at each level
+            quantiles = np.where(np.isnan(elapsed), block.quantiles, np.maximum(block.quantiles - elapsed, 0.0))
+            live = block.instance_id >= 0
+            remaining.append(block.compiled.schedule_many(quantiles, block.done).max(axis=1)[live])
+            time_left.append(block.deadline[live] - ts)
+            ids.append(block.instance_id[live])
+        levels = len(prediction.QUANTILE_LEVELS)
+        remaining = np.concatenate(remaining) if remaining else np.empty((0, levels))
+        time_left = np.concatenate(time_left) if time_left else np.empty(0)
+        probability = (remaining > time_left[:, None]).mean(axis=1)
+        probability[np.isnan(time_left)] = np.nan  # No SLA
+        return {
+            "instance_ids": np.concatenate(ids) if ids else np.empty(0, dtype=np.int64),
+            "remaining": remaining,
+            "time_left": time_left,
+            "probability": probability,
+        }
+
+    def refresh(self):
+        db = database.ReadSessionLocal()
+        try:
+            result = self.scan(db)
+            self.last_error = None
+            return result
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"SLA scan failed: {e}")
+        finally:
+            db.close()
+
+    def report(self, limit: int = 50, min_probability: float = None, refresh: bool = False) -> dict:
+        """Running instances at or above min_probability, most likely breaches first"""
+        result = self.result
+        if refresh or result is None or time.monotonic() - result["finished"] > self.interval:
+            result = self.refresh() or result
+        threshold = self.threshold if min_probability is None else min_probability
+        summary = {"threshold": threshold, "running": 0, "at_risk": 0, "items": [], "error": self.last_error}
+        if result is None:
+            return summary
+
+        probability, time_left = result["probability"], result["time_left"]
+        at_risk = np.flatnonzero(probability >= threshold)
+        order = at_risk[np.lexsort((time_left[at_risk], -probability[at_risk]))][:limit]
+        scanned_at = result["scanned_at"]
+        items = []
+        if len(order):
+            p50, p90 = prediction.at_levels(result["remaining"][order], [0.5, 0.9]).T
+            for k, median, high in zip(order, p50, p90):
+                instance_id = int(result["instance_ids"][k])
+                state = result["states"][instance_id]
+                items.append({
+                    "instance_id": instance_id,
+                    "template_id": state.template_id,
+                    "start_time": state.start_time,
+                    "deadline": state.deadline,
+                    "time_left_seconds": int(time_left[k]),
+                    "remaining_p50": int(median),
+                    "remaining_p90": int(high),
+                    "eta": scanned_at + timedelta(seconds=float(median)),
+                    "breach_probability": round(float(probability[k]), 3),
+                })
+        summary.update({
+            "scanned_at": scanned_at,
+            "scan_ms": result["scan_ms"],
+            "rescored": result["rescored"],
+            "running": len(result["states"]),
+            "at_risk": len(at_risk),
+            "items": items,
+        })
+        return summary
+
+    def status(self):
+        result = self.result
+        return {
+            "scans": self.scans,
+            "running": len(result["states"]) if result else 0,
+            "at_risk": int(np.count_nonzero(result["probability"] >= self.threshold)) if result else 0,
+            "scan_ms": result["scan_ms"] if result else None,
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sla-scanner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+
+scanner = SLAScanner()
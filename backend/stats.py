@@ -0,0 +1,145 @@
+from datetime import date, timedelta
+
+from sqlalchemy import func, case, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+S = models.ExecutionStat
+
+
+def _upsert(db: Session, key: tuple, values: dict, row: dict):
+    # Atomic in-place increment; only insert when the key has no row yet
+    day, template_id, node_id = key
+    where = (S.day == day, S.template_id == template_id, S.node_id == node_id)
+    if db.execute(update(S).where(*where).values(**values)).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(S(day=day, template_id=template_id, node_id=node_id, **row))
+    except IntegrityError:
+        # A concurrent completion created the row first
+        db.execute(update(S).where(*where).values(**values))
+
+
+def record_completions(db: Session, completions):
+    """
+    Fold completed executions, given as (execution, template_id) pairs, into
+    the daily rollup with one statement per (day, template, node) key. Runs
+    inside the caller's transaction, so the rollup commits together with the
+    completions.
+    """
+    totals = {}
+    for execution, template_id in completions:
+        day = (execution.end_time or execution.start_time).date()
+        actual = execution.actual_duration or 0
+        predicted = execution.predicted_duration
+        t = totals.setdefault((day, template_id, execution.node_id), [0, 0, 0, 0, 0])
+        t[0] += 1
+        t[1] += actual
+        if predicted is not None:
+            t[2] += 1
+            t[3] += predicted
+            t[4] += abs(actual - predicted)
+
+    for key, (count, actual, pred_count, predicted, abs_err) in totals.items():
+        values = {
+            "count": S.count + count,
+            "total_actual": S.total_actual + actual,
+            "predicted_count": S.predicted_count + pred_count,
+            "total_predicted": S.total_predicted + predicted,
+            "total_abs_error": S.total_abs_error + abs_err,
+        }
+        row = {
+            "count": count, "total_actual": actual, "predicted_count": pred_count,
+            "total_predicted": predicted, "total_abs_error": abs_err,
+        }
+        _upsert(db, key, values, row)
+
+
+def record_completion(db: Session, execution: models.NodeExecution, template_id: int):
+    record_completions(db, [(execution, template_id)])
+
+
+def rebuild(db: Session):
+    """Recompute the rollup from node_executions with one grouped INSERT ... SELECT"""
+    E, I = models.NodeExecution, models.WorkflowInstance
+    has_pred = E.predicted_duration != None
+    day = func.date(E.end_time)
+    select = db.query(
+        day,
+        I.template_id,
+        E.node_id,
+        func.count(E.id),
+        func.sum(E.actual_duration),
+        func.sum(case((has_pred, 1), else_=0)),
+        func.coalesce(func.sum(E.predicted_duration), 0),
+        func.coalesce(func.sum(func.abs(E.actual_duration - E.predicted_duration)), 0),
+    ).join(I, I.id == E.instance_id).filter(
+        E.status == models.NodeStatus.COMPLETED,
+        E.actual_duration != None
+    ).group_by(day, I.template_id, E.node_id)
+
+    db.query(S).delete()
+    db.execute(insert(S).from_select(
+        ["day", "template_id", "node_id", "count", "total_actual", "predicted_count", "total_predicted", "total_abs_error"],
+        select.statement
+    ))
+    db.commit()
+
+
+def ensure_built(db: Session):
+    # Backfill once for databases that predate the rollup table
+    if db.query(S.id).first() is None and db.query(models.NodeExecution.id).filter(
+        models.NodeExecution.status == models.NodeStatus.COMPLETED,
+        models.NodeExecution.actual_duration != None
+    ).first() is not None:
+        rebuild(db)
+
+
+def average_duration(db: Session) -> float:
+    total, count = db.query(func.sum(S.total_actual), func.sum(S.count)).one()
+    return (total or 0) / count if count else 0
+
+
+def _aggregate(db: Session, *group_by, since: date = None):
+    query = db.query(
+        *group_by,
+        func.sum(S.count),
+        func.sum(S.total_actual),
+        func.sum(S.predicted_count),
+        func.sum(S.total_predicted),
+        func.sum(S.total_abs_error),
+    )
+    if since is not None:
+        query = query.filter(S.day >= since)
+    rows = []
+    for *keys, count, actual, pred_count, predicted, abs_err in query.group_by(*group_by).order_by(*group_by):
+        rows.append({
+            "keys": keys,
+            "count": count,
+            "actual": round(actual / count, 1) if count else None,
+            "predicted": round(predicted / pred_count, 1) if pred_count else None,
+            "mae": round(abs_err / pred_count, 1) if pred_count else None,
+        })
+    return rows
+
+
+def by_day(db: Session, days: int = 30):
+    rows = _aggregate(db, S.day, since=date.today() - timedelta(days=days - 1))
+    return [{"day": r.pop("keys")[0], **r} for r in rows]
+
+
+def by_template(db: Session):
+    rows = _aggregate(db, S.template_id)
+    return [{"template_id": r.pop("keys")[0], **r} for r in rows]
+
+
+def by_node(db: Session):
+    rows = _aggregate(db, S.template_id, S.node_id)
+    out = []
+    for r in rows:
+        template_id, node_id = r.pop("keys")
+        out.append({"template_id": template_id, "node_id": node_id, **r})
+    return out
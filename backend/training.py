@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+
+from . import cache, database, model_registry, prediction
+from .feature_store import has_rows_after
+
+# Retrain policy: refit after N completed nodes, or every T seconds if anything changed
+RETRAIN_EVERY_N_COMPLETIONS = int(os.getenv("RETRAIN_EVERY_N_COMPLETIONS", "20"))
+RETRAIN_INTERVAL_SECONDS = float(os.getenv("RETRAIN_INTERVAL_SECONDS", "300"))
+# How often workers check the model registry for versions published by other processes
+MODEL_RELOAD_SECONDS = float(os.getenv("MODEL_RELOAD_SECONDS", "10"))
+
+
+class TrainingWorker:
+    """
+    Retrains the duration predictor on a background thread.
+
+    Request handlers only bump a counter (notify_completion) or ask for a
+    refit (request_retrain). Triggers that arrive while a fit is running are
+    merged into a single follow-up run, so the request path never waits on
+    sklearn and a burst of completions costs at most one extra fit.
+
+    Fitted models go through the model registry: only the worker holding the
+    registry's training lock fits and publishes, the others hot-reload the
+    published version, and a fit is skipped when the loaded version already
+    covers every completed execution.
+    """
+
+    def __init__(self, predictor, registry=None, every_n=RETRAIN_EVERY_N_COMPLETIONS,
+                 interval=RETRAIN_INTERVAL_SECONDS, reload_interval=MODEL_RELOAD_SECONDS):
+        self.predictor = predictor
+        self.registry = registry or model_registry.registry
+        self.every_n = max(1, every_n)
+        self.interval = interval
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = 0
+        self._requested = False
+        self._running = False
+        self._thread = None
+        self._last_run = time.monotonic()
+        self.runs = 0
+        self.reloads = 0
+        self._failed_version = None
+        self.last_error = None
+
+    def notify_completion(self, count: int = 1):
+        with self._lock:
+            self._pending += count
+            if self._pending >= self.every_n:
+                self._wakeup.set()
+
+    def request_retrain(self):
+        with self._lock:
+            self._requested = True
+            self._wakeup.set()
+
+    def load_latest(self) -> bool:
+        """Swap in the registry's latest version if it is newer than the current one"""
+        latest = self.registry.latest_version()
+        if latest is None or (self.predictor.version or 0) >= latest or latest == self._failed_version:
+            return False
+        try:
+            self.predictor.load(self.registry, latest)
+        except Exception as e:
+            self._failed_version = latest  # Not retried; a newer version supersedes it
+            print(f"Loading model version {latest} failed: {e}")
+            return False
+        self.reloads += 1
+        cache.response_cache.invalidate("analytics")
+        print(f"Loaded model version {latest}.")
+        return True
+
+    def warm_start(self):
+        """Startup: reuse the latest published models, train only if they are missing or stale"""
+        self.load_latest()
+        if self._is_stale():
+            self.request_retrain()
+
+    def _is_stale(self) -> bool:
+        if not self.predictor.is_trained:
+            return True
+        db = database.SessionLocal()
+        try:
+            return has_rows_after(db, self.predictor.high_water)
+        finally:
+            db.close()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="predictor-trainer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _take_trigger(self) -> bool:
+        with self._lock:
+            self._wakeup.clear()
+            due = time.monotonic() - self._last_run >= self.interval
+            if self._requested or self._pending >= self.every_n or (self._pending and due):
+                self._pending = 0
+                self._requested = False
+                return True
+            return False
+
+    def _run(self):
+        while self._running:
+            remaining = self.interval - (time.monotonic() - self._last_run)
+            self._wakeup.wait(timeout=max(min(remaining, self.reload_interval), 0.01))
+            if not self._running:
+                break
+            self.load_latest()
+            if self._take_trigger():
+                self.run_once()
+            elif time.monotonic() - self._last_run >= self.interval:
+                # Idle period with no new data: restart the interval window
+                self._last_run = time.monotonic()
+
+    def run_once(self):
+        with self.registry.training_lock() as leader:
+            if not leader:
+                # Another worker is fitting; retry after its version has been reloaded
+                with self._lock:
+                    self._requested = True
+                return
+            db = database.SessionLocal()
+            try:
+                # It may have published while this worker waited for the lock
+                self.load_latest()
+                if self.predictor.is_trained and not has_rows_after(db, self.predictor.high_water):
+                    return
+                self.predictor.train(db)
+                self.predictor.publish(self.registry)
+                cache.response_cache.invalidate("analytics")
+                self.runs += 1
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Background training failed: {e}")
+            finally:
+                db.close()
+                self._last_run = time.monotonic()
+
+    def status(self):
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "pending_completions": self._pending,
+            "every_n": self.every_n,
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "trained_at": self.predictor.trained_at,
+            "model_version": self.predictor.version,
+            "registry_version": self.registry.latest_version(),
+        }
+
+
+trainer = TrainingWorker(prediction.predictor)
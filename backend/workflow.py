@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CompiledTemplate:
+    """
+    Precomputed form of a template's graph_json.
+
+    Nodes come from graph_json["nodes"]. If graph_json has "edges"
+    ({"source": ..., "target": ...} or {"from": ..., "to": ...}) they define
+    the graph; otherwise the nodes list is treated as an ordered chain.
+    An optional graph_json["sla_seconds"] is the time an instance may take
+    from its start.
+    """
+
+    def __init__(self, template_id: int, version: int, graph_json: dict):
+        graph_json = graph_json or {}
+        self.template_id = template_id
+        self.version = version
+        self.node_ids = [n["id"] for n in graph_json.get("nodes", [])]
+        if not self.node_ids:
+            raise ValueError("Invalid template: no nodes")
+        self.index = {}
+        for i, node_id in enumerate(self.node_ids):
+            if node_id in self.index:
+                raise ValueError(f"Invalid template: duplicate node id {node_id}")
+            self.index[node_id] = i
+
+        n = len(self.node_ids)
+        self.successors = [[] for _ in range(n)]
+        self.predecessors = [[] for _ in range(n)]
+        edges = graph_json.get("edges")
+        if edges:
+            for edge in edges:
+                source, target = edge.get("source", edge.get("from")), edge.get("target", edge.get("to"))
+                if source not in self.index or target not in self.index:
+                    raise ValueError(f"Invalid template: edge {source} -> {target} references an unknown node")
+                self.successors[self.index[source]].append(self.index[target])
+                self.predecessors[self.index[target]].append(self.index[source])
+        else:
+            for i in range(n - 1):
+                self.successors[i].append(i + 1)
+                self.predecessors[i + 1].append(i)
+
+        self.sla_seconds = graph_json.get("sla_seconds")
+        if self.sla_seconds is not None and (isinstance(self.sla_seconds, bool) or not isinstance(self.sla_seconds, (int, float)) or self.sla_seconds <= 0):
+            raise ValueError("Invalid template: sla_seconds must be a positive number")
+
+        self.start_nodes = [self.node_ids[i] for i in range(n) if not self.predecessors[i]]
+        self.terminal_nodes = [self.node_ids[i] for i in range(n) if not self.successors[i]]
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        indegree = [len(p) for p in self.predecessors]
+        ready = [i for i, d in enumerate(indegree) if d == 0]
+        order = []
+        while ready:
+            i = ready.pop(0)
+            order.append(i)
+            for j in self.successors[i]:
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    ready.append(j)
+        if len(order) != len(self.node_ids):
+            raise ValueError("Invalid template: graph contains a cycle")
+        return order
+
+    @property
+    def start_node(self):
+        return self.start_nodes[0]
+
+    def next_nodes(self, node_id: str):
+        i = self.index.get(node_id)
+        return [] if i is None else [self.node_ids[j] for j in self.successors[i]]
+
+    def next_node(self, node_id: str):
+        nxt = self.next_nodes(node_id)
+        return nxt[0] if nxt else None
+
+    def ready_after(self, node_id: str, completed: set, started: set = frozenset()):
+        """
+        Successors of node_id that can start once node_id is in `completed`.
+        A node with several predecessors (a join) starts only after all of them
+        have completed; nodes in `started` already have an execution.
+        """
+        ready = []
+        for j in self.successors[self.index[node_id]]:
+            candidate = self.node_ids[j]
+            if candidate in started:
+                continue
+            if all(self.node_ids[p] in completed for p in self.predecessors[j]):
+                ready.append(candidate)
+        return ready
+
+    def schedule(self, durations: dict, done: set = frozenset()):
+        """
+        Earliest-start schedule of the nodes not in `done`, with all branches
+        running in parallel. Returns ({node_id: start_offset}, makespan), where
+        the makespan is the critical-path length.
+        """
+        finish = [0.0] * len(self.node_ids)
+        starts = {}
+        for i in self.order:
+            node_id = self.node_ids[i]
+            if node_id in done:
+                continue
+            start = max((finish[p] for p in self.predecessors[i]), default=0.0)
+            starts[node_id] = start
+            finish[i] = start + durations.get(node_id, 0)
+        return starts, max(finish, default=0.0)
+
+    def schedule_many(self, durations: np.ndarray, done: np.ndarray) -> np.ndarray:
+        """
+        schedule() for many instances of this template in one pass.
+        durations is an (instances, nodes, ...) array in node_ids order and
+        done an (instances, nodes) bool array. Returns the finish offsets in
+        the shape of durations; their max over axis 1 is the makespan.
+        """
+        finish = np.zeros(durations.shape)
+        shape = (-1,) + (1,) * (durations.ndim - 2)
+        for i in self.order:
+            preds = self.predecessors[i]
+            start = finish[:, preds].max(axis=1) if preds else 0.0
+            finish[:, i] = np.where(done[:, i].reshape(shape), 0.0, start + durations[:, i])
+        return finish
+
+
+class TemplateCache:
+    """LRU cache of compiled templates keyed by (template_id, version)"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template) -> CompiledTemplate:
+        key = (template.id, template.version)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+        compiled = CompiledTemplate(template.id, template.version, template.graph_json)
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, template_id: int):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == template_id]:
+                del self._entries[key]
+
+
+template_cache = TemplateCache()
+
+
+def compile_template(template) -> CompiledTemplate:
+    return template_cache.get(template)
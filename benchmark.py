@@ -0,0 +1,261 @@
+"""
+Reproducible in-process benchmark of the API.
+
+Boots backend.main against a throwaway SQLite database, bulk-seeds it with
+backend.seed.seed_bulk, then replays a fixed, seeded mix of logins,
+instance starts, node completions and dashboard/list reads from concurrent
+clients through httpx's ASGI transport. Per-endpoint throughput and
+p50/p95/p99 latency are written to a JSON report; with --baseline the run
+exits non-zero when an endpoint regressed beyond --tolerance.
+
+    python benchmark.py --instances 250000 --requests 5000 --concurrency 32 \\
+        --out benchmark_results.json --baseline benchmarks/baseline.json
+    python benchmark.py ... --save-baseline benchmarks/baseline.json
+
+Baselines are machine specific: record one on the machine that runs the gate.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+import httpx
+
+# Share of each operation in the replayed workload
+WORKLOAD = {
+    "login": 5,
+    "start_instance": 10,
+    "complete_node": 25,
+    "dashboard_overview": 15,
+    "dashboard_stats": 10,
+    "list_instances": 15,
+    "list_templates": 10,
+    "list_logs": 10,
+}
+
+
+def percentile(samples, q):
+    # Nearest-rank percentile of an already sorted list
+    if not samples:
+        return 0.0
+    return samples[min(len(samples), max(1, math.ceil(q * len(samples)))) - 1]
+
+
+class Workload:
+    def __init__(self, client, rng, users, templates, running):
+        self.client = client
+        self.rng = rng
+        self.users = users
+        self.templates = templates
+        self.running = deque(running)  # Instance ids with a node left to complete
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def run(self, op):
+        started = time.perf_counter()
+        try:
+            ok = await getattr(self, op)()
+        except httpx.HTTPError:
+            ok = False
+        self.latencies[op].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[op] += 1
+
+    async def login(self):
+        username = self.rng.choice(self.users)
+        res = await self.client.post("/token", data={"username": username, "password": "bench123"})
+        return res.status_code == 200
+
+    async def start_instance(self):
+        res = await self.client.post("/instances", json={"template_id": self.rng.choice(self.templates)})
+        if res.status_code == 200:
+            self.running.append(res.json()["id"])
+        return res.status_code == 200
+
+    async def complete_node(self):
+        if not self.running:
+            return await self.start_instance()
+        instance_id = self.running.popleft()
+        res = await self.client.post(f"/instances/{instance_id}/complete_node")
+        if res.status_code == 200 and res.json()["instance_status"] == "Running":
+            self.running.append(instance_id)
+        return res.status_code == 200
+
+    async def dashboard_overview(self):
+        return (await self.client.get("/dashboard/overview")).status_code == 200
+
+    async def dashboard_stats(self):
+        return (await self.client.get("/dashboard/stats")).status_code == 200
+
+    async def list_instances(self):
+        return (await self.client.get("/instances", params={"limit": 50})).status_code == 200
+
+    async def list_templates(self):
+        return (await self.client.get("/templates")).status_code == 200
+
+    async def list_logs(self):
+        return (await self.client.get("/logs", params={"limit": 50})).status_code == 200
+
+
+def plan(rng, count):
+    ops, weights = zip(*WORKLOAD.items())
+    return rng.choices(ops, weights=weights, k=count)
+
+
+async def replay(workload, ops, concurrency):
+    queue = deque(ops)
+
+    async def worker():
+        while queue:
+            await workload.run(queue.popleft())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_async(args):
+    from backend import main
+
+    app = main.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            await client.post("/register", json={"username": "bench_admin", "password": "bench123", "role": "admin"})
+            token = (await client.post("/token", data={"username": "bench_admin", "password": "bench123"})).json()["access_token"]
+            client.headers["Authorization"] = f"Bearer {token}"
+
+            db = main.database.SessionLocal()
+            try:
+                users = [u for (u,) in db.query(main.models.User.username).filter(main.models.User.username.like("bench_user_%"))]
+                templates = [t for (t,) in db.query(main.models.WorkflowTemplate.id).filter(main.models.WorkflowTemplate.is_deleted == 0)]
+                running = [i for (i,) in db.query(main.models.WorkflowInstance.id).filter(
+                    main.models.WorkflowInstance.status == main.models.WorkflowStatus.RUNNING
+                ).order_by(main.models.WorkflowInstance.id).limit(10000)]
+            finally:
+                db.close()
+
+            while not main.prediction.predictor.is_trained and main.training.trainer.last_error is None:
+                await asyncio.sleep(0.1)  # Startup training must not overlap the measurement
+
+            rng = random.Random(args.seed)
+            workload = Workload(client, rng, users, templates, running)
+            # Warm caches, the predictor and connection pools outside the measurement
+            await replay(workload, plan(rng, args.warmup), args.concurrency)
+            workload.latencies.clear()
+            workload.errors.clear()
+
+            ops = plan(rng, args.requests)
+            started = time.perf_counter()
+            await replay(workload, ops, args.concurrency)
+            elapsed = time.perf_counter() - started
+    return build_report(args, workload, elapsed)
+
+
+def build_report(args, workload, elapsed):
+    endpoints = {}
+    for op, samples in sorted(workload.latencies.items()):
+        samples = sorted(samples)
+        endpoints[op] = {
+            "requests": len(samples),
+            "errors": workload.errors[op],
+            "throughput": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "config": {
+            "instances": args.instances,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(report, baseline, tolerance, p99_tolerance=None, min_delta_ms=50.0):
+    """Regressions of report against baseline, as human-readable strings"""
+    # p99 rests on a handful of samples per endpoint, so it gets more slack by default
+    limits = {"p95_ms": tolerance, "p99_ms": 2 * tolerance if p99_tolerance is None else p99_tolerance}
+    problems = []
+    for op, current in report["endpoints"].items():
+        if current["errors"]:
+            problems.append(f"{op}: {current['errors']} failed requests")
+        base = baseline.get("endpoints", {}).get(op)
+        if base is None:
+            continue
+        for field, limit in limits.items():
+            # Changes smaller than min_delta_ms are scheduling noise on fast (cached) endpoints
+            if current[field] > base[field] * (1 + limit) and current[field] - base[field] > min_delta_ms:
+                problems.append(f"{op}: {field} {current[field]} > baseline {base[field]} (+{limit:.0%})")
+        if base["throughput"] and current["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append(f"{op}: throughput {current['throughput']} < baseline {base['throughput']} (-{tolerance:.0%})")
+    return problems
+
+
+def print_report(report):
+    print(f"{'endpoint':22} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for op, e in report["endpoints"].items():
+        print(f"{op:22} {e['requests']:9d} {e['throughput']:9.1f} {e['p50_ms']:9.1f} {e['p95_ms']:9.1f} {e['p99_ms']:9.1f} {e['errors']:7d}")
+    print(f"{'total':22} {'':9} {report['throughput']:9.1f}")
+
+
+def run(args):
+    # Imported late: backend binds its engine and settings on import (see __main__)
+    from backend import seed
+
+    if args.instances:
+        seed.seed_bulk(args.instances, users=args.users, seed=args.seed)
+    return asyncio.run(run_async(args))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=20000, help="instances to bulk-seed (~4 executions each)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests before the run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="fail when this JSON report is beaten by more than --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression (0.5 = 50%%)")
+    parser.add_argument("--p99-tolerance", type=float, help="allowed p99 regression (default: 2 x --tolerance)")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="ignore latency regressions smaller than this")
+    parser.add_argument("--save-baseline", help="also write the report here as the new baseline")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Point the app at a throwaway SQLite database before backend is imported
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="benchmark_"), "bench.db"))
+    os.environ.setdefault("MODEL_REGISTRY_DIR", tempfile.mkdtemp(prefix="benchmark_models_"))
+    # Train once at startup only; background retrains would make runs irreproducible
+    os.environ.setdefault("RETRAIN_EVERY_N_COMPLETIONS", "1000000000")
+    os.environ.setdefault("RETRAIN_INTERVAL_SECONDS", "1000000000")
+    report = run(args)
+    print_report(report)
+    for path in filter(None, (args.out, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance, args.p99_tolerance, args.min_delta_ms)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        sys.exit(1 if problems else 0)
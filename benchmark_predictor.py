@@ -0,0 +1,153 @@
+"""
+Prediction quality and per-call cost of the duration predictor on seeded data.
+
+Bulk-seeds a throwaway SQLite database with backend.seed.seed_bulk, loads the
+training set through the FeatureStore and holds out the most recently
+completed executions. Every configuration is fitted on the older rows and
+scored on the holdout; per-call cost goes through predict_many, encoding
+included, for single rows and for batches.
+
+    hash_same_process   old hash(node_id) % 1000 features, scored in the training process
+    hash_other_process  the same model scored with another process's hash salt
+                        (any other worker, or the same one after a restart)
+    global              stable FeatureEncoder features, global Random Forest only
+    node, template      stable features plus the per-node / per-template tier
+
+    python benchmark_predictor.py --instances 50000 --out predictor_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+# The app binds its engine at import time, so point it at SQLite first
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="benchmark_"), "bench.db"))
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from backend import database, seed
+from backend.feature_store import FeatureStore
+from backend.prediction import DurationPredictor, fit_models, predict_routed
+
+CONFIGS = ("hash_same_process", "hash_other_process", "global", "node", "template")
+
+
+def hash_codes(node_ids, salt):
+    # What hash(node_id) % 1000 yields in a process whose string hash salt is `salt`
+    return np.fromiter((hash((salt, n)) % 1000 for n in node_ids), dtype=np.int64, count=len(node_ids))
+
+
+def start_times(hours, weekdays):
+    # 2024-01-01 is a Monday, so day 1 + weekday lands on that weekday
+    return [datetime(2024, 1, 1 + int(d), int(h)) for h, d in zip(hours, weekdays)]
+
+
+def median_ms(fn, calls):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(float(np.median(samples)) * 1000, 3)
+
+
+def scores(y_true, y_pred):
+    return {
+        "mae": round(float(mean_absolute_error(y_true, y_pred)), 1),
+        "rmse": round(float(np.sqrt(mean_squared_error(y_true, y_pred))), 1),
+        "r2": round(float(r2_score(y_true, y_pred)), 4),
+    }
+
+
+def evaluate(store, holdout, batch, calls):
+    X, y, encoder = store.training_data()
+    node_ids = store.column("node_id")
+    split = int(len(y) * (1 - holdout))
+    results = {}
+
+    # Old encoding: (node hash, user, hour), as the predictor used to build it
+    legacy = np.column_stack([hash_codes(node_ids, 0), X[:, 2], X[:, 3]])
+    started = time.perf_counter()
+    fitted = fit_models(legacy[:split], y[:split], legacy[split:], y[split:], tier="none")
+    fit_seconds = time.perf_counter() - started
+    for name, salt in (("hash_same_process", 0), ("hash_other_process", 1)):
+        test = np.column_stack([hash_codes(node_ids[split:], salt), X[split:, 2], X[split:, 3]])
+        rows = np.column_stack([hash_codes(node_ids[split:split + batch], salt), X[split:split + batch, 2], X[split:split + batch, 3]])
+        results[name] = {
+            **scores(y[split:], fitted.rf_model.predict(test)),
+            "fit_seconds": round(fit_seconds, 2),
+            "tier_models": 0,
+            "single_ms": median_ms(lambda: fitted.rf_model.predict(rows[:1]), calls),
+            "batch_ms": median_ms(lambda: fitted.rf_model.predict(rows), max(3, calls // 20)),
+        }
+
+    rows = split + np.arange(min(batch, len(y) - split))
+    args = (
+        list(node_ids[rows]),
+        list(X[rows, 2]),
+        start_times(X[rows, 3], X[rows, 4]),
+        list(X[rows, 1]),
+    )
+    for tier in ("global", "node", "template"):
+        started = time.perf_counter()
+        fitted = fit_models(X[:split], y[:split], X[split:], y[split:], encoder, tier="none" if tier == "global" else tier)
+        fit_seconds = time.perf_counter() - started
+        predictor = DurationPredictor(store)
+        predictor._swap(fitted)
+        results[tier] = {
+            **scores(y[split:], predict_routed(fitted, X[split:])),
+            "fit_seconds": round(fit_seconds, 2),
+            "tier_models": len(fitted.tier_models),
+            "single_ms": median_ms(lambda: predictor.predict_many(*(a[:1] for a in args)), calls),
+            "batch_ms": median_ms(lambda: predictor.predict_many(*args), max(3, calls // 20)),
+        }
+    return results
+
+
+def print_report(report):
+    print(f"{'config':20} {'MAE s':>9} {'RMSE s':>9} {'R2':>8} {'fit s':>8} {'tiers':>6} {'1 row ms':>9} {'batch ms':>9}")
+    for name, r in report["results"].items():
+        print(f"{name:20} {r['mae']:9.1f} {r['rmse']:9.1f} {r['r2']:8.4f} {r['fit_seconds']:8.2f} "
+              f"{r['tier_models']:6d} {r['single_ms']:9.2f} {r['batch_ms']:9.2f}")
+
+
+def run(args):
+    if args.instances:
+        seed.seed_bulk(args.instances, users=args.users, seed=args.seed)
+    store = FeatureStore()
+    db = database.SessionLocal()
+    try:
+        store.refresh(db)
+    finally:
+        db.close()
+    return {
+        "config": {"instances": args.instances, "rows": len(store), "holdout": args.holdout, "batch": args.batch, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "results": evaluate(store, args.holdout, args.batch, args.calls),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=20000, help="instances to bulk-seed (~4 executions each)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of the most recent executions held out")
+    parser.add_argument("--batch", type=int, default=1000, help="rows per batch prediction call")
+    parser.add_argument("--calls", type=int, default=200, help="timed single-row calls")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="predictor_results.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
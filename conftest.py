@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+import pytest
+
+# In-process tests run the app against a throwaway SQLite file instead of MySQL.
+# Must be set before backend.database is imported.
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="data_system_"), "test.db"))
+os.environ.setdefault("MODEL_REGISTRY_DIR", tempfile.mkdtemp(prefix="data_system_models_"))
+
+
+def register(client, username, role="user"):
+    """Register ``username`` (password = username) and return its bearer header"""
+    client.post("/register", json={"username": username, "password": username, "role": role})
+    token = client.post("/token", data={"username": username, "password": username}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="module")
+def client(request):
+    """A TestClient logged in as a user named after the test module.
+
+    The role defaults to admin; parametrize indirectly to pick another one.
+    """
+    from fastapi.testclient import TestClient
+
+    from backend import main
+
+    username = request.module.__name__.removeprefix("test_")
+    with TestClient(main.app) as c:
+        c.headers.update(register(c, username, role=getattr(request, "param", "admin")))
+        yield c
+
+
+@pytest.fixture
+def login(client):
+    """Register another user on the shared client and return its bearer header"""
+    return lambda username, role="user": register(client, username, role)
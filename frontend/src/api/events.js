@@ -0,0 +1,22 @@
+// Live updates from GET /events (server-sent events).
+// handlers maps event names (instance.started, instance.advanced, instance.completed,
+// template.changed, counters, resync) to callbacks receiving the parsed payload.
+// Returns a function that closes the stream; its connected() tells whether events are
+// being delivered right now (false while reconnecting, or for good once the token expired).
+export const subscribeEvents = (handlers) => {
+  const token = localStorage.getItem('token')
+  const source = new EventSource(`/api/events?token=${encodeURIComponent(token || '')}`)
+  Object.entries(handlers).forEach(([name, handler]) => {
+    source.addEventListener(name, (e) => handler(JSON.parse(e.data || '{}')))
+  })
+  // EventSource reconnects by itself; events missed meanwhile are recovered by a resync
+  let dropped = false
+  source.onerror = () => { dropped = true }
+  source.onopen = () => {
+    if (dropped && handlers.resync) handlers.resync({})
+    dropped = false
+  }
+  const close = () => source.close()
+  close.connected = () => source.readyState === EventSource.OPEN
+  return close
+}
@@ -0,0 +1,152 @@
+"""
+Load test for the read-heavy endpoints against a running server.
+
+Readers hammer the dashboard, analytics, log, template and instance listing
+endpoints while a few writers keep starting instances and completing nodes,
+so the output shows both read throughput and whether reads starve writes.
+The report is also written as JSON (default benchmarks/load_test.json, next
+to the benchmark baseline) so runs can be compared over time.
+
+    uvicorn backend.main:app --port 8000
+    python load_test.py --base http://127.0.0.1:8000 --duration 30 --readers 100 --writers 4 --prepare 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+READS = [
+    ("/dashboard/overview", {}),
+    ("/dashboard/stats", {}),
+    ("/dashboard/nodes", {}),
+    ("/analytics/benchmarks", {}),
+    ("/logs", {"limit": 50}),
+    ("/templates", {}),
+    ("/instances", {"limit": 50}),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def timed(self, name, send):
+        started = time.perf_counter()
+        try:
+            res = await send()
+            ok = res.status_code < 400 or res.status_code == 409
+        except httpx.HTTPError:
+            res, ok = None, False
+        self.latencies[name].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[name] += 1
+        return res
+
+    def report(self, elapsed, args):
+        endpoints = {}
+        for name in sorted(self.latencies):
+            samples = sorted(self.latencies[name])
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "throughput": round(len(samples) / elapsed, 2),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+                "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 2),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "config": {
+                "duration": args.duration,
+                "readers": args.readers,
+                "writers": args.writers,
+                "prepare": args.prepare,
+            },
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput": round(total / elapsed, 2),
+            "endpoints": endpoints,
+        }
+
+
+def print_report(report):
+    print(f"{'endpoint':32} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, e in report["endpoints"].items():
+        print(f"{name:32} {e['requests']:9d} {e['throughput']:9.1f} {e['p50_ms']:9.1f} {e['p99_ms']:9.1f} {e['errors']:7d}")
+    print(f"{'total':32} {sum(e['requests'] for e in report['endpoints'].values()):9d} {report['throughput']:9.1f}")
+
+
+async def setup(client):
+    await client.post("/register", json={"username": "loadtest", "password": "loadtest", "role": "admin"})
+    res = await client.post("/token", data={"username": "loadtest", "password": "loadtest"})
+    client.headers["Authorization"] = f"Bearer {res.json()['access_token']}"
+    graph = {"nodes": [{"id": f"Step{i}"} for i in range(4)]}
+    template = (await client.post("/templates", json={"name": "loadtest", "graph_json": graph})).json()
+    return template["id"]
+
+
+async def prepare(client, template_id, count):
+    # Bulk-load history so the read queries have rows to work through
+    for offset in range(0, count, 1000):
+        items = [{"template_id": template_id}] * min(1000, count - offset)
+        res = (await client.post("/instances/bulk", json={"items": items})).json()
+        ids = [r["instance_id"] for r in res["results"] if r["ok"]]
+        for _ in range(random.randint(1, 4)):
+            await client.post("/instances/complete_nodes/bulk", json={"items": [{"instance_id": i} for i in ids]})
+
+
+async def reader(client, recorder, deadline):
+    while time.monotonic() < deadline:
+        path, params = random.choice(READS)
+        await recorder.timed(f"GET {path}", lambda: client.get(path, params=params))
+
+
+async def writer(client, recorder, deadline, template_id):
+    while time.monotonic() < deadline:
+        res = await recorder.timed("POST /instances", lambda: client.post("/instances", json={"template_id": template_id}))
+        if res is None or res.status_code != 200:
+            continue
+        instance_id = res.json()["id"]
+        for _ in range(4):
+            await recorder.timed("POST /instances/{id}/complete_node",
+                                 lambda: client.post(f"/instances/{instance_id}/complete_node"))
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.readers + args.writers + 4)
+    async with httpx.AsyncClient(base_url=args.base, limits=limits, timeout=60) as client:
+        template_id = await setup(client)
+        await prepare(client, template_id, args.prepare)
+        recorder = Recorder()
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(
+            *(reader(client, recorder, deadline) for _ in range(args.readers)),
+            *(writer(client, recorder, deadline, template_id) for _ in range(args.writers)),
+        )
+        return recorder.report(time.monotonic() - started, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--readers", type=int, default=100)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--prepare", type=int, default=0, help="instances to bulk-create before measuring")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "load_test.json"))
+    args = parser.parse_args()
+    report = asyncio.run(main(args))
+    print_report(report)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
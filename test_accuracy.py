@@ -0,0 +1,90 @@
+import numpy as np
+
+from backend import accuracy, training
+from backend.accuracy import AccuracyMonitor, P2Quantile
+
+
+def test_p2_sketch_tracks_quantiles_in_constant_memory():
+    rng = np.random.default_rng(0)
+    samples = rng.exponential(300.0, size=20000)
+    for p in (0.5, 0.9):
+        sketch = P2Quantile(p)
+        for x in samples:
+            sketch.add(float(x))
+        assert len(sketch.heights) == 5
+        exact = np.quantile(samples, p)
+        assert abs(sketch.value() - exact) / exact < 0.03
+
+
+def feed(monitor, n, error, template_id=1, node_id="Review", predicted=600):
+    for _ in range(n):
+        monitor.observe(template_id, node_id, predicted, predicted + error)
+
+
+def test_rolling_mae_and_bias_per_key():
+    monitor = AccuracyMonitor()
+    feed(monitor, 40, 100, node_id="Review")
+    feed(monitor, 40, -30, node_id="Approve")
+    monitor.observe(1, "Review", None, 500)  # Executions without a prediction are ignored
+
+    report = monitor.report()
+    nodes = {r["node_id"]: r for r in report["nodes"]}
+    assert nodes["Review"]["mae"] == 100 and nodes["Review"]["bias"] == 100
+    assert nodes["Approve"]["bias"] == -30
+    assert report["templates"][0]["count"] == 80
+    assert report["overall"]["count"] == 80
+    assert report["drifting"] == []
+
+
+def test_drift_requests_one_retrain_per_cooldown():
+    calls = []
+    monitor = AccuracyMonitor(on_drift=lambda: calls.append(1), window=20, cooldown=3600)
+    feed(monitor, accuracy.DRIFT_REFERENCE_SAMPLES + 20, 50)
+    assert calls == []
+
+    feed(monitor, 100, 400)
+    report = monitor.report()
+    assert calls == [1]
+    assert report["retrains_requested"] == 1
+    assert {(r["template_id"], r["node_id"]) for r in report["drifting"] if "node_id" in r} == {(1, "Review")}
+    assert report["overall"]["drifting"]
+    assert report["events"][0]["reference_mae"] == 50
+
+
+def test_drift_fires_under_the_default_retrain_cadence():
+    model = {"id": 0}
+    calls = []
+    monitor = AccuracyMonitor(on_drift=lambda: calls.append(model["id"]), model_id=lambda: model["id"])
+
+    def completions(n, error):
+        for _ in range(n):
+            monitor.observe(1, "Review", 600, 600 + error)
+            if monitor.overall.total % training.RETRAIN_EVERY_N_COMPLETIONS == 0:
+                model["id"] += 1  # The trainer refits every RETRAIN_EVERY_N_COMPLETIONS completions
+
+    completions(accuracy.DRIFT_REFERENCE_SAMPLES + accuracy.ACCURACY_WINDOW, 50)
+    assert calls == [] and monitor.overall.reference_mae == 50
+    completions(60, 400)
+    assert len(calls) == 1
+    report = monitor.report()
+    assert report["events"][0]["scope"] == "overall" and report["events"][0]["reference_mae"] == 50
+    # The next routine refit counts as the drift retrain's model and restarts the references
+    assert report["overall"]["baseline_count"] < 60 and report["overall"]["reference_mae"] is None
+
+
+def test_only_the_model_after_a_drift_retrain_gets_new_references():
+    model = {"id": 1}
+    monitor = AccuracyMonitor(model_id=lambda: model["id"], window=20)
+    feed(monitor, accuracy.DRIFT_REFERENCE_SAMPLES + 20, 50)
+    model["id"] = 2  # Routine retrain: nothing restarts
+    feed(monitor, 100, 400)
+    assert monitor.report()["drifting"]
+    assert monitor.overall.count == accuracy.DRIFT_REFERENCE_SAMPLES + 120
+
+    model["id"] = 3  # First model after the drift-triggered retrain
+    feed(monitor, 10, 20)
+    overall = monitor.report()["overall"]
+    assert overall["baseline_count"] == 10 and overall["count"] == accuracy.DRIFT_REFERENCE_SAMPLES + 130
+    assert overall["reference_mae"] is None and not overall["drifting"]
+    # The rolling MAE carries on from before the new model
+    assert overall["mae"] > 100
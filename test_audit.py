@@ -0,0 +1,103 @@
+import time
+import uuid
+
+import pytest
+
+from backend import audit, database, models
+from backend.audit import AuditLogBuffer
+
+
+@pytest.fixture
+def action():
+    database.Base.metadata.create_all(bind=database.engine)
+    return f"TEST_{uuid.uuid4().hex[:8]}"
+
+
+def logged(action):
+    db = database.SessionLocal()
+    try:
+        return [r.details for r in db.query(models.SystemLog).filter(models.SystemLog.action == action).order_by(models.SystemLog.id)]
+    finally:
+        db.close()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_full_batch_is_flushed_by_the_writer_thread(action):
+    buffer = AuditLogBuffer(mode="buffered", batch_size=5, interval=60)
+    buffer.start()
+    try:
+        for i in range(5):
+            buffer.record(None, None, action, str(i))
+        assert wait_for(lambda: buffer.pending == 0)
+        assert logged(action) == ["0", "1", "2", "3", "4"]
+        assert buffer.stats()["flushes"] == 1
+    finally:
+        buffer.stop()
+
+
+def test_full_buffer_flushes_on_the_callers_thread(action):
+    buffer = AuditLogBuffer(mode="buffered", batch_size=2, max_pending=2)
+    buffer.record(None, None, action, "0")
+    assert buffer.pending == 1
+    buffer.record(None, None, action, "1")
+    assert buffer.pending == 0 and logged(action) == ["0", "1"]
+
+
+def test_failed_flush_requeues_the_batch_in_order(action, monkeypatch):
+    buffer = AuditLogBuffer(mode="buffered", batch_size=100)
+    for i in range(3):
+        buffer.record(None, None, action, str(i))
+
+    def unavailable(table):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(audit, "insert", unavailable)
+    assert buffer.flush() == 0
+    assert buffer.pending == 3 and buffer.failures == 1 and logged(action) == []
+
+    monkeypatch.undo()
+    buffer.record(None, None, action, "3")
+    assert buffer.flush() == 4
+    assert logged(action) == ["0", "1", "2", "3"]
+
+
+def test_failing_flushes_keep_only_the_newest_max_pending_rows(action, monkeypatch):
+    buffer = AuditLogBuffer(mode="buffered", batch_size=2, max_pending=3)
+
+    def unavailable(table):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(audit, "insert", unavailable)
+    for i in range(5):
+        buffer.record(None, None, action, str(i))  # From the third row on, every record flushes inline and fails
+    stats = buffer.stats()
+    assert stats["pending"] == 3 and stats["dropped"] == 2 and stats["failures"] == 3
+
+    monkeypatch.undo()
+    assert buffer.flush() == 3
+    assert logged(action) == ["2", "3", "4"]
+
+
+def test_stop_drains_pending_records(action):
+    buffer = AuditLogBuffer(mode="buffered", batch_size=100, interval=60)
+    buffer.start()
+    for i in range(10):
+        buffer.record(None, None, action, str(i))
+    buffer.stop()
+    assert buffer.pending == 0 and len(logged(action)) == 10
+
+
+def test_sync_mode_commits_on_the_callers_session(action):
+    buffer = AuditLogBuffer(mode="sync")
+    db = database.SessionLocal()
+    try:
+        buffer.record(db, None, action, "now")
+    finally:
+        db.close()
+    assert logged(action) == ["now"] and buffer.pending == 0
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend import auth
+from backend.auth import PasswordHasher, UserCache, UserPrincipal
+
+
+def test_cache_entries_expire_and_evict_least_recently_used():
+    cache = UserCache(ttl=60, max_entries=2)
+    for i, name in enumerate(("a", "b")):
+        cache.put(UserPrincipal(i, name, "user"))
+    assert cache.get("a").id == 0
+    cache.put(UserPrincipal(2, "c", "user"))
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    expired = UserCache(ttl=-1)
+    expired.put(UserPrincipal(1, "a", "user"))
+    assert expired.get("a") is None
+    assert expired.stats()["size"] == 0 and expired.stats()["misses"] == 1
+
+
+def test_repeated_requests_are_served_from_the_cache(client, login):
+    headers = login("cache-reader")
+    auth.user_cache.invalidate("cache-reader")
+    hits = auth.user_cache.hits
+    for _ in range(3):
+        assert client.get("/users/me", headers=headers).json()["username"] == "cache-reader"
+    assert auth.user_cache.hits == hits + 2
+
+
+def test_deleting_a_user_invalidates_its_cached_principal(client, login):
+    headers = login("cache-deleted")
+    me = client.get("/users/me", headers=headers).json()
+    assert auth.user_cache.get("cache-deleted") is not None
+
+    assert client.delete(f"/users/{me['id']}").status_code == 200
+    assert auth.user_cache.get("cache-deleted") is None
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+
+def run_hasher(scenario):
+    hasher = PasswordHasher(workers=1, queue_size=0, wait_seconds=0.05)
+    try:
+        asyncio.run(scenario(hasher))
+    finally:
+        hasher.shutdown()
+
+
+def test_saturated_hasher_answers_429_and_frees_the_slot_afterwards():
+    async def scenario(hasher):
+        gate = threading.Event()
+        busy = asyncio.create_task(hasher._run(gate.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as excinfo:
+            await hasher.verify("secret", auth.get_password_hash("secret"))
+        assert excinfo.value.status_code == 429 and excinfo.value.headers == {"Retry-After": "1"}
+        assert hasher.rejected == 1
+
+        gate.set()
+        await busy
+        assert hasher.in_flight == 0 and not hasher._slots.locked()
+        assert await hasher.verify("secret", auth.get_password_hash("secret"))
+
+    run_hasher(scenario)
+
+
+def test_cancelled_callers_release_their_slot():
+    async def scenario(hasher):
+        gate = threading.Event()
+        running = asyncio.create_task(hasher._run(gate.wait))
+        await asyncio.sleep(0.01)
+        hasher.wait_seconds = 5
+        waiting = asyncio.create_task(hasher._run(lambda: "queued"))
+        await asyncio.sleep(0.01)
+        # Client disconnects: both the caller being served and the queued one go away
+        running.cancel()
+        waiting.cancel()
+        await asyncio.gather(running, waiting, return_exceptions=True)
+        gate.set()
+        assert not hasher._slots.locked() and hasher.in_flight == 0
+        assert await asyncio.wait_for(hasher._run(lambda: "next"), timeout=1) == "next"
+
+    run_hasher(scenario)
+
+
+def test_reject_mode_does_not_wait():
+    async def scenario(hasher):
+        hasher.reject_when_saturated, hasher.wait_seconds = True, 60
+        gate = threading.Event()
+        busy = asyncio.create_task(hasher._run(gate.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException):
+            await asyncio.wait_for(hasher.hash("secret"), timeout=1)
+        gate.set()
+        await busy
+
+    run_hasher(scenario)
+
+
+def test_login_storm_gets_retry_after(client, monkeypatch):
+    monkeypatch.setattr(auth.password_hasher, "capacity", 0)
+    monkeypatch.setattr(auth.password_hasher, "wait_seconds", 0.01)
+    monkeypatch.setattr(auth.password_hasher, "_loop", None)
+    try:
+        res = client.post("/token", data={"username": "auth", "password": "auth"})
+        assert res.status_code == 429 and res.headers["Retry-After"] == "1"
+        # Requests that do not hash a password are unaffected
+        assert client.get("/users/me").status_code == 200
+    finally:
+        auth.password_hasher._loop = None
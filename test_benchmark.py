@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sqlalchemy import func
+
+import benchmark
+from backend import database, models, seed
+
+
+def report(**endpoint):
+    values = {"requests": 100, "errors": 0, "throughput": 50.0, "p50_ms": 100.0, "p95_ms": 400.0, "p99_ms": 800.0}
+    values.update(endpoint)
+    return {"endpoints": {"dashboard_overview": values}}
+
+
+def test_compare_accepts_run_within_tolerance():
+    assert benchmark.compare(report(p95_ms=550.0, p99_ms=1500.0, throughput=30.0), report(), tolerance=0.5) == []
+
+
+def test_compare_flags_regressions():
+    problems = benchmark.compare(report(p95_ms=610.0, p99_ms=2000.0, throughput=20.0, errors=3), report(), tolerance=0.5)
+    assert len(problems) == 4
+    assert all(p.startswith("dashboard_overview:") for p in problems)
+
+
+def test_compare_ignores_small_absolute_changes():
+    fast = report(p95_ms=5.0, p99_ms=8.0)
+    assert benchmark.compare(report(p95_ms=20.0, p99_ms=40.0), fast, tolerance=0.5) == []
+    assert len(benchmark.compare(report(p95_ms=20.0, p99_ms=40.0), fast, tolerance=0.5, min_delta_ms=0)) == 2
+
+
+def test_compare_ignores_endpoints_missing_from_baseline():
+    assert benchmark.compare(report(p95_ms=10000.0), {"endpoints": {}}, tolerance=0.5) == []
+
+
+def test_percentile_nearest_rank():
+    samples = list(range(1, 101))
+    assert benchmark.percentile(samples, 0.50) == 50
+    assert benchmark.percentile(samples, 0.99) == 99
+    assert benchmark.percentile([], 0.95) == 0.0
+
+
+def test_small_run_reports_every_operation():
+    args = benchmark.parse_args(["--instances", "200", "--users", "5", "--requests", "120", "--warmup", "20", "--concurrency", "8"])
+    result = benchmark.run(args)
+
+    assert set(result["endpoints"]) <= set(benchmark.WORKLOAD)
+    assert sum(e["requests"] for e in result["endpoints"].values()) == 120
+    for op, e in result["endpoints"].items():
+        assert e["errors"] == 0, op
+        assert e["p50_ms"] <= e["p95_ms"] <= e["p99_ms"]
+    assert benchmark.compare(result, result, tolerance=0) == []
+
+
+def test_bulk_seed_never_dates_rows_in_the_future():
+    # A one-day window puts most starts on today's date, many of them at a later hour
+    seed.seed_bulk(3000, users=5, days=1, seed=7)
+    now = datetime.now()
+    db = database.SessionLocal()
+    try:
+        E, I = models.NodeExecution, models.WorkflowInstance
+        latest = db.query(func.max(I.start_time), func.max(I.end_time), func.max(E.start_time), func.max(E.end_time)).select_from(I).join(E, E.instance_id == I.id).one()
+    finally:
+        db.close()
+    assert all(t <= now for t in latest)
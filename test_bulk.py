@@ -0,0 +1,62 @@
+from backend import database, models, schemas
+
+LINEAR = {"nodes": [{"id": "A"}, {"id": "B"}, {"id": "C"}]}
+
+
+def start(client, count):
+    template = client.post("/templates", json={"name": "bulk", "graph_json": LINEAR}).json()
+    res = client.post("/instances/bulk", json={"items": [{"template_id": template["id"]}] * count + [{"template_id": 10**9}]})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["started"] == count and body["failed"] == 1
+    assert body["results"][-1] == {"index": count, "template_id": 10**9, "ok": False, "error": "Template not found"}
+    return template["id"], [r["instance_id"] for r in body["results"] if r["ok"]]
+
+
+def test_bulk_start_creates_running_first_nodes(client):
+    _, instance_ids = start(client, 3)
+    db = database.SessionLocal()
+    try:
+        executions = db.query(models.NodeExecution).filter(models.NodeExecution.instance_id.in_(instance_ids)).all()
+    finally:
+        db.close()
+    assert sorted(e.instance_id for e in executions) == sorted(instance_ids)
+    assert {(e.node_id, e.status) for e in executions} == {("A", models.NodeStatus.RUNNING)}
+    assert all(e.predicted_duration is not None for e in executions)
+
+
+def test_batch_does_not_complete_nodes_it_started(client):
+    template_id, (instance_id,) = start(client, 1)
+    res = client.post("/instances/complete_nodes/bulk", json={"items": [{"instance_id": instance_id}] * 2})
+    assert res.status_code == 200
+    body = res.json()
+    # B was started by the first item; completing it now would record a zero duration
+    assert body["completed"] == 1 and body["failed"] == 1
+    assert body["results"][1]["ok"] is False and "started in this batch" in body["results"][1]["error"]
+
+    db = database.SessionLocal()
+    try:
+        executions = {e.node_id: e for e in db.query(models.NodeExecution).filter(models.NodeExecution.instance_id == instance_id)}
+        rollup = db.query(models.ExecutionStat).filter(
+            models.ExecutionStat.template_id == template_id, models.ExecutionStat.node_id == "B").first()
+    finally:
+        db.close()
+    assert executions["A"].status == models.NodeStatus.COMPLETED
+    assert executions["B"].status == models.NodeStatus.RUNNING and executions["B"].end_time is None
+    assert "C" not in executions
+    assert rollup is None
+
+    # A later request completes B with its real duration
+    res = client.post("/instances/complete_nodes/bulk", json={"items": [{"instance_id": instance_id}]})
+    assert res.json()["completed"] == 1 and res.json()["results"][0]["node_id"] == "B"
+
+
+def test_bulk_rejects_oversized_batches(client):
+    res = client.post("/instances/complete_nodes/bulk", json={"items": [{"instance_id": 1}] * (schemas.BULK_MAX_ITEMS + 1)})
+    assert res.status_code in (413, 422)
+
+
+def test_batch_prediction_is_capped(client):
+    items = [{"node_id": "A"}] * (schemas.BULK_MAX_ITEMS + 1)
+    assert client.post("/predict/batch", json={"items": items}).status_code == 422
+    assert len(client.post("/predict/batch", json={"items": items[:2]}).json()["predictions"]) == 2
@@ -0,0 +1,53 @@
+from backend import cache
+from backend.cache import MemoryBackend
+
+LINEAR = {"nodes": [{"id": "A"}, {"id": "B"}]}
+
+
+def test_revalidation_with_the_etag_returns_304(client):
+    first = client.get("/templates")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+
+    not_modified = cache.response_cache.not_modified
+    again = client.get("/templates", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == etag
+    assert cache.response_cache.not_modified == not_modified + 1
+
+    assert client.get("/templates", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_template_writes_invalidate_the_cached_list(client):
+    etag = client.get("/templates").headers["ETag"]
+    template = client.post("/templates", json={"name": "cached", "graph_json": LINEAR}).json()
+
+    res = client.get("/templates", headers={"If-None-Match": etag})
+    assert res.status_code == 200 and res.headers["ETag"] != etag
+    assert template["id"] in {t["id"] for t in res.json()}
+
+    client.delete(f"/templates/{template['id']}")
+    assert template["id"] not in {t["id"] for t in client.get("/templates").json()}
+
+
+def test_starting_an_instance_invalidates_the_dashboard(client):
+    template = client.post("/templates", json={"name": "dashboard", "graph_json": LINEAR}).json()
+    before = client.get("/dashboard/stats")
+    assert client.get("/dashboard/stats", headers={"If-None-Match": before.headers["ETag"]}).status_code == 304
+
+    client.post("/instances", json={"template_id": template["id"]})
+    after = client.get("/dashboard/stats", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.json()["active_instances"] == before.json()["active_instances"] + 1
+
+
+def test_memory_backend_evicts_least_recently_used_and_expired_entries():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", b"1", ttl=60)
+    backend.set("b", b"2", ttl=60)
+    backend.get("a")
+    backend.set("c", b"3", ttl=60)
+    assert backend.get("b") is None and backend.get("a") == b"1"
+
+    backend.set("d", b"4", ttl=-1)
+    assert backend.get("d") is None and len(backend) == 1
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from backend import database, idempotency, models
+
+LINEAR = {"nodes": [{"id": f"Step{i}"} for i in range(5)]}
+FORK_JOIN = {
+    "nodes": [{"id": "Submit"}, {"id": "Finance"}, {"id": "Legal"}, {"id": "Sign"}],
+    "edges": [
+        {"source": "Submit", "target": "Finance"},
+        {"source": "Submit", "target": "Legal"},
+        {"source": "Finance", "target": "Sign"},
+        {"source": "Legal", "target": "Sign"},
+    ],
+}
+
+
+def create_instances(client, graph, count):
+    template = client.post("/templates", json={"name": "stress", "graph_json": graph}).json()
+    res = client.post("/instances/bulk", json={"items": [{"template_id": template["id"]}] * count}).json()
+    return [r["instance_id"] for r in res["results"]]
+
+
+def fire(client, requests, workers=32):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda r: client.post(r[0], headers=r[1], params=r[2]), requests))
+
+
+def executions_of(instance_id):
+    db = database.SessionLocal()
+    try:
+        return db.query(models.NodeExecution).filter(models.NodeExecution.instance_id == instance_id).all()
+    finally:
+        db.close()
+
+
+def test_parallel_completions_never_skip_or_duplicate_nodes(client):
+    instance_ids = create_instances(client, LINEAR, 10)
+    # 300 completions racing over 10 five-step instances
+    requests = [(f"/instances/{i}/complete_node", {}, {}) for i in instance_ids for _ in range(30)]
+    responses = fire(client, requests)
+
+    assert {r.status_code for r in responses} <= {200, 404, 409}
+    succeeded = [r for r in responses if r.status_code == 200]
+    for instance_id in instance_ids:
+        executions = executions_of(instance_id)
+        node_ids = [e.node_id for e in executions]
+        # Each node ran exactly once, in template order
+        assert node_ids == [n["id"] for n in LINEAR["nodes"]][:len(node_ids)]
+        assert len(node_ids) == len(set(node_ids))
+        running = [e for e in executions if e.status == models.NodeStatus.RUNNING]
+        assert len(running) <= 1
+    completed = sum(
+        1 for i in instance_ids for e in executions_of(i) if e.status == models.NodeStatus.COMPLETED
+    )
+    assert completed == len(succeeded)
+
+
+def test_parallel_branches_join_exactly_once(client):
+    instance_ids = create_instances(client, FORK_JOIN, 20)
+    for i in instance_ids:
+        assert client.post(f"/instances/{i}/complete_node").status_code == 200
+    requests = [
+        (f"/instances/{i}/complete_node", {}, {"node_id": node})
+        for i in instance_ids for node in ("Finance", "Legal")
+    ]
+    responses = fire(client, requests)
+    assert all(r.status_code == 200 for r in responses)
+
+    for instance_id in instance_ids:
+        node_ids = [e.node_id for e in executions_of(instance_id)]
+        assert sorted(node_ids) == ["Finance", "Legal", "Sign", "Submit"]
+
+
+def test_idempotency_key_makes_retries_safe(client):
+    (instance_id,) = create_instances(client, LINEAR, 1)
+    headers = {"Idempotency-Key": "retry-1"}
+    responses = fire(client, [(f"/instances/{instance_id}/complete_node", headers, {})] * 50)
+
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.text for r in responses}) == 1
+    executions = executions_of(instance_id)
+    assert [e.status for e in executions] == [models.NodeStatus.COMPLETED, models.NodeStatus.RUNNING]
+
+    # A new key advances again
+    res = client.post(f"/instances/{instance_id}/complete_node", headers={"Idempotency-Key": "retry-2"})
+    assert res.json()["node_id"] == "Step1"
+
+
+def test_expired_idempotency_records_are_purged(client, monkeypatch):
+    (instance_id,) = create_instances(client, LINEAR, 1)
+    db = database.SessionLocal()
+    try:
+        expired = datetime.now() - timedelta(hours=idempotency.IDEMPOTENCY_TTL_HOURS + 1)
+        db.add(models.IdempotencyRecord(user_id=None, scope="complete_node:0", key="old", response={}, created_at=expired))
+        db.commit()
+
+        monkeypatch.setattr(idempotency, "_last_purge", None)
+        res = client.post(f"/instances/{instance_id}/complete_node", headers={"Idempotency-Key": "purge-1"})
+        assert res.status_code == 200
+        keys = {r.key for r in db.query(models.IdempotencyRecord)}
+        assert "old" not in keys and "purge-1" in keys
+        # Throttled: the next purge waits for IDEMPOTENCY_PURGE_SECONDS
+        assert idempotency.maybe_purge(db) is None
+    finally:
+        db.close()
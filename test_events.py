@@ -0,0 +1,84 @@
+import asyncio
+
+from backend import events, main
+from backend.events import EventBus
+
+
+class Request:
+    """Stands in for a Starlette request that disconnects after ``polls`` checks"""
+
+    def __init__(self, polls):
+        self.polls = polls
+
+    async def is_disconnected(self):
+        self.polls -= 1
+        return self.polls < 0
+
+
+async def drain(bus, subscriber, polls, heartbeat=5):
+    return [chunk async for chunk in bus.stream(subscriber, Request(polls), heartbeat=heartbeat)]
+
+
+def test_full_queue_is_replaced_by_a_resync_event():
+    async def scenario():
+        bus = EventBus(queue_size=2)
+        subscriber = bus.subscribe()
+        for i in range(3):
+            bus.publish("instance.started", {"id": i})
+        await asyncio.sleep(0)
+        assert subscriber.queue.qsize() == 1 and subscriber.dropped == 1 and bus.resyncs == 1
+
+        bus.publish("instance.completed", {"id": 0})
+        await asyncio.sleep(0)
+        chunks = await drain(bus, subscriber, polls=2)
+        assert chunks[0] == "retry: 3000\n\n"
+        assert chunks[1] == events.format_sse("resync", {})
+        assert chunks[2] == events.format_sse("instance.completed", {"id": 0}, 4)
+        return bus
+
+    bus = asyncio.run(scenario())
+    assert bus.stats()["subscribers"] == 0 and bus.published == 4
+
+
+def test_subscriber_is_removed_when_the_client_disconnects():
+    async def scenario():
+        bus = EventBus()
+        subscriber = bus.subscribe()
+        assert bus.stats()["subscribers"] == 1
+        # Nothing to send: the stream keeps the connection alive until the client goes away
+        assert await drain(bus, subscriber, polls=1, heartbeat=0.01) == ["retry: 3000\n\n", ": keep-alive\n\n"]
+        assert bus.stats()["subscribers"] == 0
+        bus.publish("counters", {"active_instances": 1})
+        await asyncio.sleep(0)
+        assert subscriber.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_publishing_to_a_closed_loop_drops_the_subscriber():
+    bus = EventBus()
+
+    async def subscribe():
+        return bus.subscribe()
+
+    asyncio.run(subscribe())
+    bus.publish("counters", {"active_instances": 1})
+    assert bus.stats()["subscribers"] == 0
+
+
+def test_events_accept_the_token_query_parameter(client):
+    anonymous = {"Authorization": ""}
+    assert client.get("/events", headers=anonymous).status_code == 401
+    assert client.get("/events", params={"token": "not-a-jwt"}, headers=anonymous).status_code == 401
+
+    token = client.headers["Authorization"].removeprefix("Bearer ")
+
+    async def scenario():
+        subscribers = events.bus.stats()["subscribers"]
+        response = await main.stream_events(Request(polls=0), token=token, authorization=None)
+        assert response.media_type == "text/event-stream"
+        assert events.bus.stats()["subscribers"] == subscribers + 1
+        assert [chunk async for chunk in response.body_iterator] == ["retry: 3000\n\n"]
+        assert events.bus.stats()["subscribers"] == subscribers
+
+    asyncio.run(scenario())
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.feature_store import FeatureStore, has_rows_after
+
+NOW = datetime.now().replace(microsecond=0)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'features.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+
+
+def complete(db, id, end_time, duration=600, node_id="Review", status=models.NodeStatus.COMPLETED):
+    db.add(models.NodeExecution(
+        id=id, node_id=node_id, status=status, start_time=end_time - timedelta(seconds=duration),
+        end_time=end_time, actual_duration=duration
+    ))
+    db.commit()
+
+
+def test_refresh_appends_only_new_rows(db):
+    store = FeatureStore()
+    for i in range(1, 4):
+        complete(db, i, NOW - timedelta(hours=4 - i), duration=100 * i)
+    complete(db, 4, NOW, status=models.NodeStatus.RUNNING)
+
+    assert store.refresh(db) == 3 and store.version == 1
+    assert store.refresh(db) == 0 and store.version == 1  # Rows inside the overlap are not read twice
+    assert store.high_water() == {"max_id": 3, "max_end_time": (NOW - timedelta(hours=1)).isoformat()}
+
+    complete(db, 5, NOW, node_id="Approve")
+    assert store.refresh(db) == 1 and store.version == 2
+    X, y, encoder = store.training_data()
+    assert y.tolist() == [100, 200, 300, 600]
+    assert X[:, 0].tolist() == [0, 0, 0, 1] and encoder.vocabulary == {"Review": 0, "Approve": 1}
+
+
+def test_refresh_catches_late_commits_and_backdated_rows(db):
+    store = FeatureStore(overlap_seconds=60)
+    complete(db, 10, NOW)
+    store.refresh(db)
+
+    # Committed late with an end_time just before the mark and a lower id: found through the overlap
+    complete(db, 5, NOW - timedelta(seconds=30))
+    # Inserted now with a back-dated end_time: found through the id mark
+    complete(db, 11, NOW - timedelta(days=3))
+    assert store.refresh(db) == 2
+    assert sorted(store.column("id").tolist()) == [5, 10, 11]
+    assert store.refresh(db) == 0
+
+
+def test_has_rows_after_follows_the_high_water_mark(db):
+    store = FeatureStore()
+    assert not has_rows_after(db, None)
+    complete(db, 1, NOW - timedelta(hours=1))
+    assert has_rows_after(db, None)
+    store.refresh(db)
+    assert not has_rows_after(db, store.high_water())
+    complete(db, 2, NOW)
+    assert has_rows_after(db, store.high_water())
+
+
+def test_row_cap_and_window_drop_the_oldest_rows(db):
+    for i in range(1, 6):
+        complete(db, i, NOW - timedelta(days=6 - i), duration=i)
+    capped = FeatureStore(max_rows=3)
+    capped.refresh(db)
+    assert capped.column("duration").tolist() == [3, 4, 5]
+
+    windowed = FeatureStore(window_days=2.5)
+    windowed.refresh(db)
+    assert windowed.column("duration").tolist() == [4, 5]
+
+    # Growing past the preallocated capacity keeps every live row in order
+    for i in range(6, 2006):
+        db.add(models.NodeExecution(id=i, node_id="Review", status=models.NodeStatus.COMPLETED,
+                                    start_time=NOW, end_time=NOW + timedelta(seconds=i), actual_duration=i))
+    db.commit()
+    capped.refresh(db)
+    assert len(capped) == 3 and np.array_equal(capped.column("id"), [2003, 2004, 2005])
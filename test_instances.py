@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import database, models
+
+DAY = datetime(2024, 3, 1, 9, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def instances(client):
+    """Seven single-node instances of a fresh template started a day apart; the odd ones completed"""
+    template = client.post("/templates", json={"name": "paging", "graph_json": {"nodes": [{"id": "A"}]}}).json()
+    res = client.post("/instances/bulk", json={"items": [{"template_id": template["id"]}] * 7}).json()
+    ids = [r["instance_id"] for r in res["results"]]
+    for instance_id in ids[1::2]:
+        assert client.post(f"/instances/{instance_id}/complete_node").status_code == 200
+    db = database.SessionLocal()
+    try:
+        for i, instance_id in enumerate(ids):
+            db.get(models.WorkflowInstance, instance_id).start_time = DAY + timedelta(days=i)
+        db.commit()
+    finally:
+        db.close()
+    return template["id"], ids
+
+
+def pages(client, **params):
+    seen, cursor = [], None
+    while True:
+        body = client.get("/instances", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        seen.append([item["id"] for item in body["items"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+def test_cursor_pages_are_contiguous(client, instances):
+    template_id, ids = instances
+    seen = pages(client, template_id=template_id, limit=3)
+    assert [len(page) for page in seen] == [3, 3, 1]
+    # Newest first, no duplicates and no gaps
+    assert sum(seen, []) == sorted(ids, reverse=True)
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get("/instances", params={"cursor": "abc"}).status_code == 400
+
+
+def test_status_and_date_filters_combine(client, instances):
+    template_id, ids = instances
+    running = sum(pages(client, template_id=template_id, status="Running", limit=2), [])
+    assert running == ids[::2][::-1]
+
+    window = {"start_from": (DAY + timedelta(days=1)).isoformat(), "start_to": (DAY + timedelta(days=5)).isoformat()}
+    assert sum(pages(client, template_id=template_id, **window), []) == ids[1:5][::-1]
+    completed = sum(pages(client, template_id=template_id, status="Completed", limit=1, **window), [])
+    assert completed == [ids[3], ids[1]]
+
+
+def test_projection_omits_executions(client, instances):
+    template_id, ids = instances
+    full = client.get("/instances", params={"template_id": template_id, "limit": 1}).json()["items"][0]
+    assert [e["node_id"] for e in full["executions"]] == ["A"]
+
+    summary = client.get("/instances", params={"template_id": template_id, "limit": 1, "include_executions": False}).json()["items"][0]
+    assert "executions" not in summary
+    assert summary == {k: v for k, v in full.items() if k != "executions"}
@@ -0,0 +1,95 @@
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend import metrics
+from backend.metrics import Histogram, RequestSQL
+
+
+def sample(exposition, name, **labels):
+    """Value of one sample line, 0 when it is absent"""
+    for line in exposition.splitlines():
+        match = re.fullmatch(rf"{name}(?:\{{(.*)\}})? (\S+)", line)
+        if match and dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or "")) == {k: str(v) for k, v in labels.items()}:
+            return float(match.group(2))
+    return 0.0
+
+
+def test_histogram_exposes_cumulative_buckets():
+    histogram = Histogram("job_seconds", "Job duration", ("job",), buckets=(1, 5))
+    for value in (0.5, 3, 3, 60):
+        histogram.observe(value, job='say "hi"')
+    text = "\n".join(histogram.expose())
+    assert "# TYPE job_seconds histogram" in text
+    assert 'job_seconds_bucket{job="say \\"hi\\"",le="1"} 1' in text
+    assert 'job_seconds_bucket{job="say \\"hi\\"",le="5"} 3' in text
+    assert 'job_seconds_bucket{job="say \\"hi\\"",le="+Inf"} 4' in text
+    assert 'job_seconds_sum{job="say \\"hi\\""} 66.5' in text
+
+
+def test_sql_hooks_attribute_statements_to_the_current_request():
+    engine = create_engine("sqlite://")
+    total = metrics.db_queries._values.get((), 0)
+    sql = RequestSQL()
+    token = metrics._request_sql.set(sql)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.execute(text("SELECT 2"))
+            # A failed statement does not leave its start time behind
+            assert conn.info["query_started"] == []
+    finally:
+        metrics._request_sql.reset(token)
+    assert sql.queries == 2 and sql.seconds > 0
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 3"))
+    assert sql.queries == 2  # Outside a request only the global counter moves
+    assert metrics.db_queries._values[()] == total + 3
+
+
+def test_threadpool_workers_of_one_request_count_every_statement():
+    engine = create_engine("sqlite://")
+    sql = RequestSQL()
+    token = metrics._request_sql.set(sql)
+    try:
+        def query():
+            with engine.connect() as conn:
+                for _ in range(200):
+                    conn.execute(text("SELECT 1"))
+
+        # Like run_in_threadpool: each worker runs in a copy of the request's context
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for future in [pool.submit(contextvars.copy_context().run, query) for _ in range(8)]:
+                future.result()
+    finally:
+        metrics._request_sql.reset(token)
+    assert sql.queries == 8 * 200
+
+
+def test_middleware_records_requests_by_route_template(client):
+    before = metrics.registry.expose()
+    for _ in range(2):
+        assert client.delete("/templates/999999").status_code == 404
+    client.get("/instances", params={"limit": 1})
+    client.get("/no-such-page")
+    after = client.get("/metrics")
+    assert after.headers["content-type"] == metrics.CONTENT_TYPE
+    after = after.text
+
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    assert delta("http_requests_total", method="DELETE", route="/templates/{id}", status=404) == 2
+    assert delta("http_request_duration_seconds_count", method="DELETE", route="/templates/{id}") == 2
+    assert delta("http_requests_total", method="GET", route="unmatched", status=404) == 1
+    assert delta("db_queries_per_request_count", route="/instances") == 1
+    assert delta("db_queries_per_request_sum", route="/instances") >= 1
+    # Scrapes themselves are not recorded
+    assert sample(after, "http_requests_total", method="GET", route="/metrics", status=200) == 0
+    assert sample(after, "http_requests_in_flight") == 1  # The scrape itself
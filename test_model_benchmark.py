@@ -0,0 +1,130 @@
+import threading
+
+import numpy as np
+
+from backend import main, model_benchmark, prediction
+from backend.model_benchmark import BenchmarkEngine, evaluate
+
+
+def dataset(n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.integers(0, 5, n), rng.integers(1, 4, n), rng.integers(1, 20, n),
+                         rng.integers(8, 18, n), rng.integers(0, 7, n)])
+    # Per-node means in no particular order and slower weekends: not linear in the codes
+    y = np.array([900.0, 200.0, 1500.0, 400.0, 1100.0])[X[:, 0]] * np.where(X[:, 4] >= 5, 1.6, 1.0) + rng.normal(0, 30, n)
+    return X, y
+
+
+class Store:
+    def __init__(self, X, y):
+        self.X, self.y, self.version = X, y, 1
+
+    def __len__(self):
+        return len(self.y)
+
+    def training_data(self):
+        return self.X, self.y, None
+
+
+def test_evaluate_cross_validates_every_model():
+    X, y = dataset(600)
+    report = evaluate(X, y, models=["rf", "lr", "gb", "svr"], folds=3, n_jobs=1, svr_max_rows=100)
+
+    assert report["status"] == "ok"
+    assert list(report["models"]) == ["rf", "lr", "gb", "svr"]
+    for result in report["models"].values():
+        assert result["folds"] == 3
+        assert {"mse", "mse_std", "mae", "r2", "fit_seconds", "predict_ms_per_1k"} <= set(result)
+    assert report["models"]["svr"]["train_rows"] == 100
+    # Time-series folds train on a growing prefix: 150, 300, 450 rows
+    assert report["models"]["lr"]["train_rows"] == 300
+    assert report["best_model"] in report["models"]
+    assert report["models"]["rf"]["r2"] > report["models"]["lr"]["r2"]
+
+
+def test_evaluate_is_reproducible():
+    X, y = dataset(300)
+    first = evaluate(X, y, models=["rf", "gb"], folds=3, split="kfold", n_jobs=1)
+    second = evaluate(X, y, models=["rf", "gb"], folds=3, split="kfold", n_jobs=1)
+    for name in ("rf", "gb"):
+        assert first["models"][name]["mse"] == second["models"][name]["mse"]
+
+
+def test_evaluate_reports_insufficient_data_without_metrics():
+    X, y = dataset(9)
+    report = evaluate(X, y, folds=3, n_jobs=1)
+    assert report["status"] == "insufficient_data"
+    assert report["models"] == {}
+
+
+def test_engine_reruns_only_when_the_dataset_changes(monkeypatch):
+    runs = []
+
+    def fake_evaluate(X, y, **options):
+        runs.append(len(y))
+        return {"status": "ok", "models": {"lr": {"r2": 0.5}}, "best_model": "lr"}
+
+    monkeypatch.setattr(model_benchmark, "evaluate", fake_evaluate)
+    store = Store(*dataset(100))
+    engine = BenchmarkEngine(min_interval=0)
+
+    assert engine.report(store, wait=True)["status"] == "ok"
+    assert engine.report(store)["status"] == "ok"
+    assert runs == [100]
+
+    store.version = 2
+    report = engine.report(store)
+    assert report["status"] in ("running", "ok")
+    report = engine.report(store, wait=True)
+    assert report["status"] == "ok" and not report["stale"]
+    assert report["dataset"] == {"version": 2, "rows": 100}
+    assert runs == [100, 100]
+
+
+def test_engine_serves_stale_report_within_min_interval(monkeypatch):
+    monkeypatch.setattr(model_benchmark, "evaluate", lambda X, y, **options: {"status": "ok", "models": {}, "best_model": None})
+    store = Store(*dataset(100))
+    engine = BenchmarkEngine(min_interval=3600)
+    engine.report(store, wait=True)
+
+    store.version = 2
+    report = engine.report(store, wait=True)
+    assert report["status"] == "ok" and report["stale"]
+    assert engine.dataset == (1, 100)
+
+
+def test_engine_refreshes_the_store_on_its_own_thread(monkeypatch):
+    runs, refreshes = [], []
+    monkeypatch.setattr(model_benchmark, "evaluate", lambda X, y, **options: runs.append(len(y)) or {"status": "ok", "models": {}})
+    store = Store(*dataset(100))
+
+    def refresh(s):
+        refreshes.append(threading.current_thread().name)
+        if len(refreshes) == 2:
+            s.version += 1
+
+    engine = BenchmarkEngine(min_interval=3600, refresh=refresh)
+    assert engine.report(store, wait=True)["status"] == "ok"
+    assert refreshes == ["model-benchmark"] and runs == [100]
+    engine.report(store)
+    assert len(refreshes) == 1  # Polled at most once per min_interval
+
+    # Once the interval has passed a fresh report polls again; the new version is evaluated
+    engine._finished_at = None
+    engine.report(store)
+    engine._thread.join()
+    assert runs == [100, 100] and engine.dataset == (2, 100)
+
+    # Nothing new: the refresh runs but evaluate does not
+    engine._finished_at = None
+    engine.report(store)
+    engine._thread.join()
+    assert len(refreshes) == 3 and runs == [100, 100]
+
+
+def test_benchmark_keeps_its_own_feature_store(monkeypatch):
+    reported = []
+    monkeypatch.setattr(model_benchmark.engine, "report", lambda store, wait=False: reported.append(store) or {})
+    main.benchmark_report()
+    # The replica refresh must not move the predictor's high-water marks
+    assert reported == [model_benchmark.store] and model_benchmark.store is not prediction.predictor.store
@@ -0,0 +1,115 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from backend import database
+from backend.model_registry import ModelRegistry
+from backend.prediction import DurationPredictor, FittedModels
+from backend.training import TrainingWorker
+
+# Later than any execution the tests create, so the dataset counts as covered
+COVERS_ALL = {"max_id": 10**9, "max_end_time": "2999-01-01T00:00:00"}
+
+
+def trained_predictor(seed=0, high_water=COVERS_ALL):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 7, size=(200, 5))
+    y = X[:, 0] * 3.0 + rng.normal(size=200)
+    predictor = DurationPredictor()
+    fitted = FittedModels(
+        RandomForestRegressor(n_estimators=5, random_state=seed).fit(X, y),
+        LinearRegression().fit(X, y),
+        {"rf": {"mse": 1.0, "r2": 0.9}, "lr": {"mse": 2.0, "r2": 0.8}},
+        len(y),
+    )
+    predictor._swap(fitted, high_water=high_water)
+    return predictor
+
+
+def test_published_models_load_in_another_predictor(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    source = trained_predictor()
+    assert source.publish(registry) == 1
+    assert registry.latest_version() == 1
+
+    worker = DurationPredictor()
+    assert worker.load(registry)
+    assert worker.version == 1
+    assert worker.high_water == COVERS_ALL
+    assert worker.metrics == source.metrics
+    # Plain arrays are mapped; sklearn copies tree arrays into private memory on load
+    assert isinstance(worker.lr_model.coef_, np.memmap)
+    assert not isinstance(worker.rf_model.estimators_[0].tree_.value, np.memmap)
+    X = np.array([[5, 1, 1, 9, 0], [3, 2, 4, 14, 4]])
+    assert np.array_equal(worker.rf_model.predict(X), source.rf_model.predict(X))
+
+
+def test_placeholder_models_are_not_published(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    predictor = trained_predictor()
+    predictor.models.n_samples = 0
+    assert predictor.publish(registry) is None
+    assert registry.latest_version() is None
+
+
+def test_old_versions_are_pruned(tmp_path):
+    registry = ModelRegistry(str(tmp_path), keep=2)
+    for seed in range(4):
+        trained_predictor(seed).publish(registry)
+    assert registry.versions() == [3, 4]
+    assert registry.meta(4)["n_samples"] == 200
+
+
+def test_worker_hot_reloads_newer_versions(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    worker = TrainingWorker(DurationPredictor(), registry)
+    assert not worker.load_latest()
+
+    trained_predictor(1).publish(registry)
+    assert worker.load_latest()
+    assert not worker.load_latest()
+
+    trained_predictor(2).publish(registry)
+    assert worker.load_latest()
+    assert worker.predictor.version == 2
+    assert worker.status()["reloads"] == 2
+
+
+def test_warm_start_reuses_covering_version_without_training(tmp_path):
+    database.Base.metadata.create_all(bind=database.engine)
+    registry = ModelRegistry(str(tmp_path))
+    trained_predictor().publish(registry)
+
+    worker = TrainingWorker(DurationPredictor(), registry)
+    worker.warm_start()
+    assert worker.predictor.version == 1
+    assert not worker._take_trigger()
+
+    stale = TrainingWorker(DurationPredictor(), ModelRegistry(str(tmp_path / "empty")))
+    stale.warm_start()
+    assert stale._take_trigger()
+
+
+def test_only_the_lock_holder_trains(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    worker = TrainingWorker(DurationPredictor(), registry)
+    with registry.training_lock() as leader:
+        assert leader
+        worker.run_once()
+    assert worker.runs == 0
+    # The skipped fit is retried later
+    assert worker._take_trigger()
+
+
+def test_versions_trained_on_other_features_are_not_loaded(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    legacy = trained_predictor()
+    registry.publish(legacy.models, {"features": ["node_code", "user_id", "hour"], "trained_at": "2024-01-01T00:00:00",
+                                     "high_water": None})
+
+    worker = TrainingWorker(DurationPredictor(), registry)
+    assert not worker.load_latest()
+    assert not worker.predictor.is_trained
+    # A newer compatible version supersedes it
+    trained_predictor().publish(registry)
+    assert worker.load_latest()
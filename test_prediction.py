@@ -0,0 +1,119 @@
+import pickle
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend.feature_store import FeatureEncoder
+from backend.prediction import DurationPredictor, fit_models, predict_routed
+from backend.workflow import CompiledTemplate
+
+DIAMOND = {
+    "nodes": [{"id": "Submit"}, {"id": "Finance"}, {"id": "Legal"}, {"id": "Sign"}],
+    "edges": [
+        {"source": "Submit", "target": "Finance"},
+        {"source": "Submit", "target": "Legal"},
+        {"source": "Finance", "target": "Sign"},
+        {"source": "Legal", "target": "Sign"},
+    ],
+}
+DURATIONS = {"Submit": 60, "Finance": 100, "Legal": 500, "Sign": 50}
+
+
+@pytest.fixture
+def fixed_durations(monkeypatch):
+    """Predict every node at its DURATIONS entry, whoever runs it and whenever"""
+    def predict_many(self, node_ids, user_ids, start_times, template_ids=None):
+        return np.array([DURATIONS[n] for n in node_ids], dtype=int)
+
+    monkeypatch.setattr(DurationPredictor, "predict_many", predict_many)
+
+
+def test_encoder_codes_are_stable_and_persisted():
+    encoder = FeatureEncoder()
+    assert [encoder.fit_node(n) for n in ("Submit", "Finance", "Submit", "Sign")] == [0, 1, 0, 2]
+
+    # The vocabulary, not the process's string hash salt, decides the codes
+    restored = pickle.loads(pickle.dumps(encoder))
+    assert list(restored.node_codes(["Sign", "Submit", "Unseen"])) == [2, 0, FeatureEncoder.UNKNOWN]
+
+
+def test_encoder_transform_builds_every_feature():
+    encoder = FeatureEncoder({"Submit": 0, "Finance": 1})
+    X = encoder.transform(["Finance", "Submit"], [7, None], [3, None], [datetime(2024, 1, 5, 14), datetime(2024, 1, 1, 9)])
+    assert X.tolist() == [[1, 7, 3, 14, 4], [0, 0, 0, 9, 0]]
+    assert encoder.transform([], [], [], []).shape == (0, len(FeatureEncoder.FEATURES))
+
+
+def grouped_data(rng, template_rows):
+    # Each template scales durations differently; template 3 has too few rows for its own model
+    rows = []
+    for template_id, count in template_rows.items():
+        X = np.column_stack([
+            rng.integers(0, 4, count), np.full(count, template_id), rng.integers(1, 20, count),
+            rng.integers(8, 18, count), rng.integers(0, 7, count),
+        ])
+        y = (X[:, 0] + 1) * 300 * template_id + X[:, 2] * 10 + rng.normal(0, 20, count)
+        rows.append((X, y))
+    return np.concatenate([r[0] for r in rows]), np.concatenate([r[1] for r in rows])
+
+
+def test_tier_falls_back_to_global_model_for_sparse_groups():
+    rng = np.random.default_rng(0)
+    X_train, y_train = grouped_data(rng, {1: 600, 2: 600, 3: 20})
+    X_test, y_test = grouped_data(rng, {1: 150, 2: 150, 3: 10})
+    fitted = fit_models(X_train, y_train, X_test, y_test, tier="template", min_samples=200)
+
+    assert set(fitted.tier_models) <= {1, 2}
+    assert fitted.metrics["tier"] == {"by": "template", "models": len(fitted.tier_models)}
+    sparse = X_test[X_test[:, 1] == 3]
+    assert np.array_equal(predict_routed(fitted, sparse), fitted.rf_model.predict(sparse))
+
+
+def test_predictor_routes_by_template_id():
+    rng = np.random.default_rng(1)
+    X_train, y_train = grouped_data(rng, {1: 600, 2: 600})
+    X_test, y_test = grouped_data(rng, {1: 150, 2: 150})
+    encoder = FeatureEncoder({f"Step{i}": i for i in range(4)})
+    predictor = DurationPredictor()
+    predictor._swap(fit_models(X_train, y_train, X_test, y_test, encoder, tier="template", min_samples=200))
+
+    start = datetime(2024, 1, 2, 10)
+    slow, fast = predictor.predict_many(["Step3", "Step3"], [5, 5], [start, start], [2, 1])
+    assert slow > fast
+    assert predictor.predict("Step3", 5, start, 2) == slow
+
+
+def test_forecast_follows_the_longest_branch(fixed_durations):
+    compiled = CompiledTemplate(1, 1, DIAMOND)
+    now = datetime(2024, 1, 2, 10)
+    jobs = [
+        (compiled, 5, {}, set()),
+        (compiled, 5, {"Finance": now, "Legal": now}, {"Submit"}),
+        # Legal has been running for 200 s: 300 s of it is left, still the longer branch
+        (compiled, 5, {"Finance": now, "Legal": now - timedelta(seconds=200)}, {"Submit"}),
+        (compiled, 5, {"Sign": now}, {"Submit", "Finance", "Legal"}),
+    ]
+    results = DurationPredictor().forecast_graphs(jobs, now)
+    assert [remaining for _, remaining in results] == [610, 550, 350, 50]
+    assert results[1][0] == {"Finance": 100, "Legal": 500, "Sign": 50}
+    assert DurationPredictor().forecast_graphs([], now) == []
+
+
+def test_forecast_endpoint_reports_the_critical_path(client, fixed_durations):
+    template = client.post("/templates", json={"name": "forecast", "graph_json": DIAMOND}).json()
+    instance = client.post("/instances", json={"template_id": template["id"]}).json()
+    assert client.post(f"/instances/{instance['id']}/complete_node").status_code == 200
+
+    [forecast] = client.post("/predict/forecast", json={"instance_ids": [instance["id"]]}).json()
+    assert sorted(forecast["running_node_ids"]) == ["Finance", "Legal"]
+    # Finance and Legal started a moment ago; Sign waits for the slower one
+    assert 549 <= forecast["remaining_seconds"] <= 550
+    eta = datetime.fromisoformat(forecast["eta"])
+    assert abs((eta - datetime.now()).total_seconds() - 550) < 5
+
+
+def test_forecast_with_no_or_unknown_instances(client):
+    assert client.post("/predict/forecast", json={"instance_ids": []}).json() == []
+    assert client.post("/predict/forecast", json={"instance_ids": [10**9]}).json() == []
+    assert client.post("/predict/forecast", json={"instance_ids": ["first"]}).status_code == 422
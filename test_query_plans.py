@@ -0,0 +1,92 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, text
+from sqlalchemy.orm import Session
+
+from backend import migrations, models
+
+E, I, T, L = models.NodeExecution, models.WorkflowInstance, models.WorkflowTemplate, models.SystemLog
+NOW = datetime(2024, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    migrations.upgrade(engine)
+    return engine
+
+
+def plan(session, query):
+    sql = str(query.statement.compile(session.bind, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+
+def assert_indexed(session, query):
+    details = plan(session, query)
+    full_scans = [d for d in details if re.fullmatch(r"SCAN \w+", d)]
+    assert not full_scans, details
+    assert any("USING" in d and "INDEX" in d or "PRIMARY KEY" in d for d in details), details
+
+
+HOT_QUERIES = {
+    "running executions of an instance": lambda db: db.query(E).filter(
+        E.instance_id == 1, E.status == models.NodeStatus.RUNNING
+    ),
+    "all executions of an instance": lambda db: db.query(E).filter(E.instance_id == 1).order_by(E.id),
+    "completed executions with a duration": lambda db: db.query(E.id).filter(
+        E.status == models.NodeStatus.COMPLETED, E.actual_duration != None
+    ),
+    "feature store refresh": lambda db: db.query(E.id, E.node_id, E.end_time).filter(
+        E.status == models.NodeStatus.COMPLETED,
+        E.actual_duration != None,
+        E.end_time >= NOW - timedelta(minutes=1),
+    ).order_by(E.end_time, E.id),
+    "active instances": lambda db: db.query(func.count(I.id)).filter(I.status == models.WorkflowStatus.RUNNING),
+    "instances completed today": lambda db: db.query(func.count(I.id)).filter(
+        I.status == models.WorkflowStatus.COMPLETED, I.end_time >= NOW.replace(hour=0)
+    ),
+    "active templates": lambda db: db.query(T).filter(T.is_deleted == 0),
+    "newest logs": lambda db: db.query(L).order_by(L.created_at.desc(), L.id.desc()).limit(50),
+    "instances page": lambda db: db.query(I).filter(I.id < 100).order_by(I.id.desc()).limit(50),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(engine, name):
+    with Session(engine) as db:
+        assert_indexed(db, HOT_QUERIES[name](db))
+
+
+NEW_INDEXES = (
+    "ix_node_executions_instance_id_status",
+    "ix_node_executions_status_actual_duration",
+    "ix_node_executions_status_end_time",
+    "ix_workflow_instances_status_end_time",
+    "ix_workflow_templates_is_deleted",
+    "ix_system_logs_created_at_id",
+)
+
+
+def test_upgrade_brings_old_database_up_to_date(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Schema as it was before lock_version and the hot-query indexes
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+        conn.execute(text("ALTER TABLE workflow_instances DROP COLUMN lock_version"))
+
+    assert migrations.upgrade(engine) == [version for version, _ in migrations.MIGRATIONS]
+    assert migrations.upgrade(engine) == []
+
+    inspector = inspect(engine)
+    assert "lock_version" in {c["name"] for c in inspector.get_columns("workflow_instances")}
+    indexes = {
+        index["name"]
+        for table in ("node_executions", "workflow_instances", "workflow_templates", "system_logs")
+        for index in inspector.get_indexes(table)
+    }
+    assert set(NEW_INDEXES) <= indexes
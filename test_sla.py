@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend import database, models
+from backend.prediction import QUANTILE_LEVELS, DurationPredictor, at_levels, fit_models, predict_quantiles
+from backend.sla import SLAScanner
+from backend.workflow import CompiledTemplate
+
+DIAMOND = {
+    "nodes": [{"id": "Submit"}, {"id": "Finance"}, {"id": "Legal"}, {"id": "Sign"}],
+    "edges": [
+        {"source": "Submit", "target": "Finance"},
+        {"source": "Submit", "target": "Legal"},
+        {"source": "Finance", "target": "Sign"},
+        {"source": "Legal", "target": "Sign"},
+    ],
+}
+
+
+def test_vectorized_schedule_matches_schedule():
+    compiled = CompiledTemplate(1, 1, DIAMOND)
+    rng = np.random.default_rng(0)
+    durations = rng.uniform(0, 1000, size=(50, 4))
+    done = np.zeros((50, 4), dtype=bool)
+    done[::3, 0] = True
+    done[::6, 1] = True
+    makespans = compiled.schedule_many(durations, done).max(axis=1)
+    for row, flags, makespan in zip(durations, done, makespans):
+        finished = {n for n, flag in zip(compiled.node_ids, flags) if flag}
+        assert makespan == pytest.approx(compiled.schedule(dict(zip(compiled.node_ids, row)), finished)[1])
+
+
+def test_sla_must_be_positive():
+    assert CompiledTemplate(1, 1, {**DIAMOND, "sla_seconds": 3600}).sla_seconds == 3600
+    with pytest.raises(ValueError):
+        CompiledTemplate(1, 1, {**DIAMOND, "sla_seconds": "1 day"})
+
+
+def noisy_data(rng, count):
+    X = np.column_stack([rng.integers(0, 4, count), np.ones(count), rng.integers(1, 5, count),
+                         rng.integers(8, 18, count), rng.integers(0, 7, count)])
+    mean = (X[:, 0] + 1) * 600.0
+    return X, mean * rng.lognormal(0, 0.4, count)
+
+
+def test_intervals_are_calibrated_on_unseen_data():
+    rng = np.random.default_rng(1)
+    X, y = noisy_data(rng, 4000)
+    fitted = fit_models(X[:3000], y[:3000], X[3000:], y[3000:], tier="none")
+    X_new, y_new = noisy_data(rng, 4000)
+    quantiles = predict_quantiles(fitted, X_new, fitted.rf_model.predict(X_new))
+    assert quantiles.shape == (4000, len(QUANTILE_LEVELS))
+    assert (np.diff(quantiles, axis=1) >= 0).all()
+    low, high = at_levels(quantiles, [0.1, 0.9]).T
+    assert 0.72 < np.mean((y_new >= low) & (y_new <= high)) < 0.88
+
+
+@pytest.fixture
+def instances():
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    now = datetime.now()
+    template = models.WorkflowTemplate(name="sla", graph_json={**DIAMOND, "sla_seconds": 3600}, version=1)
+    db.add(template)
+    db.flush()
+    late = models.WorkflowInstance(template_id=template.id, status=models.WorkflowStatus.RUNNING, start_time=now - timedelta(hours=2))
+    fresh = models.WorkflowInstance(template_id=template.id, status=models.WorkflowStatus.RUNNING, start_time=now)
+    db.add_all([late, fresh])
+    db.flush()
+    db.add_all([
+        models.NodeExecution(instance_id=late.id, node_id="Submit", status=models.NodeStatus.COMPLETED,
+                             start_time=now - timedelta(hours=2), end_time=now - timedelta(hours=1)),
+        models.NodeExecution(instance_id=late.id, node_id="Finance", status=models.NodeStatus.RUNNING, start_time=now - timedelta(hours=1)),
+        models.NodeExecution(instance_id=late.id, node_id="Legal", status=models.NodeStatus.RUNNING, start_time=now - timedelta(hours=1)),
+        models.NodeExecution(instance_id=fresh.id, node_id="Submit", status=models.NodeStatus.RUNNING, start_time=now),
+    ])
+    db.commit()
+    try:
+        yield db, late, fresh
+    finally:
+        db.close()
+
+
+def test_scanner_flags_breaches_and_rescores_only_changed_instances(instances):
+    db, late, fresh = instances
+    # Untrained predictor: every node is forecast at 300 seconds
+    scanner = SLAScanner(DurationPredictor(), default_sla=0)
+    scanner.scan(db)
+    report = scanner.report(limit=1000)
+    by_id = {item["instance_id"]: item for item in report["items"]}
+    assert by_id[late.id]["breach_probability"] == 1.0
+    assert by_id[late.id]["remaining_p50"] == 300  # Sign only; the running branches are overdue
+    assert fresh.id not in by_id
+    assert scanner.report(min_probability=0.0, limit=1000)["running"] >= 2
+
+    assert scanner.scan(db)["rescored"] == 0
+    late.status = models.WorkflowStatus.COMPLETED
+    fresh.current_node_id = "Finance"
+    db.commit()
+    result = scanner.scan(db)
+    assert result["rescored"] == 1
+    assert late.id not in result["states"] and fresh.id in result["states"]
+    items = {item["instance_id"]: item for item in scanner.report(min_probability=0.0, limit=1000)["items"]}
+    assert items[fresh.id]["breach_probability"] == 0.0
+    remaining = result["remaining"][list(result["instance_ids"]).index(fresh.id)]
+    assert remaining.min() == pytest.approx(900, abs=1)  # Submit, then one 300s branch, then Sign
+
+
+def test_new_models_rescore_everything_at_most_once_per_interval(instances):
+    db, late, fresh = instances
+    predictor = DurationPredictor()
+    scanner = SLAScanner(predictor, default_sla=0, model_rescore_interval=3600)
+    predictor.trained_at = "first"
+    assert scanner.scan(db)["rescored"] >= 2
+
+    # A routine refit shortly after: cached forecasts stay, changed instances get the new model
+    predictor.trained_at = "second"
+    fresh.current_node_id = "Finance"
+    db.commit()
+    assert scanner.scan(db)["rescored"] == 1
+
+    scanner._model_adopted -= 3600
+    result = scanner.scan(db)
+    assert result["rescored"] == len(result["states"]) and scanner.scan(db)["rescored"] == 0
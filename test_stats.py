@@ -0,0 +1,84 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend import models, stats
+
+DAY = datetime(2024, 5, 6, 9)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        for template_id in (1, 2):
+            session.add(models.WorkflowTemplate(id=template_id, name=f"t{template_id}", version=1, graph_json={"nodes": [{"id": "Review"}]}))
+            session.add(models.WorkflowInstance(id=template_id, template_id=template_id, status=models.WorkflowStatus.RUNNING))
+        session.commit()
+        yield session
+
+
+def complete(db, instance_id, node_id, end_time, actual, predicted=None):
+    execution = models.NodeExecution(
+        instance_id=instance_id, node_id=node_id, status=models.NodeStatus.COMPLETED,
+        start_time=end_time - timedelta(seconds=actual), end_time=end_time,
+        actual_duration=actual, predicted_duration=predicted,
+    )
+    db.add(execution)
+    return execution, instance_id  # Instance i belongs to template i
+
+
+def recomputed(db):
+    """The rollup rows derived straight from the completed executions"""
+    totals = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for e in db.query(models.NodeExecution).filter(models.NodeExecution.status == models.NodeStatus.COMPLETED):
+        t = totals[(e.end_time.date(), e.instance.template_id, e.node_id)]
+        t[0] += 1
+        t[1] += e.actual_duration
+        if e.predicted_duration is not None:
+            t[2] += 1
+            t[3] += e.predicted_duration
+            t[4] += abs(e.actual_duration - e.predicted_duration)
+    return {key: tuple(t) for key, t in totals.items()}
+
+
+def rollup(db):
+    S = models.ExecutionStat
+    return {
+        (r.day, r.template_id, r.node_id): (r.count, r.total_actual, r.predicted_count, r.total_predicted, r.total_abs_error)
+        for r in db.query(S)
+    }
+
+
+def test_incremental_rollup_matches_the_raw_executions(db):
+    # Two batches touching the same keys: the second one increments rows the first created
+    stats.record_completions(db, [
+        complete(db, 1, "Review", DAY, 100, predicted=120),
+        complete(db, 1, "Review", DAY + timedelta(hours=1), 300),
+        complete(db, 2, "Review", DAY, 50, predicted=40),
+    ])
+    db.commit()
+    stats.record_completions(db, [
+        complete(db, 1, "Review", DAY + timedelta(hours=2), 200, predicted=260),
+        complete(db, 1, "Approve", DAY + timedelta(days=1), 30, predicted=30),
+    ])
+    stats.record_completion(db, *complete(db, 2, "Review", DAY + timedelta(days=1), 70, predicted=100))
+    db.add(models.NodeExecution(instance_id=1, node_id="Approve", status=models.NodeStatus.RUNNING, start_time=DAY))
+    db.commit()
+
+    expected = recomputed(db)
+    assert rollup(db) == expected
+    assert expected[(DAY.date(), 1, "Review")] == (3, 600, 2, 380, 80)
+
+    by_node = {(r["template_id"], r["node_id"]): r for r in stats.by_node(db)}
+    assert by_node[(1, "Review")] == {"template_id": 1, "node_id": "Review", "count": 3, "actual": 200.0, "predicted": 190.0, "mae": 40.0}
+    assert by_node[(2, "Review")]["actual"] == 60.0 and by_node[(2, "Review")]["mae"] == 20.0
+    assert stats.average_duration(db) == pytest.approx((100 + 300 + 50 + 200 + 30 + 70) / 6)
+
+    # A full rebuild from node_executions lands on the same rows
+    stats.rebuild(db)
+    assert rollup(db) == expected
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from backend import training
+from backend.prediction import DurationPredictor
+from backend.training import TrainingWorker
+
+
+class Clock:
+    """Replaces the time module inside backend.training; advances only when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class Registry:
+    def latest_version(self):
+        return None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(training, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def worker(clock):
+    worker = TrainingWorker(DurationPredictor(), Registry(), every_n=3, interval=60, reload_interval=0.01)
+    yield worker
+    worker.stop()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_every_n_completions_triggers_one_retrain(worker):
+    worker.notify_completion(2)
+    assert not worker._wakeup.is_set() and not worker._take_trigger()
+    worker.notify_completion()
+    assert worker._wakeup.is_set()
+    assert worker._take_trigger() and worker.status()["pending_completions"] == 0
+    assert not worker._take_trigger()
+
+
+def test_interval_retrains_only_when_something_changed(worker, clock):
+    clock.advance(120)
+    assert not worker._take_trigger()  # Nothing completed since the last fit
+    worker._last_run = clock.now
+
+    worker.notify_completion()
+    clock.advance(59)
+    assert not worker._take_trigger()
+    clock.advance(1)
+    assert worker._take_trigger() and not worker._take_trigger()
+
+
+def test_triggers_during_a_fit_are_coalesced(worker, clock):
+    calls, entered, release = [], threading.Event(), threading.Event()
+
+    def run_once():
+        calls.append(clock.now)
+        entered.set()
+        release.wait(5)
+
+    worker.run_once = run_once
+    worker.start()
+    worker.notify_completion(3)
+    assert entered.wait(5)
+
+    # A burst of completions and an explicit request while the first fit runs
+    for _ in range(10):
+        worker.notify_completion(3)
+    worker.request_retrain()
+    release.set()
+    assert wait_for(lambda: len(calls) == 2)
+    time.sleep(0.1)
+    assert len(calls) == 2
+
+    # Below N, the thread waits for the interval to pass on the mocked clock
+    worker._last_run = clock.now
+    worker.notify_completion()
+    time.sleep(0.1)
+    assert len(calls) == 2
+    clock.advance(60)
+    assert wait_for(lambda: len(calls) == 3)
@@ -0,0 +1,95 @@
+import heapq
+
+import pytest
+
+from backend import workflow
+from backend.workflow import CompiledTemplate
+
+# Submit -> (Finance || Legal) -> Sign
+APPROVAL_GRAPH = {
+    "nodes": [{"id": "Submit"}, {"id": "Finance"}, {"id": "Legal"}, {"id": "Sign"}],
+    "edges": [
+        {"source": "Submit", "target": "Finance"},
+        {"source": "Submit", "target": "Legal"},
+        {"source": "Finance", "target": "Sign"},
+        {"source": "Legal", "target": "Sign"},
+    ],
+}
+DURATIONS = {"Submit": 10, "Finance": 300, "Legal": 240, "Sign": 20}
+
+
+def simulate(compiled, durations):
+    """
+    Drive an instance through the engine the way complete_node does: start
+    the start nodes, and on each completion start whatever ready_after unblocks.
+    Returns the instance duration and the time each node started.
+    """
+    clock = 0
+    started, completed = {}, set()
+    events = []
+    for node_id in compiled.start_nodes:
+        started[node_id] = clock
+        heapq.heappush(events, (clock + durations[node_id], node_id))
+    while events:
+        clock, node_id = heapq.heappop(events)
+        completed.add(node_id)
+        for nxt in compiled.ready_after(node_id, completed, set(started)):
+            started[nxt] = clock
+            heapq.heappush(events, (clock + durations[nxt], nxt))
+    assert completed == set(compiled.node_ids)
+    return clock, started
+
+
+def test_parallel_branches_finish_on_critical_path():
+    compiled = CompiledTemplate(1, 1, APPROVAL_GRAPH)
+    duration, started = simulate(compiled, DURATIONS)
+
+    _, critical_path = compiled.schedule(DURATIONS)
+    assert duration == critical_path == 10 + 300 + 20
+    assert duration < sum(DURATIONS.values())
+    # Both approvals run at the same time; the join waits for the slower one
+    assert started["Finance"] == started["Legal"] == 10
+    assert started["Sign"] == 310
+
+
+def test_linear_template_takes_sum_of_nodes():
+    compiled = CompiledTemplate(1, 1, {"nodes": [{"id": n} for n in DURATIONS]})
+    duration, _ = simulate(compiled, DURATIONS)
+    assert duration == compiled.schedule(DURATIONS)[1] == sum(DURATIONS.values())
+
+
+def test_join_waits_for_all_predecessors():
+    compiled = CompiledTemplate(1, 1, APPROVAL_GRAPH)
+    assert compiled.ready_after("Submit", {"Submit"}) == ["Finance", "Legal"]
+    assert compiled.ready_after("Finance", {"Submit", "Finance"}) == []
+    assert compiled.ready_after("Legal", {"Submit", "Finance", "Legal"}) == ["Sign"]
+    assert compiled.ready_after("Legal", {"Submit", "Finance", "Legal"}, started={"Sign"}) == []
+
+
+def test_schedule_skips_completed_nodes():
+    compiled = CompiledTemplate(1, 1, APPROVAL_GRAPH)
+    starts, remaining = compiled.schedule({"Finance": 100, "Legal": 50, "Sign": 20}, done={"Submit"})
+    assert starts["Sign"] == 100
+    assert remaining == 120
+
+
+def test_cycles_are_rejected():
+    graph = {"nodes": [{"id": "A"}, {"id": "B"}], "edges": [{"from": "A", "to": "B"}, {"from": "B", "to": "A"}]}
+    with pytest.raises(ValueError):
+        CompiledTemplate(1, 1, graph)
+
+
+def test_editing_or_deleting_a_template_drops_its_compiled_graph(client):
+    template = client.post("/templates", json={"name": "edited", "graph_json": {"nodes": [{"id": "Draft"}, {"id": "Send"}]}}).json()
+    assert client.post("/instances", json={"template_id": template["id"]}).json()["current_node_id"] == "Draft"
+    assert (template["id"], template["version"]) in workflow.template_cache._entries
+
+    updated = client.put(f"/templates/{template['id']}", json={"name": "edited", "graph_json": {"nodes": [{"id": "Review"}, {"id": "Send"}]}}).json()
+    assert not any(key[0] == template["id"] for key in workflow.template_cache._entries)
+    started = client.post("/instances", json={"template_id": template["id"]}).json()
+    assert started["current_node_id"] == "Review"
+    assert [e["node_id"] for e in started["executions"]] == ["Review"]
+    assert (template["id"], updated["version"]) in workflow.template_cache._entries
+
+    assert client.delete(f"/templates/{template['id']}").status_code == 200
+    assert not any(key[0] == template["id"] for key in workflow.template_cache._entries)